@@ -12,16 +12,33 @@
 import argparse
 import os
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 import configparser
 import errno
 from glob import glob
 import gzip
+import hashlib
 import json
-from urllib.request import urlopen
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
 import re
+import shutil
+import sqlite3
 import tarfile
+import tempfile
+import threading
+import time
+import uuid
 import zipfile
 
+# platform-specific file locking
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
 # third-party libraries
 from census import Census
 import geopandas as gpd
@@ -30,10 +47,24 @@ from geopandas import GeoDataFrame
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
+from requests.adapters import HTTPAdapter
+from scipy import sparse
+import shapely
 from tqdm import tqdm
 from us import states
 
+# optional third-party libraries
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 # local libaries
 from statlib import CensusFields
 
@@ -41,6 +72,56 @@ from statlib import CensusFields
 
 VERSION = '0.4.9'
 
+# File downloads
+DOWNLOAD_BLOCK_SIZE = 1048576
+DOWNLOAD_TIMEOUT = 60
+ARCHIVE_PATH = 'cache/archives/'
+
+# Geometry layers kept in memory by read_layer(), up to LAYER_CACHE_BYTES in total; 
+# a statewide block group layer takes a few hundred MB
+LAYER_CACHE_BYTES = 1024 * 1048576
+LAYER_CACHE = OrderedDict()
+LAYER_CACHE_SIZES = {}
+LAYER_CACHE_LOCK = threading.Lock()
+
+# Simplified copies of the layers served to the browser, one per zoom level; 
+# coordinates are rounded to a grid of a fraction of a pixel at the zoom level
+LAYER_ZOOM_LEVELS = (8, 10, 12, 14)
+LAYER_GRID_DIVISIONS = 4
+TILE_SIZE = 256
+
+# Open Elections voting results
+VOTING_RESULTS_CHUNK_SIZE = 100000
+VOTING_RESULTS_CACHE_PATH = 'cache/voting-results/'
+# TODO download voting results from Open Elections, 
+# e.g., https://github.com/openelections/openelections-data-tx
+VOTING_RESULTS_FILE = 'static/data/20181106__tx__general__harris__precinct.csv'
+# the rows of the voting results of each field, as a list of the column and value of each condition
+VOTING_RESULTS_QUERIES = {
+        'us_pres_rep' : [['office', 'President'], ['party', 'REP']],
+        'us_pres_dem' : [['office', 'President'], ['party', 'DEM']],
+        'us_sen_rep' : [['office', 'U.S. Senate'], ['party', 'REP']],
+        'us_sen_dem' : [['office', 'U.S. Senate'], ['party', 'DEM']],
+        'us_hou_rep' : [['office', 'U.S. House'], ['party', 'REP']],
+        'us_hou_dem' : [['office', 'U.S. House'], ['party', 'DEM']],
+        'registered_voters' : [['office', 'Registered Voters']],
+        'total_votes' : [['office', 'Ballots Cast']]
+    }
+
+# Census API downloads
+CENSUS_WORKERS = 4
+CENSUS_REQUESTS_PER_SECOND = 10
+CENSUS_RETRIES = 5
+CENSUS_BACKOFF_FACTOR = 0.5
+CENSUS_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Parquet parts of a year and geography in the census cache before the parts are merged
+CENSUS_CACHE_MAX_PARTS = 16
+
+# Variable names of the census variables catalogs, read once per year by get_catalog_variables()
+CATALOG_VARIABLES = {}
+CATALOG_VARIABLES_LOCK = threading.Lock()
+
 def read_settings(args):
     """Read the settings stored in settings.ini
     Args: 
@@ -58,6 +139,9 @@ def read_settings(args):
     election_year = '2018'
     voting_precincts = None
     voting_results = None
+    census_workers = CENSUS_WORKERS
+    districts = None
+    jobs = None
     
     # Set values in settings.ini
     settings = configparser.ConfigParser()
@@ -80,6 +164,14 @@ def read_settings(args):
         voting_precincts = args.voting_precincts
     if args.voting_results:
         voting_results = args.voting_results
+    if args.census_workers is not None:
+        census_workers = args.census_workers
+    if args.districts:
+        districts = parse_districts(args.districts)
+    if args.all_districts:
+        districts = 'all'
+    if args.jobs is not None:
+        jobs = args.jobs
 
     settings_dict = { 
                 "census_api_key": census_api_key,
@@ -89,12 +181,55 @@ def read_settings(args):
                 "census_year": census_year,
                 "election_year": election_year,
                 "voting_precincts": voting_precincts,
-                "voting_results": voting_results
+                "voting_results": voting_results,
+                "census_workers": census_workers,
+                "districts": districts,
+                "jobs": jobs
             }
 
     return settings_dict
 
 
+def parse_districts(districts):
+    """Parse a list of districts, e.g., 1-36 or 2,7,9-12
+    Args:
+        districts: string of district numbers and ranges separated by commas
+    Returns:
+        list of the district numbers
+    Raises:
+        ValueError: if a district number is not an integer
+    """
+    district_numbers = []
+    for part in districts.split(','):
+        part = part.strip()
+        if '-' in part:
+            first, last = part.split('-', 1)
+            district_numbers.extend(range(int(first), int(last) + 1))
+        elif part:
+            district_numbers.append(int(part))
+
+    return sorted(set(district_numbers))
+
+
+def positive_int(value):
+    """argparse type of a positive integer, e.g., the number of workers
+    Args:
+        value: string given on the command line
+    Returns:
+        the integer
+    Raises:
+        argparse.ArgumentTypeError: if value is not an integer greater than 0
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be a positive integer: '{value}'".format(value=value))
+
+    return number
+
+
 def get_command_line_args():
     """Define command line arguments using argparse
     Args:
@@ -108,11 +243,17 @@ def get_command_line_args():
     parser = argparse.ArgumentParser(description='Build stats for a given Congressional District')
     parser.add_argument('-s','--state', help='State of District, e.g., TX')
     parser.add_argument('-d','--district', help='District No., e.g., 7')
+    parser.add_argument('--districts', help='Build several districts, e.g., 1-36 or 2,7,9-12')
+    parser.add_argument('--all-districts', help='Build all the districts of the legislative body in the state', 
+            action="store_true")
     parser.add_argument('-l','--leg-body', help='Legislative Body, e.g., US-REP, US-SEN, STATE-REP, or STATE-SEN')
     parser.add_argument('-y','--census-year', help='Year of Census data to build')
     parser.add_argument('-p','--voting-precincts', help='Estimate stats for voting precincts using geospatial vector file, e.g., shapefile or GEOJSON')
     parser.add_argument('-q','--election-year', help='Year of voting results')
     parser.add_argument('-r','--voting-results', help='Build voting results from Open Elections csv file')
+    parser.add_argument('--census-workers', type=positive_int, help='Number of concurrent requests to the Census API, e.g., 4')
+    parser.add_argument('-j','--jobs', type=positive_int, 
+            help='Number of processes building the categories (default 1), or the districts with --districts (default: the number of CPUs), e.g., 4')
     parser.add_argument('-v','--version',action='version', 
             version='%(prog)s %(version)s' % {"prog": parser.prog, "version": _version})
     parser.add_argument('--debug',help='print debug messages',action="store_true")
@@ -140,41 +281,312 @@ def mkdir_p(path):
             raise
 
 
-def download_file(url, dl_filename):
+def get_file_hash(filename, block_size=1048576):
+    """Return the SHA-256 hex digest of a file's contents
+    Args:
+        filename: the file to hash
+        block_size: number of bytes to read at a time
+    Returns:
+        file_hash: hex digest of the file
+    Raises:
+        OSError
+    """
+    sha256 = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha256.update(block)
+
+    return sha256.hexdigest()
+
+
+@contextmanager
+def locked_file(lock_filename):
+    """Hold an exclusive lock on a lock file, which serializes the threads and processes 
+    that lock the same file
+    Args:
+        lock_filename: the lock file, created if it does not exist
+    Returns:
+        a context manager holding the lock
+    Raises:
+        OSError
+    """
+    with open(lock_filename, 'a+b') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield lock_file
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def get_archive_index(archive_path=ARCHIVE_PATH):
+    """Return the index of the archive cache, which maps urls to the SHA-256 of their contents
+    Args:
+        archive_path: directory of the archive cache
+    Returns:
+        archive_index: dict of url -> SHA-256 hex digest
+    Raises:
+        Nothing
+    """
+    archive_index = {}
+    archive_index_file = archive_path + 'index.json'
+    if os.path.isfile(archive_index_file):
+        with open(archive_index_file) as archive_json:
+            archive_index = json.load(archive_json)
+
+    return archive_index
+
+
+def add_to_archive_index(url, file_hash, archive_path=ARCHIVE_PATH):
+    """Add a url and the SHA-256 of its contents to the index of the archive cache
+    The index is rewritten under a lock, so concurrent downloads do not drop each 
+    other's entries.
+    Args:
+        url: url of the file
+        file_hash: SHA-256 hex digest of the file
+        archive_path: directory of the archive cache
+    Returns:
+        Nothing
+    Raises:
+        Nothing
+    """
+    archive_index_file = archive_path + 'index.json'
+    with locked_file(archive_index_file + '.lock'):
+        archive_index = get_archive_index(archive_path)
+        archive_index[url] = file_hash
+
+        fd, archive_index_tmp_file = tempfile.mkstemp(dir=archive_path, suffix='.tmp')
+        with os.fdopen(fd, 'w') as archive_json:
+            json.dump(archive_index, archive_json)
+        os.replace(archive_index_tmp_file, archive_index_file)
+
+
+def copy_file_atomic(src, dst):
+    """Copy a file through a unique temporary file and rename it into place
+    Args:
+        src: file to copy
+        dst: destination filename
+    Returns:
+        Nothing
+    Raises:
+        OSError
+    """
+    dst_path = os.path.dirname(dst) or '.'
+    mkdir_p(dst_path)
+    fd, dst_tmp_file = tempfile.mkstemp(dir=dst_path, suffix='.tmp')
+    os.close(fd)
+    shutil.copyfile(src, dst_tmp_file)
+    os.replace(dst_tmp_file, dst)
+
+
+def get_archived_file(url, sha256=None, archive_path=ARCHIVE_PATH):
+    """Return the file of a url in the archive cache
+    Args:
+        url: url of the file
+        sha256: expected SHA-256 hex digest of the file; None accepts any archived file
+        archive_path: directory of the archive cache
+    Returns:
+        archive_file: filename of the file in the archive cache, or None if it is not archived
+    Raises:
+        Nothing
+    """
+    file_hash = get_archive_index(archive_path).get(url)
+    if file_hash is None or (sha256 is not None and sha256 != file_hash):
+        return None
+    if not os.path.isfile(archive_path + file_hash):
+        return None
+
+    return archive_path + file_hash
+
+
+def download_file(url, dl_filename=None, block_size=DOWNLOAD_BLOCK_SIZE, sha256=None, 
+        timeout=DOWNLOAD_TIMEOUT, archive_path=ARCHIVE_PATH):
     """Download a file given the url and filename
+    Downloads are stored in a content-addressed archive cache, so the same url is 
+    never fetched twice. An interrupted http(s) download resumes with a Range request.
     Args:
         url: url to the file
-        dl_filename: save the downloaded file using this filename
+        dl_filename: save the downloaded file using this filename; 
+            None only stores the file in the archive cache
+        block_size: number of bytes to read at a time
+        sha256: expected SHA-256 hex digest of the file; None accepts any contents, 
+            and a url whose archived file was removed is downloaded again and replaces 
+            its entry in the index of the archive cache, e.g., if the file changed upstream
+        timeout: seconds to wait for the server
+        archive_path: directory of the archive cache
+    Returns:
+        archive_file: filename of the file in the archive cache
+    Raises:
+        IOError: if the downloaded file does not match sha256
     See https://stackoverflow.com/questions/22676/how-do-i-download-a-file-over-http-using-python/22776#22776
     See https://gist.github.com/wy193777/0e2a4932e81afc6aa4c8f7a2984f34e2
     """
+    mkdir_p(archive_path)
+    
+    # use the archived file if this url was downloaded before
+    archive_file = get_archived_file(url, sha256, archive_path)
+
+    if archive_file is None:
+        url_hash = hashlib.sha256(url.encode()).hexdigest()
+        partial_file = archive_path + 'partial-' + url_hash
+        
+        # one process downloads a url at a time, the others wait for its archived file
+        with locked_file(partial_file + '.lock'):
+            archive_file = get_archived_file(url, sha256, archive_path)
+            if archive_file is None:
+                previous_hash = get_archive_index(archive_path).get(url)
+                archive_file = download_to_archive(url, partial_file, block_size=block_size, 
+                        sha256=sha256, timeout=timeout, archive_path=archive_path)
+                if previous_hash is not None and archive_path + previous_hash != archive_file:
+                    print( "{url} changed since it was archived as {previous}; archived as {current}".format(
+                        url=url, previous=archive_path + previous_hash, current=archive_file) )
+
+    if dl_filename is not None:
+        copy_file_atomic(archive_file, dl_filename)
+
+    return archive_file
+
+
+def download_to_archive(url, partial_file, block_size=DOWNLOAD_BLOCK_SIZE, sha256=None, 
+        timeout=DOWNLOAD_TIMEOUT, archive_path=ARCHIVE_PATH):
+    """Download a url into the archive cache through a partial file
+    A download resumes from the partial file only if the server confirms the file has not 
+    changed since, i.e., with If-Range and the ETag or Last-Modified of the first request.
+    Args:
+        url: url to the file
+        partial_file: the file holding the part downloaded so far; 
+            the caller holds the lock of the partial file
+        block_size: number of bytes to read at a time
+        sha256: expected SHA-256 hex digest of the file; None skips the verification
+        timeout: seconds to wait for the server
+        archive_path: directory of the archive cache
+    Returns:
+        archive_file: filename of the file in the archive cache
+    Raises:
+        IOError: if the downloaded file does not match sha256
+    """
     print( url )
-    url_object=urlopen(url)
-    dl_file_object=open(dl_filename,'wb')
+    validator_file = partial_file + '.json'
+    
+    # resume a previous download of this url
+    offset = 0
+    request = Request(url)
+    if os.path.isfile(partial_file) and os.path.isfile(validator_file) and \
+            url.split(':')[0] in ('http', 'https'):
+        with open(validator_file) as validator_json:
+            validator = json.load(validator_json).get('validator')
+        if validator is not None:
+            offset = os.path.getsize(partial_file)
+            request.add_header('Range', 'bytes={offset}-'.format(offset=offset))
+            request.add_header('If-Range', validator)
+    try:
+        url_object = urlopen(request, timeout=timeout)
+    except HTTPError as e:
+        if e.code != 416 or offset == 0:
+            raise
+        # the range starts at the end of the file, i.e., the partial file may be complete
+        content_range = e.headers.get('Content-Range', '')
+        e.close()
+        file_hash = get_file_hash(partial_file, block_size)
+        if sha256 is not None:
+            is_complete = sha256 == file_hash
+        else:
+            is_complete = content_range == 'bytes */{size}'.format(size=offset)
+        if is_complete:
+            return archive_partial_file(url, partial_file, file_hash, archive_path)
+        os.remove(partial_file)
+        return download_to_archive(url, partial_file, block_size=block_size, 
+                sha256=sha256, timeout=timeout, archive_path=archive_path)
+    
     meta = url_object.info()
+    if getattr(url_object, 'status', None) == 206:
+        if not meta.get('Content-Range', '').startswith('bytes {offset}-'.format(offset=offset)):
+            # the server sent a different part of the file, so start over
+            url_object.close()
+            os.remove(partial_file)
+            return download_to_archive(url, partial_file, block_size=block_size, 
+                    sha256=sha256, timeout=timeout, archive_path=archive_path)
+    else:
+        offset = 0
+        # keep a strong validator of the file, so an interrupted download can resume
+        validator = meta.get('ETag')
+        if validator is None or validator.startswith('W/'):
+            validator = meta.get('Last-Modified')
+        with open(validator_file, 'w') as validator_json:
+            json.dump({ 'url': url, 'validator': validator }, validator_json)
+
+    # hash the part that was downloaded before
+    file_sha256 = hashlib.sha256()
+    if offset > 0:
+        with open(partial_file, 'rb') as f:
+            for buffer in iter(lambda: f.read(block_size), b''):
+                file_sha256.update(buffer)
+    
     file_size = 0
     if int(meta.get("Content-Length", -1)) > 0:
-        file_size = int(meta.get("Content-Length", -1))
+        file_size = int(meta.get("Content-Length", -1)) + offset
     if file_size == 0:
-        print( "Downloading: %s" % (dl_filename.split('/')[-1]) )
+        print( "Downloading: %s" % (url.split('/')[-1]) )
     else:
-        print( "Downloading: %s Bytes: %s" % (dl_filename.split('/')[-1], file_size) )
+        print( "Downloading: %s Bytes: %s" % (url.split('/')[-1], file_size) )
 
-    current_file_size = 0
-    block_size = 8192
     pbar = tqdm(
-            total=file_size, initial=0, 
-            unit='B', unit_scale=True, desc=dl_filename.split('/')[-1] 
+            total=file_size, initial=offset, 
+            unit='B', unit_scale=True, desc=url.split('/')[-1] 
         )
-    while True:
-        buffer = url_object.read(block_size)
-        if not buffer:
-            break
-        current_file_size += len(buffer)
-        dl_file_object.write(buffer)
-        pbar.update(block_size)
+    with open(partial_file, 'ab' if offset > 0 else 'wb') as dl_file_object:
+        while True:
+            buffer = url_object.read(block_size)
+            if not buffer:
+                break
+            dl_file_object.write(buffer)
+            file_sha256.update(buffer)
+            pbar.update(len(buffer))
     pbar.close()
-    dl_file_object.close()
+    url_object.close()
+
+    file_hash = file_sha256.hexdigest()
+    if sha256 is not None and sha256 != file_hash:
+        os.remove(partial_file)
+        os.remove(validator_file)
+        message = "Checksum mismatch for {url}: expected {expected}, got {actual}; " \
+                "the download was discarded. If the file changed upstream, update the expected " \
+                "checksum".format(url=url, expected=sha256, actual=file_hash)
+        previous_hash = get_archive_index(archive_path).get(url)
+        if previous_hash is not None and os.path.isfile(archive_path + previous_hash):
+            message = message + ", and remove its archived file {archive_file}".format(
+                    archive_file=archive_path + previous_hash)
+        raise IOError( message )
+    
+    return archive_partial_file(url, partial_file, file_hash, archive_path)
+
+
+def archive_partial_file(url, partial_file, file_hash, archive_path=ARCHIVE_PATH):
+    """Move a complete download into the archive cache and add it to the index
+    Args:
+        url: url of the file
+        partial_file: the downloaded file
+        file_hash: SHA-256 hex digest of the file
+        archive_path: directory of the archive cache
+    Returns:
+        archive_file: filename of the file in the archive cache
+    Raises:
+        Nothing
+    """
+    archive_file = archive_path + file_hash
+    os.replace(partial_file, archive_file)
+    if os.path.isfile(partial_file + '.json'):
+        os.remove(partial_file + '.json')
+    add_to_archive_index(url, file_hash, archive_path)
+
+    return archive_file
 
 
 def extract_all(fn,dst="."):
@@ -195,6 +607,221 @@ def extract_all(fn,dst="."):
         print( "Please provide a tar archive file or zip file" )
 
 
+def read_archived_shapefile(archive_file):
+    """Read the shapefile in a zip archive without extracting the archive
+    Args:
+        archive_file: zip archive containing a shapefile
+    Returns:
+        geodataframe: GeoDataFrame of the shapefile
+    Raises:
+        IOError: if there is no shapefile in the archive
+    """
+    with zipfile.ZipFile(archive_file, 'r') as zf:
+        shapefiles = sorted(name for name in zf.namelist() if name.lower().endswith('.shp'))
+    if len(shapefiles) == 0:
+        raise IOError( "No shapefile in {archive}".format(archive=archive_file) )
+
+    # read through GDAL's virtual file system for zip archives
+    # the braces allow archive filenames without a .zip extension
+    shapefile = '/vsizip/{' + os.path.abspath(archive_file) + '}/' + shapefiles[0]
+    geodataframe = gpd.read_file(shapefile)
+
+    return geodataframe
+
+
+def get_layer_filename(layer_file):
+    """Return the path and filename of the GeoParquet copy of a layer
+    Args:
+        layer_file: filename of the layer, e.g., a geojson file
+    Returns:
+        parquet_file: filename of the GeoParquet file with the same name
+    Raises:
+        Nothing
+    """
+    parquet_file = os.path.splitext(layer_file)[0] + '.parquet'
+
+    return parquet_file
+
+
+def find_layer_file(layer_file):
+    """Return the file a layer is read from
+    The GeoParquet copy is preferred, falling back to the file itself, 
+    e.g., a geojson file written before the GeoParquet copies existed. 
+    A GeoParquet copy older than the layer file, e.g., of a geojson file 
+    that was replaced, is rebuilt from the layer file.
+    Args:
+        layer_file: filename of the layer
+    Returns:
+        filename of the GeoParquet copy if it exists, otherwise layer_file
+    Raises:
+        Nothing
+    """
+    parquet_file = get_layer_filename(layer_file)
+    if not os.path.isfile(parquet_file):
+        return layer_file
+    if parquet_file == layer_file or not os.path.isfile(layer_file):
+        return parquet_file
+
+    if os.stat(parquet_file).st_mtime_ns < os.stat(layer_file).st_mtime_ns:
+        print( "Rebuilding stale {parquet}".format(parquet=parquet_file) )
+        fd, parquet_tmp_file = tempfile.mkstemp(dir=os.path.dirname(parquet_file) or '.', suffix='.tmp')
+        os.close(fd)
+        gpd.read_file(layer_file).to_parquet(parquet_tmp_file, write_covering_bbox=True)
+        os.replace(parquet_tmp_file, parquet_file)
+
+    return parquet_file
+
+
+def get_layer_size(geodataframe):
+    """Return the memory used by a layer
+    Args:
+        geodataframe: GeoDataFrame of the layer
+    Returns:
+        layer_size: number of bytes of the columns and the coordinates of the geometries
+    Raises:
+        Nothing
+    """
+    layer_size = int(geodataframe.memory_usage(deep=True).sum())
+    # memory_usage() only counts a pointer per geometry
+    for column in geodataframe.columns[geodataframe.dtypes == 'geometry']:
+        layer_size = layer_size + 16 * int(shapely.get_num_coordinates(geodataframe[column].values).sum())
+
+    return layer_size
+
+
+def read_layer(layer_file, bbox=None, cache_bytes=LAYER_CACHE_BYTES):
+    """Read a layer from its GeoParquet copy
+    Layers are kept in an in-memory cache keyed by the file, its modification time, 
+    and the bbox, so a file is only parsed once per run no matter how many stages 
+    read it. The least recently used layers are evicted once the cache uses more 
+    than cache_bytes of memory.
+    Args:
+        layer_file: filename of the layer
+        bbox: (minx, miny, maxx, maxy) only reading the geounits that intersect 
+            the bounding box
+        cache_bytes: maximum memory used by the cached layers; 0 disables the cache
+    Returns:
+        geodataframe: copy of the GeoDataFrame of the layer
+    Raises:
+        Nothing
+    """
+    layer_file = find_layer_file(layer_file)
+    if bbox is not None:
+        bbox = tuple(float(b) for b in bbox)
+    layer_stat = os.stat(layer_file)
+    layer_key = (os.path.abspath(layer_file), (layer_stat.st_mtime_ns, layer_stat.st_size), bbox)
+    
+    with LAYER_CACHE_LOCK:
+        if layer_key in LAYER_CACHE:
+            LAYER_CACHE.move_to_end(layer_key)
+            return LAYER_CACHE[layer_key].copy()
+    
+    if layer_file.endswith('.parquet'):
+        geodataframe = gpd.read_parquet(layer_file, bbox=bbox)
+    else:
+        geodataframe = gpd.read_file(layer_file, bbox=bbox)
+    
+    layer_size = get_layer_size(geodataframe)
+    if layer_size <= cache_bytes:
+        with LAYER_CACHE_LOCK:
+            # drop stale versions of the layer
+            for key in [k for k in LAYER_CACHE if k[0] == layer_key[0] and k[1] != layer_key[1]]:
+                del LAYER_CACHE[key]
+                del LAYER_CACHE_SIZES[key]
+            LAYER_CACHE[layer_key] = geodataframe
+            LAYER_CACHE_SIZES[layer_key] = layer_size
+            while sum(LAYER_CACHE_SIZES.values()) > cache_bytes:
+                key, _ = LAYER_CACHE.popitem(last=False)
+                del LAYER_CACHE_SIZES[key]
+    
+    # callers get a copy so they cannot modify the cached layer
+    return geodataframe.copy()
+
+
+def write_layer(geodataframe, layer_file, zoom_levels=LAYER_ZOOM_LEVELS):
+    """Write a layer as GeoParquet, and as GeoJSON if layer_file is a geojson file
+    Layers used only by statbuilder are kept as GeoParquet, and the 
+    GeoJSON and its simplified copies are only written for the layers served 
+    to the browser. 
+    Args:
+        geodataframe: GeoDataFrame of the layer
+        layer_file: filename of the layer, e.g., a geojson or parquet file
+        zoom_levels: zoom levels of the simplified copies of a geojson layer
+    Returns:
+        Nothing
+    Raises:
+        Nothing
+    """
+    mkdir_p(os.path.dirname(layer_file))
+
+    if layer_file.endswith('.geojson'):
+        # See issue #367 https://github.com/geopandas/geopandas/issues/367
+        try: 
+            os.remove(layer_file)
+        except OSError:
+            pass
+        geodataframe.to_file(layer_file, driver='GeoJSON')
+        compress_file(layer_file)
+
+        for zoom_level in zoom_levels:
+            write_layer_level(geodataframe, layer_file, zoom_level)
+
+    # the GeoParquet copy is written last, so it is not older than the geojson file, 
+    # see find_layer_file(); the bbox column allows reads filtered by a bounding box
+    geodataframe.to_parquet(get_layer_filename(layer_file), write_covering_bbox=True)
+
+
+def get_layer_level_filename(layer_file, zoom_level):
+    """Return the filename of the simplified copy of a layer for a zoom level
+    Args:
+        layer_file: filename of the layer, e.g., static/geojson/bgs.geojson
+        zoom_level: zoom level of the copy, e.g., 10
+    Returns:
+        filename of the copy, e.g., static/geojson/bgs.z10.parquet
+    Raises:
+        Nothing
+    """
+    layer_name = os.path.splitext(layer_file)[0]
+
+    return '{layer_name}.z{zoom_level}.parquet'.format(
+            layer_name=layer_name, zoom_level=zoom_level)
+
+
+def write_layer_level(geodataframe, layer_file, zoom_level):
+    """Write the simplified copy of a layer for a zoom level as GeoParquet, 
+    which statserver makes the tiles of the zoom level from
+    The geounits are simplified as a coverage, so the boundary shared by two 
+    geounits is simplified once and there are no slivers or gaps between them, 
+    and the coordinates are snapped to a grid of a fraction of a pixel. 
+    Coverage simplification requires shapely 2.1 and GEOS 3.12; with older 
+    versions each geounit is simplified on its own.
+    Args:
+        geodataframe: GeoDataFrame of the layer
+        layer_file: filename of the layer
+        zoom_level: zoom level of the copy; the tolerance is the size of a pixel
+    Returns:
+        Nothing
+    Raises:
+        Nothing
+    """
+    # degrees of longitude per pixel
+    tolerance = 360.0 / (TILE_SIZE * 2 ** zoom_level)
+    grid_size = tolerance / LAYER_GRID_DIVISIONS
+    
+    geodataframe = geodataframe.to_crs('EPSG:4326')
+    if hasattr(shapely, 'coverage_simplify') and shapely.geos_version >= (3, 12, 0):
+        geometries = shapely.coverage_simplify(geodataframe.geometry.values, tolerance)
+    else:
+        geometries = shapely.simplify(geodataframe.geometry.values, tolerance, 
+                preserve_topology=True)
+    geometries = shapely.set_precision(geometries, grid_size)
+    geodataframe = geodataframe.set_geometry(
+            GeoSeries(geometries, index=geodataframe.index, crs=geodataframe.crs))
+
+    geodataframe.to_parquet(get_layer_level_filename(layer_file, zoom_level), 
+            write_covering_bbox=True)
+
+
 # TODO Convert to a class
 
 class District(object):
@@ -277,12 +904,12 @@ def get_voting_precincts_geojson_filename(state=48, district=7, leg_body='US-REP
     return vps_file
 
 
-def get_statewide_voting_precincts_geojson_filename(state=48):
+def get_statewide_voting_precincts_filename(state=48):
     """Return the path and filename containing all the voting precincts for a state
     Args:
         state: state of district
     Returns:
-        vps_file: filename of the geojson file containing the voting precincts of the state
+        vps_file: filename of the GeoParquet file containing the voting precincts of the state
     Raises:
         Nothing
     """
@@ -292,17 +919,17 @@ def get_statewide_voting_precincts_geojson_filename(state=48):
     vps_abbr = state_abbr + '-voting-precincts'
     geojson_path = 'static/geojson/'
 
-    vps_file = geojson_path +  vps_abbr + '.geojson'
+    vps_file = geojson_path +  vps_abbr + '.parquet'
 
     return vps_file
 
 
-def get_state_blockgroups_geojson_filename(state=48):
+def get_state_blockgroups_filename(state=48):
     """Return the path and filename to the block groups for a state
     Args:
         state: state of the disctrict
     Returns:
-        blockgroups_file: filename of the geojson file containing the blockgroups of the state
+        blockgroups_file: filename of the GeoParquet file containing the blockgroups of the state
     Raises:
         Nothing
     """
@@ -311,7 +938,7 @@ def get_state_blockgroups_geojson_filename(state=48):
     state_abbr = str(states.mapping('fips', 'abbr')[state])
     geojson_path = 'static/geojson/'
 
-    blockgroups_file = geojson_path + state_abbr + '-blockgroups.geojson'
+    blockgroups_file = geojson_path + state_abbr + '-blockgroups.parquet'
 
     return blockgroups_file
 
@@ -366,22 +993,42 @@ def get_bgs_in_district_json_filename(state=48, district=7, leg_body='US-REP'):
     return bgs_in_district_JSON
    
 
-def get_district_file(state=48, district=7, leg_body='US-REP'):
-    """Download the shape file for the disctrict
+def get_state_districts_filename(state=48, leg_body='US-REP'):
+    """Return the path and filename to all the districts of a legislative body in a state
     Args:
-        state: state of district
-        district: district number
+        state: state of the districts
         leg_body: legislative body, e.g., State Representative, State Senate, 
                   or US Representative
+    Returns:
+        districts_file: filename of the GeoParquet file containing the districts of the state
+    Raises:
+        Nothing
     """
+    state = "{0:0>2}".format(state)
+    
+    state_abbr = str(states.mapping('fips', 'abbr')[state])
+    geojson_path = 'static/geojson/'
 
-    district_file = get_district_geojson_filename(
-            state=state, district=district, leg_body=leg_body)
-    geojson_path = 'static/geojson/' 
+    districts_file = geojson_path + leg_body + '-' + state_abbr + '-districts.parquet'
+
+    return districts_file
+
+
+def get_state_districts_file(state=48, leg_body='US-REP'):
+    """Download the shape file with all the districts of a legislative body in a state
+    Args:
+        state: state of the districts
+        leg_body: legislative body, e.g., State Representative, State Senate, 
+                  or US Representative
+    Returns:
+        Nothing
+    Raises:
+        Nothing
+    """
+    districts_file = get_state_districts_filename(state=state, leg_body=leg_body)
     state = "{0:0>2}".format(state)
-    district = "{0:0>2}".format(district)
     
-    if not os.path.isfile(district_file):
+    if not os.path.isfile(districts_file):
         print( "Downloading district file" )
         # TODO download the most recent districts file
         # currently it downloads the 2016 district
@@ -394,45 +1041,75 @@ def get_district_file(state=48, district=7, leg_body='US-REP'):
         if leg_body == 'STATE-SEN':
             district_url = 'ftp://ftpgis1.tlc.state.tx.us/DistrictViewer/Senate/PlanS172.zip'
         
-        district_dl_file = geojson_path + 'district.zip'
-        download_file(district_url, district_dl_file)
-        extract_all(district_dl_file, geojson_path)
+        district_dl_file = download_file(district_url)
         
-        if len(glob(geojson_path + '*shp')) > 0:
-            districts_shapefile = glob(geojson_path + '*shp')[0]
-        else:
-            for p in glob(geojson_path + '*'):
-                if os.path.isdir(p):
-                    shapefile_path = p
-                    districts_shapefile = glob(p + '/*shp')[0]
-        
-        print( "Converting district file to GEOJSON" )
-        districts = gpd.read_file(districts_shapefile)
+        print( "Converting district file to GeoParquet" )
+        districts = read_archived_shapefile(district_dl_file)
         
+        # the congressional districts file covers the whole country
         if leg_body == 'US-REP':
-            d_index = districts[districts.GEOID == (state + district) ].index
-        if leg_body == 'STATE-REP' or leg_body == 'STATE-SEN':
-            d_index = districts[districts.District == int(district) ].index
-
-        district_shape = districts.loc[d_index]
-        district_shape = district_shape.to_crs({'init': u'epsg:4326'})
-        district_shape.to_file(district_file, driver='GeoJSON')
-
-        # cleanup geojson dir
-        if len(glob(geojson_path + '*shp')) > 0:
-            shapefile_prefix = glob(geojson_path + '*shp')[0].split(
-                    geojson_path)[1].split('.')[0]
-            shapefiles = glob(geojson_path + shapefile_prefix + '*')
-            for f in shapefiles:
-                os.remove(f)
-        else:
-            shapefile_prefix = glob(shapefile_path + '/*shp')[0].split(
-                    shapefile_path)[1].split('.')[0]
-            shapefiles = glob(shapefile_path + shapefile_prefix + '*')
-            for f in shapefiles:
-                os.remove(f)
-            os.rmdir(shapefile_path)
-        os.remove(district_dl_file)
+            districts = districts[districts.STATEFP == state]
+
+        districts = districts.to_crs({'init': u'epsg:4326'})
+        write_layer(districts, districts_file)
+
+
+def get_district_numbers(districts, leg_body='US-REP'):
+    """Return the district number of each district in a districts layer
+    Args:
+        districts: GeoDataFrame from get_state_districts_file()
+        leg_body: legislative body, e.g., State Representative, State Senate, 
+                  or US Representative
+    Returns:
+        district_numbers: Series of the district numbers, NaN for areas that are 
+            not a district, e.g., ZZ for water in the congressional districts
+    Raises:
+        Nothing
+    """
+    if leg_body == 'US-REP':
+        district_numbers = pd.to_numeric(districts.GEOID.str[2:], errors='coerce')
+    if leg_body == 'STATE-REP' or leg_body == 'STATE-SEN':
+        district_numbers = pd.to_numeric(districts.District, errors='coerce')
+
+    return district_numbers
+
+
+def get_state_district_numbers(state=48, leg_body='US-REP'):
+    """Return all the district numbers of a legislative body in a state
+    Args:
+        state: state of the districts
+        leg_body: legislative body, e.g., State Representative, State Senate, 
+                  or US Representative
+    Returns:
+        list of the district numbers
+    Raises:
+        Nothing
+    """
+    get_state_districts_file(state=state, leg_body=leg_body)
+    districts = read_layer(get_state_districts_filename(state=state, leg_body=leg_body))
+    district_numbers = get_district_numbers(districts, leg_body=leg_body).dropna()
+
+    return sorted(set(district_numbers.astype(int).tolist()))
+
+
+def get_district_file(state=48, district=7, leg_body='US-REP'):
+    """Download the shape file for the disctrict
+    Args:
+        state: state of district
+        district: district number
+        leg_body: legislative body, e.g., State Representative, State Senate, 
+                  or US Representative
+    """
+
+    district_file = get_district_geojson_filename(
+            state=state, district=district, leg_body=leg_body)
+    
+    if not os.path.isfile(district_file):
+        get_state_districts_file(state=state, leg_body=leg_body)
+        districts = read_layer(get_state_districts_filename(state=state, leg_body=leg_body))
+        
+        district_shape = districts[get_district_numbers(districts, leg_body=leg_body) == int(district)]
+        write_layer(district_shape, district_file)
 
 
 def get_statewide_voting_precincts(state=48):
@@ -444,8 +1121,7 @@ def get_statewide_voting_precincts(state=48):
     Raises:
         Nothing
     """
-    vps_file = get_statewide_voting_precincts_geojson_filename(state)
-    geojson_path = 'static/geojson/' 
+    vps_file = get_statewide_voting_precincts_filename(state)
     state = "{0:0>2}".format(state)
     
     if not os.path.isfile(vps_file):
@@ -457,39 +1133,13 @@ def get_statewide_voting_precincts(state=48):
         
         vps_url = 'https://github.com/nvkelso/election-geodata/raw/master/data/48-texas/statewide/2016/Precincts.zip'
         
-        vps_dl_file = geojson_path + 'vps.zip'
-        download_file(vps_url, vps_dl_file)
-        extract_all(vps_dl_file, geojson_path)
-        
-        if len(glob(geojson_path + '*shp')) > 0:
-            vps_shapefile = glob(geojson_path + '*shp')[0]
-        else:
-            for p in glob(geojson_path + '*'):
-                if os.path.isdir(p):
-                    shapefile_path = p
-                    vps_shapefile = glob(p + '/*shp')[0]
+        vps_dl_file = download_file(vps_url)
         
-        print( "Converting statewide voting precincts file to GEOJSON")
-        vps = gpd.read_file(vps_shapefile)
+        print( "Converting statewide voting precincts file to GeoParquet")
+        vps = read_archived_shapefile(vps_dl_file)
         
         vps = vps.to_crs({'init': u'epsg:4326'})
-        vps.to_file(vps_file, driver='GeoJSON')
-
-        # cleanup geojson dir
-        if len(glob(geojson_path + '*shp')) > 0:
-            shapefile_prefix = glob(geojson_path + '*shp')[0].split(
-                    geojson_path)[1].split('.')[0]
-            shapefiles = glob(geojson_path + shapefile_prefix + '*')
-            for f in shapefiles:
-                os.remove(f)
-        else:
-            shapefile_prefix = glob(shapefile_path + '/*shp')[0].split(
-                    shapefile_path)[1].split('.')[0]
-            shapefiles = glob(shapefile_path + shapefile_prefix + '*')
-            for f in shapefiles:
-                os.remove(f)
-            os.rmdir(shapefile_path)
-        os.remove(vps_dl_file)
+        write_layer(vps, vps_file)
 
 
 def get_state_blockgroups_file(state=48, district=7, leg_body='US-REP', year='2015'):
@@ -506,7 +1156,7 @@ def get_state_blockgroups_file(state=48, district=7, leg_body='US-REP', year='20
         Nothing
     """
 
-    blockgroups_file = get_state_blockgroups_geojson_filename(state=state)
+    blockgroups_file = get_state_blockgroups_filename(state=state)
             
     state = "{0:0>2}".format(state)
     district = "{0:0>2}".format(district)
@@ -516,43 +1166,101 @@ def get_state_blockgroups_file(state=48, district=7, leg_body='US-REP', year='20
     if not os.path.isfile(blockgroups_file):
         print( "Downloading blockgroups" )
         bgs_url = 'ftp://ftp2.census.gov/geo/tiger/TIGER{year}/BG/tl_{year}_{state}_bg.zip'.format(year=year, state=state)
-        bgs_dl_file = geojson_path + 'bgs.zip'
-        download_file(bgs_url, bgs_dl_file)
-        extract_all(bgs_dl_file, geojson_path)
-        bgs_shapefile = glob(geojson_path + '*shp')[0]
+        bgs_dl_file = download_file(bgs_url)
 
-        print( "Converting blockgroups file to GEOJSON")
-        bgs = gpd.read_file(bgs_shapefile)
+        print( "Converting blockgroups file to GeoParquet")
+        bgs = read_archived_shapefile(bgs_dl_file)
         bgs = bgs.to_crs({'init': u'epsg:4326'})
-        bgs.to_file(blockgroups_file, driver='GeoJSON')
-
-        # cleanup geojson dir
-        shapefile_prefix = glob(geojson_path + '*shp')[0].split(
-                geojson_path)[1].split('.')[0]
-        shapefiles = glob(geojson_path + shapefile_prefix + '*')
-        for f in shapefiles:
-            os.remove(f)
-        os.remove(bgs_dl_file)
+        write_layer(bgs, blockgroups_file)
 
 # TODO
 # def find_tracts_in_district(state='48', district='07'):
 
 
-def find_blockgroups_in_district(state=48, district=7, leg_body='US-REP', year='2015', debug_is_on=False):
-    """Find the blockgroups that intersect with a legislative district, e.g., US Congressional District.
+def select_geounits_in_district(geounits, district_boundary, threshold=0.10):
+    """Select the geounits, e.g., block groups or voting precincts, that are in a district
+    A geounit is in the district if it intersects the district, does not merely touch 
+    its boundary, and at least threshold of its area falls inside the district.
     Args:
-        state: The state of the district
-        district: district number
-        leg_body: legislative body, e.g., State Representative, State Senate, 
-                  or US Representative
-        year: year associated with the district data
-        debug_is_on: boolean providing whether to print debug output
-    """
-    shapfile_path = None
+        geounits: GeoDataFrame of the geounits to select from
+        district_boundary: shapely geometry of the district boundary
+        threshold: minimum share of a geounit's area inside the district
+    Returns:
+        in_district_bool: boolean Series of the geounits in the district
+        touching_bool: boolean Series of the geounits that only touch the district boundary
+        below_threshold_bool: boolean Series of the geounits removed by the threshold
+    Raises:
+        Nothing
+    """
+    in_district_bool = pd.Series(False, index=geounits.index)
+    touching_bool = pd.Series(False, index=geounits.index)
+    below_threshold_bool = pd.Series(False, index=geounits.index)
+
+    # use the spatial index (STRtree) to prefilter the candidates on the 
+    # district's bounding box, then test the candidates exactly
+    candidate_positions = geounits.sindex.query(district_boundary, predicate='intersects')
+    candidates = geounits.iloc[candidate_positions]
+
+    touching = candidates.touches(district_boundary)
+    touching_bool.loc[touching[touching].index] = True
+    candidates = candidates[~touching]
+
+    shares = candidates.intersection(district_boundary).area / candidates.area
+    below_threshold = shares < threshold
+    below_threshold_bool.loc[below_threshold[below_threshold].index] = True
+    in_district_bool.loc[below_threshold[~below_threshold].index] = True
+
+    return in_district_bool, touching_bool, below_threshold_bool
+
+
+def select_geounits_in_districts(geounits, districts, threshold=0.10):
+    """Select the geounits that are in each of several districts with one spatial join
+    Applies the same rules as select_geounits_in_district() to every 
+    (geounit, district) pair that intersects.
+    Args:
+        geounits: GeoDataFrame of the geounits to select from
+        districts: GeoSeries of the district boundaries
+        threshold: minimum share of a geounit's area inside a district
+    Returns:
+        membership: DataFrame with the geounit position and district index of 
+            each geounit in a district
+    Raises:
+        Nothing
+    """
+    # query the spatial index (STRtree) with all the districts at once
+    district_positions, geounit_positions = geounits.sindex.query(
+            districts.values, predicate='intersects')
+    
+    geounit_shapes = geounits.geometry.values[geounit_positions]
+    district_shapes = districts.values[district_positions]
+    
+    touching = geounit_shapes.touches(district_shapes)
+    shares = geounit_shapes.intersection(district_shapes).area / geounit_shapes.area
+    in_district = (~touching) & (shares >= threshold)
+
+    membership = pd.DataFrame({
+            'geounit': geounit_positions[in_district],
+            'district': districts.index.values[district_positions[in_district]]
+        })
+
+    return membership
+
+
+def find_blockgroups_in_district(state=48, district=7, leg_body='US-REP', year='2015', debug_is_on=False):
+    """Find the blockgroups that intersect with a legislative district, e.g., US Congressional District.
+    Args:
+        state: The state of the district
+        district: district number
+        leg_body: legislative body, e.g., State Representative, State Senate, 
+                  or US Representative
+        year: year associated with the district data
+        debug_is_on: boolean providing whether to print debug output
+    """
+    shapfile_path = None
     bgs_in_district_GeoJSON = get_bgs_in_district_geojson_filename(state=state, district=district, leg_body=leg_body)
     bgs_in_district_JSON = get_bgs_in_district_json_filename(state=state, district=district, leg_body=leg_body)
     district_file = get_district_geojson_filename(state=state, district=district, leg_body=leg_body)
-    blockgroups_file = get_state_blockgroups_geojson_filename(state=state)
+    blockgroups_file = get_state_blockgroups_filename(state=state)
     
     if (not os.path.isfile(bgs_in_district_JSON)) or (not os.path.isfile(bgs_in_district_GeoJSON) ):
         get_district_file(state=state, district=district, leg_body=leg_body)
@@ -561,57 +1269,19 @@ def find_blockgroups_in_district(state=48, district=7, leg_body='US-REP', year='
             state=state, district=district, leg_body=leg_body, year=year)
         
         print( "Finding blockgroups in district" )
-        district = gpd.read_file(district_file)
-        block_groups = gpd.read_file(blockgroups_file)
-        
-        print( "Finding blockgroups that touch the district boundary" )
-        bgs_touching_district_bool = block_groups.touches(district.geometry[0])
-        
-        print( "Finding blockgroups that intersect the district boundary")
-        bgs_intersecting_district_bool = block_groups.intersects(district.geometry[0])
+        district = read_layer(district_file)
+        # only read the blockgroups within the bounds of the district
+        block_groups = read_layer(blockgroups_file, bbox=tuple(district.total_bounds))
+        block_groups = block_groups.reset_index(drop=True)
         
         print( "Filtering the blockgroups" )
-        for index in bgs_touching_district_bool[bgs_touching_district_bool==True].index:
-            bgs_intersecting_district_bool.loc[index] = False
-
-        bgs_in_district = block_groups[bgs_intersecting_district_bool]
- 
-        print( "Finding blockgroups to filter based on threshold" )
-        intersections = bgs_in_district.intersection(district.geometry[0])
-
-        areas_of_intersections = intersections.area
-        indx_out = []
-        for bg_index, bg in bgs_in_district.iterrows():
-            area_of_intersection = areas_of_intersections[bg_index]
-            bg_area = GeoSeries(bg.geometry).area[0]
-
-            share_of_intersection = area_of_intersection / bg_area
-            
-            if share_of_intersection < 0.10:
-                indx_out.append(bg_index)
-
-            #print( "\nBlock Group: ", bg.GEOID )
-            #print( "Area: ", str(bg_area) )
-            #print( "Share of Intersection: ", str(share_of_intersection) )
-        
-        bgs_to_remove_bool = pd.Series([False]*len(block_groups))
-
-        for index in indx_out:
-            bgs_to_remove_bool.loc[index] = True
+        bgs_in_district_bool, bgs_touching_district_bool, bgs_to_remove_bool = select_geounits_in_district(
+                block_groups, district.geometry[0])
 
         bgs_to_remove = block_groups[bgs_to_remove_bool]
+        bgs_in_district = block_groups[bgs_in_district_bool]
 
-        for index in bgs_to_remove_bool[bgs_to_remove_bool==True].index:
-            bgs_intersecting_district_bool.loc[index] = False
-
-        bgs_in_district = block_groups[bgs_intersecting_district_bool]
-
-        # See issue #367 https://github.com/geopandas/geopandas/issues/367
-        try: 
-            os.remove(bgs_in_district_GeoJSON)
-        except OSError:
-            pass
-        bgs_in_district.to_file(bgs_in_district_GeoJSON, driver='GeoJSON')
+        write_layer(bgs_in_district, bgs_in_district_GeoJSON)
         
         # Create json file of geo units
         bgs_in_district[['BLKGRPCE','COUNTYFP', 'STATEFP', 'TRACTCE', 'GEOID']].to_json(bgs_in_district_JSON)
@@ -652,7 +1322,7 @@ def find_voting_precincts_in_district(state=48, district=7, leg_body='US-REP'):
             state=state, district=district, leg_body=leg_body)
     
     if not os.path.isfile(vps_in_district_GeoJSON):
-        voting_precincts_file = get_statewide_voting_precincts_geojson_filename(state)
+        voting_precincts_file = get_statewide_voting_precincts_filename(state)
     
         district_file = get_district_geojson_filename(
             state=state, district=district, leg_body=leg_body)
@@ -662,61 +1332,147 @@ def find_voting_precincts_in_district(state=48, district=7, leg_body='US-REP'):
         get_statewide_voting_precincts(state=state)
         
         print( "Finding voting precincts in district" )
-        district_boundary = gpd.read_file(district_file)
-        voting_precincts = gpd.read_file(voting_precincts_file)
+        district_boundary = read_layer(district_file)
+        # only read the voting precincts within the bounds of the district
+        voting_precincts = read_layer(voting_precincts_file, bbox=tuple(district_boundary.total_bounds))
+        voting_precincts = voting_precincts.reset_index(drop=True)
         
-        print( "Finding voting precincts that touch the district boundary" )
-        vps_touching_district_bool = voting_precincts.touches(district_boundary.geometry[0])
-            
-        print( "Finding voting precincts that intersect the district boundary" )
-        vps_intersecting_district_bool = voting_precincts.intersects(district_boundary.geometry[0])
-            
         print( "Filtering the voting precincts" )
-        for index in vps_touching_district_bool[vps_touching_district_bool==True].index:
-            vps_intersecting_district_bool.loc[index] = False
-
-        vps_in_district = voting_precincts[vps_intersecting_district_bool]
-     
-        print( "Finding blockgroups to filter based on threshold" )
-        intersections = vps_in_district.intersection(district_boundary.geometry[0])
-
-        areas_of_intersections = intersections.area
-        indx_out = []
-        for vp_index, vp in vps_in_district.iterrows():
-            area_of_intersection = areas_of_intersections[vp_index]
-            vp_area = GeoSeries(vp.geometry).area[0]
-
-            share_of_intersection = area_of_intersection / vp_area
-                
-            if share_of_intersection < 0.10:
-                indx_out.append(vp_index)
-
-            #print( "\nBlock Group: ", bg.GEOID )
-            #print( "Area: ", str(bg_area) )
-            #print( "Share of Intersection: ", str(share_of_intersection) )
-            
-        vps_to_remove_bool = pd.Series([False]*len(voting_precincts))
+        vps_in_district_bool, vps_touching_district_bool, vps_to_remove_bool = select_geounits_in_district(
+                voting_precincts, district_boundary.geometry[0])
+
+        vps_in_district = voting_precincts[vps_in_district_bool]
+        if 'PREC' in list(vps_in_district.columns.values):
+            vps_in_district = vps_in_district.rename(columns={'PREC':'PRECINCT'})
+
+        write_layer(vps_in_district, vps_in_district_GeoJSON)
+        
+        vps_in_district.sort_values(by=['PRECINCT'])[['PRECINCT']].to_csv("vps.csv", index=False)
+
+
+def find_geounits_in_districts(state=48, districts=[7], leg_body='US-REP', geounits_file=None):
+    """Split a statewide geounits layer into the geounits in each district
+    The statewide layers are read once, and the membership for all the districts 
+    is found with one spatial join.
+    Args:
+        state: state of the districts
+        districts: list of district numbers
+        leg_body: legislative body, e.g., State Representative, State Senate, 
+                  or US Representative
+        geounits_file: statewide layer of the geounits, e.g., the block groups
+    Returns:
+        geounits_in_districts: dict of district number to the GeoDataFrame of its geounits
+    Raises:
+        Nothing
+    """
+    get_state_districts_file(state=state, leg_body=leg_body)
+    state_districts = read_layer(get_state_districts_filename(state=state, leg_body=leg_body))
+    state_districts.index = get_district_numbers(state_districts, leg_body=leg_body)
+    state_districts = state_districts[state_districts.index.isin([int(d) for d in districts])]
+
+    # only read the geounits within the bounds of the districts
+    geounits = read_layer(geounits_file, bbox=tuple(state_districts.total_bounds))
+    geounits = geounits.reset_index(drop=True)
+    
+    membership = select_geounits_in_districts(geounits, state_districts.geometry)
+    
+    geounits_in_districts = dict((int(d), geounits.iloc[0:0]) for d in districts)
+    for district, district_membership in membership.groupby('district'):
+        geounits_in_districts[int(district)] = geounits.iloc[
+                np.sort(district_membership['geounit'].values)]
+
+    return geounits_in_districts
+
+
+def find_blockgroups_in_districts(state=48, districts=[7], leg_body='US-REP', year='2015'):
+    """Find the blockgroups in each of several districts
+    Args:
+        state: state of the districts
+        districts: list of district numbers
+        leg_body: legislative body, e.g., State Representative, State Senate, 
+                  or US Representative
+        year: year associated with the district data
+    Returns:
+        Nothing
+    Raises:
+        Nothing
+    """
+    missing_districts = []
+    for district in districts:
+        get_district_file(state=state, district=district, leg_body=leg_body)
+        bgs_in_district_GeoJSON = get_bgs_in_district_geojson_filename(
+                state=state, district=district, leg_body=leg_body)
+        bgs_in_district_JSON = get_bgs_in_district_json_filename(
+                state=state, district=district, leg_body=leg_body)
+        if (not os.path.isfile(bgs_in_district_JSON)) or (not os.path.isfile(bgs_in_district_GeoJSON) ):
+            missing_districts.append(district)
+    
+    if len(missing_districts) == 0:
+        return
 
-        for index in indx_out:
-            vps_to_remove_bool.loc[index] = True
+    get_state_blockgroups_file(state=state, leg_body=leg_body, year=year)
+    
+    print( "Finding blockgroups in {n} districts".format(n=len(missing_districts)) )
+    bgs_in_districts = find_geounits_in_districts(
+            state=state, 
+            districts=missing_districts, 
+            leg_body=leg_body, 
+            geounits_file=get_state_blockgroups_filename(state=state)
+        )
+    
+    for district in missing_districts:
+        bgs_in_district = bgs_in_districts[int(district)]
+        
+        write_layer(bgs_in_district, get_bgs_in_district_geojson_filename(
+                state=state, district=district, leg_body=leg_body))
+        
+        # Create json file of geo units
+        bgs_in_district_JSON = get_bgs_in_district_json_filename(
+                state=state, district=district, leg_body=leg_body)
+        mkdir_p(os.path.dirname(bgs_in_district_JSON))
+        bgs_in_district[['BLKGRPCE','COUNTYFP', 'STATEFP', 'TRACTCE', 'GEOID']].to_json(bgs_in_district_JSON)
 
-        vps_to_remove = voting_precincts[vps_to_remove_bool]
 
-        for index in vps_to_remove_bool[vps_to_remove_bool==True].index:
-            vps_intersecting_district_bool.loc[index] = False
+def find_voting_precincts_in_districts(state=48, districts=[7], leg_body='US-REP'):
+    """Find the voting precincts in each of several districts
+    Args:
+        state: state of the districts
+        districts: list of district numbers
+        leg_body: legislative body, e.g., State Representative, State Senate, 
+                  or US Representative
+    Returns:
+        Nothing
+    Raises:
+        Nothing
+    """
+    missing_districts = []
+    for district in districts:
+        get_district_file(state=state, district=district, leg_body=leg_body)
+        vps_in_district_GeoJSON  = get_voting_precincts_geojson_filename(
+                state=state, district=district, leg_body=leg_body)
+        if not os.path.isfile(vps_in_district_GeoJSON):
+            missing_districts.append(district)
+    
+    if len(missing_districts) == 0:
+        return
 
-        vps_in_district = voting_precincts[vps_intersecting_district_bool]
+    get_statewide_voting_precincts(state=state)
+    
+    print( "Finding voting precincts in {n} districts".format(n=len(missing_districts)) )
+    vps_in_districts = find_geounits_in_districts(
+            state=state, 
+            districts=missing_districts, 
+            leg_body=leg_body, 
+            geounits_file=get_statewide_voting_precincts_filename(state)
+        )
+    
+    for district in missing_districts:
+        vps_in_district = vps_in_districts[int(district)]
         if 'PREC' in list(vps_in_district.columns.values):
             vps_in_district = vps_in_district.rename(columns={'PREC':'PRECINCT'})
-
-        # See issue #367 https://github.com/geopandas/geopandas/issues/367
-        try: 
-            os.remove(vps_in_district_GeoJSON)
-        except OSError:
-            pass
-        vps_in_district.to_file(vps_in_district_GeoJSON, driver='GeoJSON')
         
-        vps_in_district.sort_values(by=['PRECINCT'])[['PRECINCT']].to_csv("vps.csv", index=False)
+        write_layer(vps_in_district, get_voting_precincts_geojson_filename(
+                state=state, district=district, leg_body=leg_body))
 
 
 def get_district_centroid(state=48, district=7, leg_body='US-REP', year='2015'):
@@ -737,7 +1493,7 @@ def get_district_centroid(state=48, district=7, leg_body='US-REP', year='2015'):
     
     get_district_file(state=state, district=district, leg_body=leg_body)
 
-    district = gpd.read_file(district_file)
+    district = read_layer(district_file)
 
     longitude = district.geometry.centroid[0].x
     latitude = district.geometry.centroid[0].y
@@ -745,18 +1501,159 @@ def get_district_centroid(state=48, district=7, leg_body='US-REP', year='2015'):
     return (longitude, latitude)
 
 
-def get_blockgroup_census_data(api, fields, census_data = {}, state=48, district=7, leg_body='US-REP', year='2015'):
+class TokenBucket(object):
+    """Token bucket rate limiter that can be shared between threads
+    Attributes:
+        rate: number of tokens added per second
+        capacity: maximum number of tokens, i.e., the largest burst, 
+            at least one token, so a rate below 1 still allows a request
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(capacity or rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                # allow for rounding, so a refilled token is never a hair short
+                if self.tokens >= 1.0 - 1e-9:
+                    self.tokens = max(0.0, self.tokens - 1.0)
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimitedSession(requests.Session):
+    """requests Session that takes a token from a TokenBucket before each request
+    GET requests that fail with a connection error or one of the retry statuses 
+    are retried with exponential backoff, or after the time given by a Retry-After 
+    header; every attempt takes its own token, so retries are rate limited too.
+    Attributes:
+        rate_limiter: TokenBucket shared by the threads using the session
+        retries: number of times to retry a failed request
+        backoff_factor: seconds to wait before the first retry, doubled for each retry
+        retry_statuses: http status codes that are retried
+    """
+    def __init__(self, rate_limiter, retries=CENSUS_RETRIES, backoff_factor=CENSUS_BACKOFF_FACTOR,
+            retry_statuses=CENSUS_RETRY_STATUSES):
+        super(RateLimitedSession, self).__init__()
+        self.rate_limiter = rate_limiter
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.retry_statuses = retry_statuses
+
+    def request(self, method, url, *args, **kwargs):
+        retries = self.retries if method.upper() == 'GET' else 0
+        for attempt in range(retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                response = super(RateLimitedSession, self).request(method, url, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == retries:
+                    raise
+                wait = self.backoff_factor * 2 ** attempt
+            else:
+                if response.status_code not in self.retry_statuses or attempt == retries:
+                    return response
+                wait = self.backoff_factor * 2 ** attempt
+                retry_after = response.headers.get('Retry-After', '')
+                if retry_after.isdigit():
+                    wait = int(retry_after)
+                response.close()
+            time.sleep(wait)
+
+
+def get_census_session(workers=CENSUS_WORKERS, requests_per_second=CENSUS_REQUESTS_PER_SECOND, 
+        retries=CENSUS_RETRIES):
+    """Return a rate limited requests Session for the Census API
+    The session reuses up to workers connections and retries requests that fail 
+    with 429 or 5xx responses using exponential backoff; see RateLimitedSession.
+    Args:
+        workers: number of threads sharing the session
+        requests_per_second: maximum rate of requests to the Census API
+        retries: number of times to retry a failed request
+    Returns:
+        session: requests Session to pass to Census()
+    Raises:
+        Nothing
+    """
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+
+    session = RateLimitedSession(TokenBucket(requests_per_second), retries=retries)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    return session
+
+
+def get_blockgroup_queries(bgs_in_district, batch_by='county'):
+    """Return the geographies to query from api.census.gov for the block groups in a district
+    Args:
+        bgs_in_district: DataFrame of the block groups in the district with the 
+            columns STATEFP, COUNTYFP, TRACTCE, and BLKGRPCE
+        batch_by: 'county' queries all block groups in a county at once (block group:*),
+            'tract' queries all block groups in a tract at once, 
+            and None queries each block group separately
+    Returns:
+        queries: a list of dictionaries with the keyword arguments for 
+            census_query.acs5.state_county_blockgroup()
+    Raises:
+        ValueError
+    """
+    if batch_by == 'county':
+        geo_columns = ['STATEFP', 'COUNTYFP']
+    elif batch_by == 'tract':
+        geo_columns = ['STATEFP', 'COUNTYFP', 'TRACTCE']
+    elif batch_by is None:
+        geo_columns = ['STATEFP', 'COUNTYFP', 'TRACTCE', 'BLKGRPCE']
+    else:
+        raise ValueError("batch_by must be 'county', 'tract', or None")
+
+    queries = []
+    for geo_values in bgs_in_district[geo_columns].drop_duplicates().itertuples(index=False):
+        geo = dict(zip(geo_columns, geo_values))
+        queries.append({
+                'state_fips': geo['STATEFP'],
+                'county_fips': geo['COUNTYFP'],
+                'tract': geo.get('TRACTCE', Census.ALL),
+                'blockgroup': geo.get('BLKGRPCE', Census.ALL)
+            })
+
+    return queries
+
+
+def get_blockgroup_census_data(api, fields, census_data = {}, state=48, district=7, leg_body='US-REP', year='2015', 
+        batch_by='county', workers=CENSUS_WORKERS, geoids=None, census_cache_path=None, 
+        requests_per_second=CENSUS_REQUESTS_PER_SECOND):
     """Retrieve the census data for the block groups in a District
     Args:
         api: Census api key
         fields: the fields to query from api.census.gov; 
             See e.g., https://api.census.gov/data/2015/acs5/variables.html
+            The census library splits the fields into requests of 50 or fewer variables.
         year: The year the census data was collected
         state: state of the district
         district: district number
         leg_body: legislative body, e.g., State Representative, State Senate, 
                   or US Representative
         year: year associated with district data
+        batch_by: query the block groups per 'county', per 'tract', or 
+            one at a time (None); see get_blockgroup_queries()
+        workers: number of concurrent requests to api.census.gov
+        geoids: the block groups to get; None gets all the block groups in the district
+        census_cache_path: if given, write the results of each request to the census cache 
+            as they arrive, so an interrupted download resumes where it left off; 
+            the block groups a request does not return are cached as null, so they 
+            are not requested again
+        requests_per_second: maximum rate of requests to the Census API
     Returns:
         census_data: a list of dictionaries storing the blockgroup results
     Raises
@@ -770,45 +1667,66 @@ def get_blockgroup_census_data(api, fields, census_data = {}, state=48, district
             census_data[year][blockgroup_key] = { }
     # TODO make dynamic to state and district
 
-    state = "{0:0>2}".format(state)
-    district = "{0:0>2}".format(district)
-    
-    state_abbr = str(states.mapping('fips', 'abbr')[state])
-    district_abbr = leg_body + '-' + state_abbr + district
-    data_path = 'static/data/'
-    bgs_in_district_JSON = data_path + district_abbr + '-blockgroups.json'
+    bgs_in_district_JSON = get_bgs_in_district_json_filename(
+            state=state, district=district, leg_body=leg_body)
 
-    bgs_in_district = pd.read_json(bgs_in_district_JSON)
+    # keep the FIPS codes as strings, e.g., tract 000100
+    bgs_in_district = pd.read_json(bgs_in_district_JSON, dtype=False)
+    bgs_in_district['GEOID'] = bgs_in_district['GEOID'].astype(str)
+    if geoids is not None:
+        bgs_in_district = bgs_in_district[bgs_in_district['GEOID'].isin(set(str(geoid) for geoid in geoids))]
+    district_geoids = set(bgs_in_district['GEOID'])
     
     # Setup Census query
-    census_query = Census(api, year=int(year))
-    num_of_bgs = len(bgs_in_district)
-    i = 0.0
+    census_query = Census(api, year=int(year), 
+            session=get_census_session(workers=workers, requests_per_second=requests_per_second))
+    queries = get_blockgroup_queries(bgs_in_district, batch_by=batch_by)
     pbar = tqdm(
-            total=num_of_bgs, initial=0, 
+            total=len(queries), initial=0, 
             unit_scale=True, desc='Downloading Blockgroups'
         )
-    for bg_index, bg in bgs_in_district.iterrows():
-        bg_stats = census_query.acs5.state_county_blockgroup(
-                        fields=fields, 
-                        state_fips=bg['STATEFP'], 
-                        county_fips=bg['COUNTYFP'], 
-                        blockgroup=bg['BLKGRPCE'],
-                        tract=bg['TRACTCE']
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = dict(
+                (executor.submit(census_query.acs5.state_county_blockgroup, fields=fields, **query), query)
+                for query in queries 
+            )
+        for future in as_completed(futures):
+            results = future.result()
+        
+            # keep the block groups in the district
+            query_data = {}
+            for bg_stats in results:
+                geoid = bg_stats['state'] + bg_stats['county'] + bg_stats['tract'] + bg_stats['block group']
+                if geoid in district_geoids:
+                    query_data[geoid] = bg_stats
+            if census_cache_path is not None:
+                # the geoids of the block groups in the query start with its FIPS codes
+                query = futures[future]
+                query_prefix = ''.join(
+                        code for code in (query['state_fips'], query['county_fips'], 
+                            query['tract'], query['blockgroup']) 
+                        if code != Census.ALL
                     )
-        bg_stats = bg_stats[0]
-        geoid = str(bg['GEOID'])
-        if geoid in census_data[year][blockgroup_key].keys():
-            census_data[year][blockgroup_key][geoid].update(bg_stats)
-        else:
-            census_data[year][blockgroup_key][geoid] = bg_stats
-        # print percent complete
-        pbar.update(1)
+                null_rows = dict(
+                        (geoid, dict.fromkeys(fields)) for geoid in district_geoids 
+                        if geoid.startswith(query_prefix) and geoid not in query_data
+                    )
+                write_census_cache(dict(query_data, **null_rows), fields, year, blockgroup_key, 
+                        census_cache_path=census_cache_path)
+            
+            for geoid, bg_stats in query_data.items():
+                if geoid in census_data[year][blockgroup_key].keys():
+                    census_data[year][blockgroup_key][geoid].update(bg_stats)
+                else:
+                    census_data[year][blockgroup_key][geoid] = bg_stats
+            # print percent complete
+            pbar.update(1)
     pbar.close()
     return census_data
 
 
-def get_district_census_data(api, fields, census_data = {}, state=48, district=7, leg_body='US-REP', year='2015'):
+def get_district_census_data(api, fields, census_data = {}, state=48, district=7, leg_body='US-REP', year='2015', 
+        requests_per_second=CENSUS_REQUESTS_PER_SECOND):
     """Retrieve the census data for the entire district
     Args:
         api: Census api key
@@ -819,6 +1737,7 @@ def get_district_census_data(api, fields, census_data = {}, state=48, district=7
         leg_body: legislative body, e.g., State Representative, State Senate, 
                   or US Representative
         year: year associated with disctrict data
+        requests_per_second: maximum rate of requests to the Census API
     Returns:
         census_data: a list of dictionaries storing the census data
     Raises
@@ -835,7 +1754,8 @@ def get_district_census_data(api, fields, census_data = {}, state=48, district=7
         state = "{0:0>2}".format(state)
         district = "{0:0>2}".format(district)
         # Setup Census query
-        census_query = Census(api, year=int(year))
+        census_query = Census(api, year=int(year), 
+                session=get_census_session(workers=1, requests_per_second=requests_per_second))
         district_stats = census_query.acs5.get(
                         fields,
                         {   'for': 'congressional district:' + district,
@@ -849,6 +1769,8 @@ def get_district_census_data(api, fields, census_data = {}, state=48, district=7
 
 def to_json(data, out_filename='static/data/out.json'):
     """Convert data to json
+    The file is written to a temporary file and renamed into place, so statserver 
+    never loads a partial file, and then its precompressed copies are written.
     Args: 
         data: a python data structure
         out_filename: the file the data is saved to 
@@ -857,39 +1779,206 @@ def to_json(data, out_filename='static/data/out.json'):
     Raises:
         Nothing (yet)
     """
-    with open(out_filename, 'w') as outfile:  
+    fd, out_tmp_filename = tempfile.mkstemp(dir=os.path.dirname(out_filename) or '.', suffix='.tmp')
+    with os.fdopen(fd, 'w') as outfile:  
         json.dump(data, outfile)
+    os.replace(out_tmp_filename, out_filename)
 
+    compress_file(out_filename)
 
-def get_census_fields_by_table(table, year='2015'):
-    """Return the fields in a census table
+
+def compress_file(filename):
+    """Write the precompressed copies of a file served by statserver
+    A gzip copy (filename.gz) is always written, and a brotli copy (filename.br) 
+    is written if the brotli library is installed; otherwise a stale brotli copy 
+    is removed.
+    Args: 
+        filename: the file to compress
+    Returns: 
+        Nothing
+    Raises:
+        Nothing (yet)
+    """
+    with open(filename, 'rb') as infile:
+        data = infile.read()
+
+    compressed_files = [(filename + '.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        compressed_files.append((filename + '.br', brotli.compress(data)))
+    elif os.path.isfile(filename + '.br'):
+        os.remove(filename + '.br')
+
+    # write to temporary files, so a partial copy is never served
+    for compressed_file, compressed_data in compressed_files:
+        compressed_tmp_file = compressed_file + '.' + uuid.uuid4().hex + '.tmp'
+        with open(compressed_tmp_file, 'wb') as outfile:
+            outfile.write(compressed_data)
+        os.replace(compressed_tmp_file, compressed_file)
+
+
+def get_census_variables_index(year='2015'):
+    """Return the filename of the index of the census variables catalog for a year
+    The index is a SQLite file of the estimate variables, e.g., B01001_001E, keyed by 
+    their table. It is compiled the first time it is needed, so the variables json file 
+    is parsed at most once per year.
     Args: 
-        table: the table name  
         year: year of census data 
     Returns: 
-        fields: 
-        labels: 
+        index_file: filename of the SQLite index
     Raises:
         Nothing (yet)
     """
+    index_file = 'static/data/variables_' + year + '.sqlite'
+    if os.path.isfile(index_file):
+        return index_file
+
     variables_file = 'static/data/variables_' + year + '.json'
     if not os.path.isfile(variables_file):
         url = 'https://api.census.gov/data/' + year + '/acs/acs5/variables.json'
         download_file(url, variables_file)
 
+    print( "Indexing {variables}".format(variables=variables_file) )
+    with open(variables_file) as variables:
+        data = json.load(variables)
+
+    rows = []
+    for key, variable in data['variables'].items():
+        match = re.match('^([A-Z0-9]+)_[0-9]+E$', key)
+        if match:
+            rows.append((key, match.group(1), variable['label']))
+
+    # build the index in a unique temporary file, so a partial index is never used, 
+    # and processes building the same index do not write to the same file
+    fd, index_tmp_file = tempfile.mkstemp(dir=os.path.dirname(index_file) or '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        connection = sqlite3.connect(index_tmp_file)
+        with connection:
+            connection.execute(
+                    'CREATE TABLE variables (name TEXT PRIMARY KEY, census_table TEXT, label TEXT)')
+            connection.executemany('INSERT INTO variables VALUES (?, ?, ?)', rows)
+            connection.execute('CREATE INDEX variables_by_table ON variables (census_table, name)')
+        connection.close()
+        os.replace(index_tmp_file, index_file)
+    except BaseException:
+        os.remove(index_tmp_file)
+        raise
+
+    return index_file
+
+
+def get_census_fields_by_table(table, year='2015'):
+    """Return the fields in a census table
+    Args: 
+        table: the table name  
+        year: year of census data 
+    Returns: 
+        fields: sorted list of the estimate fields in the table
+        labels: dict of field -> label
+    Raises:
+        Nothing (yet)
+    """
+    index_file = get_census_variables_index(year=year)
+
     fields = []
     labels = {}
 
-    with open(variables_file) as variables:
-        data = json.load(variables)
-        for key in data['variables']:
-            if re.match(table+'_[0-9]*E', key):
-                fields.append(key)
-                labels[key]=data['variables'][key]['label']
+    connection = sqlite3.connect(index_file)
+    with connection:
+        rows = connection.execute(
+                'SELECT name, label FROM variables WHERE census_table = ? ORDER BY name', (table,))
+        for key, label in rows:
+            fields.append(key)
+            labels[key] = label
+    connection.close()
     
     return fields, labels
 
 
+def get_catalog_variables(year='2015'):
+    """Return the names of the variables in the variables catalog of a year
+    The names are read from the SQLite index once per year, and again only if the 
+    index is rebuilt.
+    Args: 
+        year: year of census data 
+    Returns: 
+        catalog_variables: frozenset of the variable names
+    Raises:
+        Nothing
+    """
+    index_file = get_census_variables_index(year=year)
+    index_stat = os.stat(index_file)
+    index_version = (os.path.abspath(index_file), index_stat.st_mtime_ns, index_stat.st_size)
+
+    with CATALOG_VARIABLES_LOCK:
+        cached_version, catalog_variables = CATALOG_VARIABLES.get(year, (None, None))
+        if cached_version != index_version:
+            connection = sqlite3.connect(index_file)
+            with connection:
+                catalog_variables = frozenset(
+                        row[0] for row in connection.execute('SELECT name FROM variables'))
+            connection.close()
+            CATALOG_VARIABLES[year] = (index_version, catalog_variables)
+
+    return catalog_variables
+
+
+def validate_census_fields(year='2015'):
+    """Check that every census field in the census classes exists in the variables catalog
+    Args: 
+        year: year of census data 
+    Returns: 
+        Nothing
+    Raises:
+        ValueError: if a census field is not in the variables catalog of the year
+    """
+    catalog_variables = get_catalog_variables(year=year)
+
+    missing_fields = CensusFields.registry.validate(catalog_variables)
+    if len(missing_fields) > 0:
+        raise ValueError( "Census fields missing from the {year} variables catalog: {fields}".format(
+            year=year, fields=", ".join(missing_fields)) )
+
+
+def get_category_census_fields(category, year='2015'):
+    """Return the census fields needed to build a category
+    Args: 
+        category: the category, e.g., Age or Income
+        year: year of census data 
+    Returns: 
+        census_fields: list of the census fields
+    Raises:
+        ValueError: if a census field is not in the variables catalog of the year
+    """
+    validate_census_fields(year=year)
+
+    census_fields = list(CensusFields.registry.category_fields[category])
+
+    return census_fields
+
+
+def plan_census_fields(categories, year='2015'):
+    """Return the union of the census fields needed to build several categories, 
+    so they can be fetched in one pass
+    Args: 
+        categories: list of the categories, e.g., ['Age', 'Income']
+        year: year of census data 
+    Returns: 
+        census_fields: list of the census fields for all the categories
+        category_fields: dict of category -> list of its census fields
+    Raises:
+        ValueError: if a census field is not in the variables catalog of the year
+    """
+    validate_census_fields(year=year)
+
+    census_fields = CensusFields.registry.get_fields(categories)
+    category_fields = OrderedDict( 
+            (category, list(CensusFields.registry.category_fields[category])) 
+            for category in categories )
+
+    return census_fields, category_fields
+
+
 def load_district_data(district_data_file='static/data/district-data.json', 
         state=48, district=7, year='2015'):
     """
@@ -910,12 +1999,71 @@ def load_district_data(district_data_file='static/data/district-data.json',
 
     return district_data
 
-def make_class_data(census_data_in_district, census_classes, category= {}, district_data={}, 
+def get_census_matrix(census_rows, fields):
+    """Return the census data of several geounits as a matrix of geoids by census fields
+    Args:
+        census_rows: dict of geoid to a dict of the census data of the geoid, 
+            e.g., census_data[year]['bg']
+        fields: list of the census fields, i.e., the columns of the matrix
+    Returns:
+        geoids: list of the geoids, i.e., the rows of the matrix
+        census_matrix: int64 ndarray (geoids x fields); a value that is missing 
+            or not a number, e.g., of a block group the API returned as null, is 0
+    Raises:
+        Nothing
+    """
+    geoids = list(census_rows.keys())
+    if len(geoids) == 0:
+        return geoids, np.zeros((0, len(fields)), dtype=np.int64)
+
+    census_frame = pd.DataFrame.from_dict(census_rows, orient='index')
+    census_frame = census_frame.reindex(index=geoids, columns=fields).apply(pd.to_numeric, errors='coerce')
+    census_matrix = census_frame.fillna(0).round().astype(np.int64).values
+
+    return geoids, census_matrix
+
+
+def get_class_matrix(class_groups):
+    """Return the aggregation matrix of several groups of census classes
+    Args:
+        class_groups: list of class groups in CensusFields.registry, e.g., ['age']
+    Returns:
+        census_classes: list of the CensusClass of the groups, i.e., the columns
+        fields: list of the census fields, i.e., the rows
+        class_matrix: int64 ndarray (fields x classes)
+    Raises:
+        Nothing
+    """
+    registry = CensusFields.registry
+
+    census_classes = []
+    fields = []
+    for group in class_groups:
+        census_classes.extend(registry.classes[group])
+        fields.extend(registry.class_matrices[group][0])
+    fields = sorted(set(fields), key=registry.variable_index.get)
+    field_rows = dict((field, row) for row, field in enumerate(fields))
+
+    # place each group's compiled matrix in the rows of its fields
+    class_matrix = np.zeros((len(fields), len(census_classes)), dtype=np.int64)
+    column = 0
+    for group in class_groups:
+        group_fields, group_matrix = registry.class_matrices[group]
+        rows = [field_rows[field] for field in group_fields]
+        class_matrix[rows, column:column + group_matrix.shape[1]] = group_matrix
+        column = column + group_matrix.shape[1]
+
+    return census_classes, fields, class_matrix
+
+
+def make_class_data(census_data_in_district, class_groups, category= {}, district_data={}, 
         state=48, district=7, leg_body='US-REP', year='2015', geo_key='bg' ):
     """Populate Census classes
+    The totals of all the classes for all the geounits are a single matrix product 
+    of the census matrix and the aggregation matrix of the classes.
     Args:
         census_data_in_district:
-        census_class:
+        class_groups: list of class groups in CensusFields.registry, e.g., ['age']
     Returns: 
         district_data:
     Raises:
@@ -927,38 +2075,30 @@ def make_class_data(census_data_in_district, census_classes, category= {}, distr
         if geo_key not in district_data[year].keys():
             district_data[year][geo_key] = {}
     
-    if geo_key is not 'district':    
-        for geoid, census_data in census_data_in_district[year][geo_key].items():
-            if geoid not in district_data[year][geo_key].keys():
-                district_data[year][geo_key][geoid] = {}
-
-            # Census classes
-            for census_class, census_class_row in census_classes.items():
-                # Add up the total of this census_class, e.g., (18-29) or 30s
-                census_class_total = 0
-
-                for census_subclass in census_class_row['fields']:
-                    census_subclass_value = int(census_data[census_subclass])
-                    census_class_total =  census_class_total + census_subclass_value
-
-                # Census Class
-                district_data[year][geo_key][geoid][census_class] = census_class_total
-
+    if geo_key != 'district':
+        census_rows = census_data_in_district[year][geo_key]
     # geokey is 'district'
-    if geo_key == 'district':
-        # TODO add support for non-congressional districts
-        if leg_body == 'US-REP':
-            # Census classes
-            for census_class, census_class_row in census_classes.items():
-                # Add up the total of this census_class, e.g., (18-29) or 30s
-                census_class_total = 0
+    # TODO add support for non-congressional districts
+    elif leg_body == 'US-REP':
+        census_rows = { geo_key: census_data_in_district[year][geo_key] }
+    else:
+        census_rows = {}
 
-                for census_subclass in census_class_row['fields']:
-                    census_subclass_value = int(census_data_in_district[year][geo_key][census_subclass])
-                    census_class_total =  census_class_total + census_subclass_value
+    # Add up the total of each census_class, e.g., (18-29) or 30s
+    census_classes, census_fields, class_matrix = get_class_matrix(class_groups)
+    census_class_names = [census_class.name for census_class in census_classes]
+    
+    geoids, census_matrix = get_census_matrix(census_rows, census_fields)
+    class_totals = census_matrix.dot(class_matrix)
 
-                # Census Class
-                district_data[year][geo_key][census_class] = census_class_total
+    # Census Class
+    for geoid, class_totals_row in zip(geoids, class_totals.tolist()):
+        if geo_key == 'district':
+            district_data[year][geo_key].update(zip(census_class_names, class_totals_row))
+        else:
+            if geoid not in district_data[year][geo_key].keys():
+                district_data[year][geo_key][geoid] = {}
+            district_data[year][geo_key][geoid].update(zip(census_class_names, class_totals_row))
 
     return district_data
 
@@ -992,33 +2132,25 @@ def make_district_data_for_state_leg(categories={}, district_data={},
     district_file = geojson_path +  district_abbr + '.geojson'
     
     print( "\nEstimating districtwide statistics")
-    blockgroups = gpd.read_file(blockgroups_file)
-    district_boundary = gpd.read_file(district_file)
-    
     if district_key not in district_data[year].keys():
         district_data[year][district_key] = {}
     
-    # set all district fields to zero
-    for cat_index, category in categories.items(): 
-        for cat_typ_index, cat_type in category.items():
-            for field in cat_type['fields']:
-                if field not in 'median_income':
-                    district_data[year][district_key][field] = 0.0
-
-    intersections = blockgroups.geometry.intersection(district_boundary.geometry[0])
-    areas = intersections.area
-    for bg_index, bg in blockgroups.iterrows():
-        interArea = areas[bg_index]
-        bgArea = GeoSeries(bg.geometry).area[0]
-
-        share = (interArea/bgArea)
-        for field, value in district_data[year][bg_key][bg.GEOID].items():
-            if 'median_income' not in field:
-                if value is None:
-                    value = 0.0
-                total = district_data[year][district_key][field]
-                total = total + float(value) * share
-                district_data[year][district_key][field] = total
+    fields = get_apportioned_fields(categories, district_data[year][bg_key])
+
+    # share of each block group's area in the district
+    weights, district_ids, bg_ids = get_crosswalk(
+            targets_file=district_file, 
+            sources_file=blockgroups_file, 
+            source_key='GEOID'
+        )
+
+    estimates = apportion_geounit_data(
+            weights=weights, 
+            geounit_data=district_data[year][bg_key], 
+            geoids=bg_ids, 
+            fields=fields
+        )
+    district_data[year][district_key].update(zip(fields, estimates[0]))
 
     # convert all the district values to int
     for field in district_data[year][district_key].keys():
@@ -1029,106 +2161,358 @@ def make_district_data_for_state_leg(categories={}, district_data={},
     return district_data
 
 
-def get_census_data(api, category, fields,
-        district_config_file = 'static/data/district.json',
-        census_data_file='static/data/district-census-data.json', 
+def get_district_geoid(state=48, district=7, leg_body='US-REP'):
+    """Return the id of a district in the census cache
+    Args:
+        state: state of district
+        district: district number
+        leg_body: legislative body, e.g., State Representative, State Senate, 
+                  or US Representative
+    Returns:
+        district_geoid: id of the district, e.g., US-REP-4807
+    Raises:
+        Nothing
+    """
+    state = "{0:0>2}".format(state)
+    district = "{0:0>2}".format(district)
+
+    district_geoid = leg_body + '-' + state + district
+
+    return district_geoid
+
+
+def get_census_cache_path(year, geo_key, census_cache_path='static/data/census/'):
+    """Return the path to the columnar census cache for a year and geography
+    Args:
+        year: year of census data
+        geo_key: geography, e.g., 'bg' or 'district'
+        census_cache_path: root of the census cache
+    Returns:
+        path: directory holding the Parquet files of the year and geography
+    Raises:
+        Nothing
+    """
+    path = census_cache_path + year + '/' + geo_key + '/'
+
+    return path
+
+
+def get_census_cache_manifest(path):
+    """Return the manifest of a census cache directory, which lists its Parquet parts 
+    and the census fields of each part
+    A manifest is made from the schemas of the parts of a cache written before there 
+    were manifests. The caller holds the lock of the manifest.
+    Args:
+        path: directory of the census cache of a year and geography
+    Returns:
+        manifest: list of dicts {'file': part filename, 'fields': census fields of the part}, 
+            in the order the parts were written
+    Raises:
+        Nothing
+    """
+    manifest_file = path + 'manifest.json'
+    if os.path.isfile(manifest_file):
+        with open(manifest_file) as manifest_json:
+            return json.load(manifest_json)
+
+    manifest = []
+    for part_file in sorted(glob(path + 'part-*.parquet')):
+        part_fields = [name for name in pq.read_schema(part_file).names if name != 'GEOID']
+        manifest.append({ 'file': os.path.basename(part_file), 'fields': part_fields })
+
+    return manifest
+
+
+def write_census_cache_manifest(path, manifest):
+    """Write the manifest of a census cache directory atomically
+    Args:
+        path: directory of the census cache of a year and geography
+        manifest: list of the parts, see get_census_cache_manifest()
+    Returns:
+        Nothing
+    Raises:
+        Nothing
+    """
+    fd, manifest_tmp_file = tempfile.mkstemp(dir=path, suffix='.tmp')
+    with os.fdopen(fd, 'w') as manifest_json:
+        json.dump(manifest, manifest_json)
+    os.replace(manifest_tmp_file, path + 'manifest.json')
+
+
+def write_census_part(census_table, path):
+    """Write a Parquet part of the census cache through a temporary file
+    Args:
+        census_table: pyarrow Table of the GEOID and the census fields
+        path: directory of the census cache of a year and geography
+    Returns:
+        part_name: filename of the part in path
+    Raises:
+        Nothing
+    """
+    # name the parts by time, so the files sort in the order they were written
+    part_name = 'part-{time:020d}-{uid}.parquet'.format(time=time.time_ns(), uid=uuid.uuid4().hex)
+    pq.write_table(census_table, path + part_name + '.tmp')
+    os.replace(path + part_name + '.tmp', path + part_name)
+
+    return part_name
+
+
+def compact_census_cache(path, manifest, max_parts=CENSUS_CACHE_MAX_PARTS):
+    """Merge the parts of the census cache that hold the same census fields, 
+    e.g., the parts written by the requests of one download, once there are 
+    more than max_parts parts
+    Every row of a part was fetched for all of the part's fields, so the merged parts 
+    still tell the cells that were fetched apart from the ones never fetched. 
+    The caller holds the lock of the manifest.
+    Args:
+        path: directory of the census cache of a year and geography
+        manifest: list of the parts, see get_census_cache_manifest()
+        max_parts: number of parts kept before they are merged
+    Returns:
+        manifest: the list of the parts after merging
+        merged_files: filenames of the parts that were merged, to remove once 
+            the new manifest is written
+    Raises:
+        Nothing
+    """
+    if len(manifest) <= max_parts:
+        return manifest, []
+
+    field_groups = OrderedDict()
+    for part in manifest:
+        field_groups.setdefault(tuple(part['fields']), []).append(part)
+
+    compacted_manifest = []
+    merged_files = []
+    for part_fields, parts in field_groups.items():
+        if len(parts) == 1:
+            compacted_manifest.append(parts[0])
+            continue
+        part_frames = [
+                pq.read_table(path + part['file']).to_pandas().set_index('GEOID') 
+                for part in parts 
+            ]
+        # a later value takes precedence over an earlier one, unless it is null
+        census_frame = pd.concat(part_frames).groupby(level=0, sort=False).last()
+        census_frame = census_frame.reindex(columns=list(part_fields)).astype('Int64')
+        census_table = pa.Table.from_pandas(census_frame.reset_index(), preserve_index=False)
+        compacted_manifest.append({ 
+                'file': write_census_part(census_table, path), 
+                'fields': list(part_fields) 
+            })
+        merged_files.extend(part['file'] for part in parts)
+
+    return compacted_manifest, merged_files
+
+
+def write_census_cache(census_rows, fields, year, geo_key, census_cache_path='static/data/census/'):
+    """Append census fields to the columnar census cache
+    Every write adds a Parquet part holding the GEOID and the given fields as int64 
+    columns, so writing new fields never rewrites the fields already in the cache. 
+    The parts and their fields are listed in a manifest, and the parts holding the 
+    same fields are merged once there are more than CENSUS_CACHE_MAX_PARTS.
+    Args:
+        census_rows: dict of geoid -> dict of census field -> value
+        fields: the census fields to write
+        year: year of census data
+        geo_key: geography, e.g., 'bg' or 'district'
+        census_cache_path: root of the census cache
+    Returns:
+        Nothing
+    Raises:
+        Nothing
+    """
+    if len(census_rows) == 0 or len(fields) == 0:
+        return
+
+    census_frame = pd.DataFrame.from_dict(census_rows, orient='index')
+    census_frame = census_frame.reindex(columns=fields).apply(pd.to_numeric, errors='coerce')
+    census_frame = census_frame.round().astype('Int64')
+    census_frame.index = census_frame.index.astype(str)
+    census_frame.index.name = 'GEOID'
+    census_table = pa.Table.from_pandas(census_frame.reset_index(), preserve_index=False)
+
+    path = get_census_cache_path(year, geo_key, census_cache_path)
+    mkdir_p(path)
+    part_name = write_census_part(census_table, path)
+
+    # the districts of a batch share the cache
+    with locked_file(path + 'manifest.json.lock'):
+        manifest = get_census_cache_manifest(path)
+        if part_name not in [part['file'] for part in manifest]:
+            manifest.append({ 'file': part_name, 'fields': list(fields) })
+        manifest, merged_files = compact_census_cache(path, manifest, max_parts=CENSUS_CACHE_MAX_PARTS)
+        write_census_cache_manifest(path, manifest)
+        for merged_file in merged_files:
+            os.remove(path + merged_file)
+
+
+def read_census_cache(fields, year, geo_key, geoids=None, census_cache_path='static/data/census/'):
+    """Read census fields from the columnar census cache
+    Only the Parquet parts and columns holding the requested fields, according to the 
+    manifest, are read.
+    Args:
+        fields: the census fields to read
+        year: year of census data
+        geo_key: geography, e.g., 'bg' or 'district'
+        geoids: the geoids to read; None reads every geoid in the cache
+        census_cache_path: root of the census cache
+    Returns:
+        census_frame: DataFrame (GEOID x fields) of int64 values, missing values are <NA>
+        census_cached: boolean DataFrame (GEOID x fields) of the cells in the cache, 
+            which tells a value the API returned as null apart from one never fetched
+    Raises:
+        Nothing
+    """
+    path = get_census_cache_path(year, geo_key, census_cache_path)
+    filters = None
+    if geoids is not None:
+        geoids = [str(geoid) for geoid in geoids]
+        filters = [('GEOID', 'in', geoids)]
+
+    field_columns = dict((field, column) for column, field in enumerate(fields))
+    parts = []
+    if os.path.isdir(path):
+        # hold the lock, so the parts are not merged while they are read
+        with locked_file(path + 'manifest.json.lock'):
+            for part in get_census_cache_manifest(path):
+                part_fields = [field for field in part['fields'] if field in field_columns]
+                if len(part_fields) == 0:
+                    continue
+                part_table = pq.read_table(path + part['file'], 
+                        columns=['GEOID'] + part_fields, filters=filters)
+                parts.append((part_fields, part_table.to_pandas().set_index('GEOID')))
+
+    if geoids is None:
+        geoids = pd.unique(np.concatenate(
+            [np.asarray(part_frame.index, dtype=object) for _, part_frame in parts] + 
+            [np.zeros(0, dtype=object)]))
+    geoid_index = pd.Index(geoids, name='GEOID')
+
+    census_values = np.full((len(geoid_index), len(fields)), np.nan)
+    census_mask = np.zeros((len(geoid_index), len(fields)), dtype=bool)
+    for part_fields, part_frame in parts:
+        rows = geoid_index.get_indexer(part_frame.index)
+        part_frame = part_frame[rows >= 0]
+        rows = rows[rows >= 0]
+        columns = [field_columns[field] for field in part_fields]
+        # every row of a part was fetched for all of the part's fields
+        census_mask[np.ix_(rows, columns)] = True
+        # a later value takes precedence over an earlier one, unless it is null
+        part_values = part_frame[part_fields].astype('float64').to_numpy(na_value=np.nan)
+        cell_rows, cell_columns = np.nonzero(~np.isnan(part_values))
+        census_values[rows[cell_rows], np.asarray(columns)[cell_columns]] = \
+                part_values[cell_rows, cell_columns]
+
+    census_frame = pd.DataFrame(census_values, index=geoid_index, columns=fields).round().astype('Int64')
+    census_cached = pd.DataFrame(census_mask, index=geoid_index, columns=fields)
+
+    return census_frame, census_cached
+
+
+def census_frame_to_dict(census_frame):
+    """Convert a census DataFrame to a dict of geoid -> dict of census field -> value
+    Args:
+        census_frame: DataFrame (GEOID x fields) from read_census_cache()
+    Returns:
+        census_rows: dict of geoid -> dict of census field -> int or None
+    Raises:
+        Nothing
+    """
+    census_frame = census_frame.astype(object).where(census_frame.notna(), None)
+
+    return census_frame.to_dict(orient='index')
+
+
+def load_census_data(fields, census_data={}, state=48, district=7, leg_body='US-REP', year='2015',
+        census_cache_path='static/data/census/'):
+    """Load the census data of the block groups in a district and of the district from the 
+    columnar census cache
+    Args:
+        fields: the census fields to load
+        census_data: dict to add the census data to
+        state: state of the district
+        district: district number
+        leg_body: legislative body, e.g., State Representative, State Senate, 
+                  or US Representative
+        year: year of census data
+        census_cache_path: root of the census cache
+    Returns:
+        census_data: dict of year -> geography -> census data
+    Raises:
+        Nothing
+    """
+    blockgroup_key = 'bg'
+    district_key = 'district'
+    if year not in census_data.keys():
+        census_data[year] = {}
+    if blockgroup_key not in census_data[year].keys():
+        census_data[year][blockgroup_key] = {}
+    if district_key not in census_data[year].keys():
+        census_data[year][district_key] = {}
+
+    bgs_in_district_JSON = get_bgs_in_district_json_filename(
+            state=state, district=district, leg_body=leg_body)
+    bgs_in_district = pd.read_json(bgs_in_district_JSON, dtype=False)
+    bg_frame, bg_cached = read_census_cache(fields, year, blockgroup_key, 
+            geoids=bgs_in_district['GEOID'].astype(str), census_cache_path=census_cache_path)
+    for geoid, bg_stats in census_frame_to_dict(bg_frame).items():
+        if geoid in census_data[year][blockgroup_key].keys():
+            census_data[year][blockgroup_key][geoid].update(bg_stats)
+        else:
+            census_data[year][blockgroup_key][geoid] = bg_stats
+
+    district_geoid = get_district_geoid(state=state, district=district, leg_body=leg_body)
+    district_frame, district_cached = read_census_cache(fields, year, district_key, 
+            geoids=[district_geoid], census_cache_path=census_cache_path)
+    if district_cached.loc[district_geoid].any():
+        census_data[year][district_key].update(census_frame_to_dict(district_frame)[district_geoid])
+
+    return census_data
+
+
+def update_district_config(census_categories, district_config_file = 'static/data/district.json',
         state=48, district=7, leg_body='US-REP', year='2015'):
-    """Store the raw census data in a json file and return the census data
+    """Add the census year and categories to the district config file, and create the 
+    district config file if there is none for this district
     Args:
-        api
-        category
-        fields
-        district_config_file
-        census_data_file
-        state
-        district
-        leg_body
-        year
+        census_categories: list of the census categories, e.g., ['Age', 'Income']
+        district_config_file: the district config file
+        state: state of the district
+        district: district number
+        leg_body: legislative body, e.g., State Representative, State Senate, 
+                  or US Representative
+        year: year of census data
     Returns: 
-        census_data: 
+        district_config: dict of the district config
+    Raises:
+        Nothing (yet)
     """
-    # If district config file exists, only get the census data that's not there
     if os.path.isfile(district_config_file):
         with open(district_config_file) as district_json:
             district_config = json.load(district_json)
 
-            if os.path.isfile(census_data_file):
-                with open(census_data_file) as census_json:
-                    census_data = json.load(census_json)
-
-            census_data_is_for_my_district = (district_config['state'] == state) and ( 
-                    district_config['district'] == district)
-
-            census_data_is_for_my_year = year in district_config
-            
-            # if everything is there, load from file
-            if census_data_is_for_my_district and census_data_is_for_my_year:
-                census_data_has_my_category = category in district_config[year]
-                if census_data_has_my_category:
-                    return census_data
-
-            # if not, get data via census api and save to file
-            # get the data for the blockgroups in the district
-            census_data = get_blockgroup_census_data(
-                    api=api, 
-                    census_data=census_data,
-                    fields=fields, 
-                    state=state, 
-                    district=district, 
-                    leg_body=leg_body, 
-                    year=year
-                )
-            # get the data for the entire district
-            census_data = get_district_census_data(
-                    api=api, 
-                    census_data=census_data,
-                    fields=fields, 
-                    state=state, 
-                    district=district, 
-                    leg_body=leg_body, 
-                    year=year
-                )
-
-            # TODO add get_tract_census_data()
+        config_is_for_my_district = (district_config['state'] == state) and ( 
+                district_config['district'] == district)
 
+        if config_is_for_my_district:
             if year not in district_config.keys():
-                district_config[year] = [category]
+                district_config[year] = list(census_categories)
                 district_config['census_years'].append(year)
             else:
-                district_config[year].append(category)
-            # save census data to file
-            to_json(census_data, census_data_file)
+                for census_category in census_categories:
+                    if census_category not in district_config[year]:
+                        district_config[year].append(census_category)
             to_json(district_config, district_config_file)
             
-            return census_data
-
-    # if there is no previous data for this district, then build from scratch
-    census_data = get_blockgroup_census_data(
-            api=api, 
-            fields=fields, 
-            state=state, 
-            district=district, 
-            leg_body=leg_body, 
-            year=year)
-    
-    census_data = get_district_census_data(
-            api=api, 
-            census_data=census_data,
-            fields=fields, 
-            state=state, 
-            district=district, 
-            leg_body=leg_body, 
-            year=year
-        )
-
-    # TODO add get_tract_census_data()
+            return district_config
 
     # create district config file
     # add state, district, years, and categories
     district_config = {}
     district_config['state'] = state
     district_config['district'] = district
-    district_config[year] = [category]
+    district_config[year] = list(census_categories)
     district_config['census_years'] = [year]
     
     # add centroid
@@ -1161,15 +2545,119 @@ def get_census_data(api, category, fields,
     title = state_name + " " + leg_body + " District "  + district_name
     district_config['title']=title
 
-    # save census data to file
-    to_json(census_data, census_data_file)
     to_json(district_config, district_config_file)
+
+    return district_config
+
+
+def get_census_data(api, category, fields,
+        district_config_file = 'static/data/district.json',
+        census_cache_path='static/data/census/', 
+        state=48, district=7, leg_body='US-REP', year='2015', census_workers=CENSUS_WORKERS, 
+        census_requests_per_second=CENSUS_REQUESTS_PER_SECOND):
+    """Return the census data, getting only the cells, i.e., (geoid, census field), 
+    that are missing from the columnar census cache from the Census API
+    Args:
+        api
+        category
+        fields
+        district_config_file
+        census_cache_path
+        state
+        district
+        leg_body
+        year
+        census_workers
+        census_requests_per_second
+    Returns: 
+        census_data: 
+    """
+    blockgroup_key = 'bg'
+    district_key = 'district'
+
+    # category is one category or a list of the categories fetched together
+    if isinstance(category, str):
+        census_categories = [category]
+    else:
+        census_categories = list(category)
+
+    # find the block groups and fields missing from the cache
+    bgs_in_district_JSON = get_bgs_in_district_json_filename(
+            state=state, district=district, leg_body=leg_body)
+    bgs_in_district = pd.read_json(bgs_in_district_JSON, dtype=False)
+    bg_frame, bg_cached = read_census_cache(fields, year, blockgroup_key, 
+            geoids=bgs_in_district['GEOID'].astype(str), census_cache_path=census_cache_path)
     
+    missing_bgs = bg_cached.index[~bg_cached.all(axis=1)].tolist()
+    missing_bg_fields = bg_cached.columns[~bg_cached.all(axis=0)].tolist()
+    
+    # get the missing data for the blockgroups in the district
+    # each request is written to the cache as it arrives
+    if len(missing_bgs) > 0:
+        print( "Getting {fields} census fields for {bgs} block groups".format(
+            fields=len(missing_bg_fields), bgs=len(missing_bgs)) )
+        get_blockgroup_census_data(
+                api=api, 
+                census_data={},
+                fields=missing_bg_fields, 
+                state=state, 
+                district=district, 
+                leg_body=leg_body, 
+                year=year,
+                workers=census_workers,
+                geoids=missing_bgs,
+                census_cache_path=census_cache_path,
+                requests_per_second=census_requests_per_second
+            )
+    
+    # get the missing data for the entire district
+    if leg_body == 'US-REP':
+        district_geoid = get_district_geoid(state=state, district=district, leg_body=leg_body)
+        district_frame, district_cached = read_census_cache(fields, year, district_key, 
+                geoids=[district_geoid], census_cache_path=census_cache_path)
+        missing_district_fields = district_cached.columns[~district_cached.loc[district_geoid]].tolist()
+        
+        if len(missing_district_fields) > 0:
+            census_data = get_district_census_data(
+                    api=api, 
+                    census_data={},
+                    fields=missing_district_fields, 
+                    state=state, 
+                    district=district, 
+                    leg_body=leg_body, 
+                    year=year,
+                    requests_per_second=census_requests_per_second
+                )
+            write_census_cache({ district_geoid: census_data[year][district_key] }, 
+                    missing_district_fields, year, district_key, census_cache_path=census_cache_path)
+
+    # TODO add get_tract_census_data()
+
+    update_district_config(
+            census_categories=census_categories,
+            district_config_file=district_config_file,
+            state=state, 
+            district=district, 
+            leg_body=leg_body, 
+            year=year
+        )
+
+    census_data = load_census_data(
+            fields=fields,
+            census_data={},
+            state=state, 
+            district=district, 
+            leg_body=leg_body, 
+            year=year,
+            census_cache_path=census_cache_path
+        )
+
     return census_data
 
 
 def make_age_data(api, district_data = {}, categories = {'Age': {} },
-        state=48, district=7, leg_body='US-REP', year='2015'):
+        state=48, district=7, leg_body='US-REP', year='2015', census_workers=CENSUS_WORKERS,
+        census_data=None):
     """Make the census data on age for a district
     Args: 
         api: 
@@ -1188,7 +2676,6 @@ def make_age_data(api, district_data = {}, categories = {'Age': {} },
     tract_key='tract'
 
     total_census_field = 'B01001_001E'
-    age_table = 'B01001'
     
     total_field = 'total'
     total_label = 'Total'
@@ -1198,17 +2685,17 @@ def make_age_data(api, district_data = {}, categories = {'Age': {} },
     
     data_path = 'static/data/'
 
-    age_classes = CensusFields.get_age_fields()
+    age_classes = CensusFields.registry.classes['age']
     
-    under_18_classes = CensusFields.get_under_18_fields()
+    under_18_class = CensusFields.registry.classes['under_18'][0]
     
-    # Load the census data
-    print( "\n" )
-    print( "Getting Census Data for Sex by Age" )
-    census_fields, census_labels = get_census_fields_by_table(table=age_table, 
-            year=year)
-    census_data = get_census_data(api=api, category=category, fields=census_fields, 
-        state=state, district=district, leg_body=leg_body, year=year)
+    # Load the census data, unless it was fetched with the other categories
+    if census_data is None:
+        print( "\n" )
+        print( "Getting Census Data for Sex by Age" )
+        census_fields = get_category_census_fields(category, year=year)
+        census_data = get_census_data(api=api, category=category, fields=census_fields, 
+            state=state, district=district, leg_body=leg_body, year=year, census_workers=census_workers)
     
     # create fields and labels for Party Identification classes
     # used in web-based dashboard
@@ -1232,9 +2719,9 @@ def make_age_data(api, district_data = {}, categories = {'Age': {} },
     fields.append(total_field)
     labels[total_field] = total_label
     
-    for age_field, age_row in age_classes.items():
-        fields.append(age_field)
-        labels[age_field] = age_row['label']
+    for age_class in age_classes:
+        fields.append(age_class.name)
+        labels[age_class.name] = age_class.label
     
     categories[category]['Census'] = {'fields': fields, 'labels': labels}
 
@@ -1244,7 +2731,7 @@ def make_age_data(api, district_data = {}, categories = {'Age': {} },
     # for the blockgroups
     district_data = make_class_data( 
             census_data_in_district=census_data, 
-            census_classes=age_classes,
+            class_groups=['age'],
             district_data=district_data,
             district=district,
             leg_body=leg_body,
@@ -1254,7 +2741,7 @@ def make_age_data(api, district_data = {}, categories = {'Age': {} },
     # for the district
     district_data = make_class_data( 
             census_data_in_district=census_data, 
-            census_classes=age_classes,
+            class_groups=['age'],
             district_data=district_data,
             category=categories[category],
             district=district,
@@ -1265,36 +2752,37 @@ def make_age_data(api, district_data = {}, categories = {'Age': {} },
 
     # Calculate persons 18 and over in each block group and 
     # get the total population in each block group
+    # (over 18) = total - (under 18)
+    over_18_fields = [total_census_field] + list(under_18_class.fields)
+    
     geo_key = blockgroup_key
-    for geoid, census_data_row in census_data[year][geo_key].items():
+    geoids, census_matrix = get_census_matrix(census_data[year][geo_key], over_18_fields)
+    totals = census_matrix[:, 0]
+    over_18 = totals - census_matrix[:, 1:].sum(axis=1)
+    for geoid, over_18_row, total_row in zip(geoids, over_18.tolist(), totals.tolist()):
         # Persons 18 and over
-        under_18 = 0
-        for census_field in under_18_classes['fields']:
-            under_18 = under_18 + int(census_data_row[census_field])
-        # (over 18) = total - (under 18)
-        over_18 = int(census_data_row[total_census_field]) - under_18
-        district_data[year][geo_key][geoid][over_18_field] = over_18
+        district_data[year][geo_key][geoid][over_18_field] = over_18_row
             
         # Total Population
-        district_data[year][geo_key][geoid][total_field] = census_data_row[total_census_field]
+        district_data[year][geo_key][geoid][total_field] = total_row
     
     if leg_body == 'US-REP':
         # calculate the district stats
         geo_key = district_key
-        for census_field in under_18_classes['fields']:
-            under_18 = under_18 + int(census_data[year][geo_key][census_field])
-        # (over 18) = total - (under 18)
-        over_18 = int(census_data[year][geo_key][total_census_field]) - under_18
-        district_data[year][geo_key][over_18_field] = over_18
+        geoids, census_matrix = get_census_matrix(
+                { geo_key: census_data[year][geo_key] }, over_18_fields)
+        district_data[year][geo_key][over_18_field] = int(
+                census_matrix[0, 0] - census_matrix[0, 1:].sum())
             
         # Total Population
-        district_data[year][geo_key][total_field] = census_data[year][geo_key][total_census_field]
+        district_data[year][geo_key][total_field] = int(census_matrix[0, 0])
 
     return categories, district_data
 
 
 def make_income_data(api, district_data = {}, categories = {'Income': { }}, 
-        state=48, district=7, leg_body='US-REP', year='2015'):
+        state=48, district=7, leg_body='US-REP', year='2015', census_workers=CENSUS_WORKERS,
+        census_data=None):
     """Make the income data for a district
     Args: 
         api: 
@@ -1312,7 +2800,6 @@ def make_income_data(api, district_data = {}, categories = {'Income': { }},
     precinct_key='precinct'
     tract_key='tract'
 
-    income_table = 'B19001'
     total_household_inc_field = 'B19001_001E'
     median_household_inc_field = 'B19013_001E'
     
@@ -1328,16 +2815,15 @@ def make_income_data(api, district_data = {}, categories = {'Income': { }},
     median_field = 'median_income'
     median_label = 'Median Household Income'
     
-    income_classes = CensusFields.get_income_fields()
+    income_classes = CensusFields.registry.classes['income']
 
-    # Load the census data
-    print( "\n" )
-    print( "Getting Census Data for Household Income" )
-    census_fields, census_labels = get_census_fields_by_table(table=income_table, 
-            year=year)
-    census_fields.append(median_household_inc_field)
-    census_data = get_census_data(api=api, category=category, fields=census_fields,
-        state=state, district=district, leg_body=leg_body, year=year)
+    # Load the census data, unless it was fetched with the other categories
+    if census_data is None:
+        print( "\n" )
+        print( "Getting Census Data for Household Income" )
+        census_fields = get_category_census_fields(category, year=year)
+        census_data = get_census_data(api=api, category=category, fields=census_fields,
+            state=state, district=district, leg_body=leg_body, year=year, census_workers=census_workers)
 
     # create fields and labels for Party Identification classes
     # used in web-based dashboard
@@ -1364,9 +2850,9 @@ def make_income_data(api, district_data = {}, categories = {'Income': { }},
     fields.append(over_100k_field)
     labels[over_100k_field] = over_100k_label
 
-    for income_field, income_row in income_classes.items():
-        fields.append(income_field)
-        labels[income_field] = income_row['label']
+    for income_class in income_classes:
+        fields.append(income_class.name)
+        labels[income_class.name] = income_class.label
     
     fields.append(median_field)
     labels[median_field] = median_label
@@ -1375,15 +2861,14 @@ def make_income_data(api, district_data = {}, categories = {'Income': { }},
     
     # add over/under fields
     # this is to customize their position in the drop down menu
-    income_classes[over_100k_field] = CensusFields.get_over_100k_income_fields()
-    income_classes[under_100k_field] = CensusFields.get_under_100k_income_fields()
+    income_groups = ['income', over_100k_field, under_100k_field]
 
     print( "Building Income data" )
    
     # make the party identification data and census data
     district_data = make_class_data(
             census_data_in_district=census_data, 
-            census_classes=income_classes,
+            class_groups=income_groups,
             district_data=district_data,
             district=district,
             leg_body=leg_body,
@@ -1396,7 +2881,7 @@ def make_income_data(api, district_data = {}, categories = {'Income': { }},
     # for the district
     district_data = make_class_data( 
             census_data_in_district=census_data, 
-            census_classes=income_classes,
+            class_groups=income_groups,
             district_data=district_data,
             district=district,
             leg_body=leg_body,
@@ -1426,7 +2911,8 @@ def make_income_data(api, district_data = {}, categories = {'Income': { }},
     
 
 def make_race_data( api,  district_data = {}, categories = {'Race': { }}, 
-        state=48, district=7, leg_body='US-REP', year='2015' ):
+        state=48, district=7, leg_body='US-REP', year='2015', census_workers=CENSUS_WORKERS,
+        census_data=None ):
     """Make the race data for a district
     Args: 
         api: 
@@ -1444,29 +2930,20 @@ def make_race_data( api,  district_data = {}, categories = {'Race': { }},
     precinct_key='precinct'
     tract_key='tract'
 
-    race_table = 'B02001'
-    hispanic_table = 'B03003'
     race_total_field = 'B02001_001E'
     
     total_field = 'total_race'
     total_label = 'Total Population'
     
-    race_classes = CensusFields.get_race_fields()
-
-    # Load the census data
-    census_fields = []
-    print( "\n" )
-    print( "Getting Census Data for Race" )
-    race_fields, census_labels = get_census_fields_by_table(table=race_table, 
-            year=year)
-    census_fields.extend(race_fields)
-    
-    hispanic_fields, census_labels = get_census_fields_by_table(table=hispanic_table, 
-            year=year)
-    census_fields.extend(hispanic_fields)
+    race_classes = CensusFields.registry.classes['race']
 
-    census_data = get_census_data(api=api, category=category, fields=census_fields,
-        state=state, district=district, leg_body=leg_body, year=year)
+    # Load the census data, unless it was fetched with the other categories
+    if census_data is None:
+        print( "\n" )
+        print( "Getting Census Data for Race" )
+        census_fields = get_category_census_fields(category, year=year)
+        census_data = get_census_data(api=api, category=category, fields=census_fields,
+            state=state, district=district, leg_body=leg_body, year=year, census_workers=census_workers)
 
     # create fields and labels for Party Identification classes
     # used in web-based dashboard
@@ -1488,9 +2965,9 @@ def make_race_data( api,  district_data = {}, categories = {'Race': { }},
     fields.append(total_field)
     labels[total_field] = total_label
     
-    for race_field, race_row in race_classes.items():
-        fields.append(race_field)
-        labels[race_field] = race_row['label']
+    for race_class in race_classes:
+        fields.append(race_class.name)
+        labels[race_class.name] = race_class.label
     
     categories[category]['Census'] = {'fields': fields, 'labels': labels}
     
@@ -1499,7 +2976,7 @@ def make_race_data( api,  district_data = {}, categories = {'Race': { }},
     # make the party identification data and census data
     district_data = make_class_data(
             census_data_in_district=census_data, 
-            census_classes=race_classes,
+            class_groups=['race'],
             district_data=district_data,
             district=district,
             leg_body=leg_body,
@@ -1512,7 +2989,7 @@ def make_race_data( api,  district_data = {}, categories = {'Race': { }},
     # for the district
     district_data = make_class_data( 
             census_data_in_district=census_data, 
-            census_classes=race_classes,
+            class_groups=['race'],
             district_data=district_data,
             district=district,
             leg_body=leg_body,
@@ -1533,7 +3010,8 @@ def make_race_data( api,  district_data = {}, categories = {'Race': { }},
 
 
 def make_edu_data( api,  district_data = {}, categories = {'Education': { }}, 
-        state=48, district=7, leg_body='US-REP', year='2015' ):
+        state=48, district=7, leg_body='US-REP', year='2015', census_workers=CENSUS_WORKERS,
+        census_data=None ):
     """Make the education data for a district
     Args: 
         api: 
@@ -1551,24 +3029,20 @@ def make_edu_data( api,  district_data = {}, categories = {'Education': { }},
     precinct_key='precinct'
     tract_key='tract'
 
-    edu_table = 'B15002'
     edu_total_field = 'B15002_001E'
     
     total_field = 'total_edu'
     total_label = 'Total Population over 25'
     
-    edu_classes = CensusFields.get_edu_fields()
+    edu_classes = CensusFields.registry.classes['edu']
 
-    # Load the census data
-    census_fields = []
-    print( "\n" )
-    print( "Getting Census Data for Education" )
-    edu_fields, census_labels = get_census_fields_by_table(table=edu_table, 
-            year=year)
-    census_fields.extend(edu_fields)
-    
-    census_data = get_census_data(api=api, category=category, fields=census_fields,
-        state=state, district=district, leg_body=leg_body, year=year)
+    # Load the census data, unless it was fetched with the other categories
+    if census_data is None:
+        print( "\n" )
+        print( "Getting Census Data for Education" )
+        census_fields = get_category_census_fields(category, year=year)
+        census_data = get_census_data(api=api, category=category, fields=census_fields,
+            state=state, district=district, leg_body=leg_body, year=year, census_workers=census_workers)
 
     # create fields and labels for Party Identification classes
     # used in web-based dashboard
@@ -1589,16 +3063,16 @@ def make_edu_data( api,  district_data = {}, categories = {'Education': { }},
     fields.append(total_field)
     labels[total_field] = total_label
     
-    for field, row in edu_classes.items():
-        fields.append(field)
-        labels[field] = row['label']
+    for edu_class in edu_classes:
+        fields.append(edu_class.name)
+        labels[edu_class.name] = edu_class.label
     
     categories[category]['Census'] = {'fields': fields, 'labels': labels}
     
     # make the party identification data and census data
     district_data = make_class_data(
             census_data_in_district=census_data, 
-            census_classes=edu_classes,
+            class_groups=['edu'],
             district_data=district_data,
             district=district,
             leg_body=leg_body,
@@ -1611,7 +3085,7 @@ def make_edu_data( api,  district_data = {}, categories = {'Education': { }},
     # for the district
     district_data = make_class_data( 
             census_data_in_district=census_data, 
-            census_classes=edu_classes,
+            class_groups=['edu'],
             district_data=district_data,
             district=district,
             leg_body=leg_body,
@@ -1632,6 +3106,171 @@ def make_edu_data( api,  district_data = {}, categories = {'Education': { }},
     return categories, district_data
 
 
+def get_areal_weights(targets, sources):
+    """Return the share of each source geounit's area that falls in each target geounit
+    Args:
+        targets: GeoDataFrame of the target geounits, e.g., voting precincts
+        sources: GeoDataFrame of the source geounits, e.g., block groups
+    Returns:
+        weights: sparse matrix (targets x sources) of the shares
+    Raises:
+        Nothing
+    """
+    # one spatial join of the targets against the spatial index of the sources
+    target_positions, source_positions = sources.sindex.query(
+            targets.geometry, predicate='intersects')
+    
+    source_geometries = sources.geometry.values[source_positions]
+    target_geometries = targets.geometry.values[target_positions]
+    areas = target_geometries.intersection(source_geometries).area
+    shares = areas / source_geometries.area
+
+    weights = sparse.csr_matrix(
+            (shares, (target_positions, source_positions)),
+            shape=(len(targets), len(sources))
+        )
+
+    return weights
+
+
+def apportion_geounit_data(weights, geounit_data, geoids, fields):
+    """Apportion the data of source geounits to target geounits using areal weights
+    Args:
+        weights: sparse matrix (targets x sources) from get_areal_weights()
+        geounit_data: dict of source geoid -> dict of field -> value, 
+            e.g., district_data[year]['bg']
+        geoids: the geoids of the source geounits in the order of the weights' columns
+        fields: the fields to apportion
+    Returns:
+        estimates: array (targets x fields) of the apportioned values
+    Raises:
+        Nothing
+    """
+    source_data = pd.DataFrame.from_dict(geounit_data, orient='index')
+    source_data = source_data.reindex(index=[str(geoid) for geoid in geoids], columns=fields)
+    source_data = source_data.apply(pd.to_numeric, errors='coerce').fillna(0.0)
+
+    estimates = weights @ source_data.to_numpy(dtype=float)
+
+    return estimates
+
+
+def get_apportioned_fields(categories, geounit_data):
+    """Return the fields that are apportioned from block groups to other geounits
+    Args:
+        categories: dict of the categories, e.g., Age or Income, and their fields
+        geounit_data: dict of geoid -> dict of field -> value, e.g., district_data[year]['bg']
+    Returns:
+        fields: list of the fields, except the median income
+    Raises:
+        Nothing
+    """
+    fields = []
+    for cat_index, category in categories.items():
+        for cat_type_index, cat_type in category.items():
+            for field in cat_type['fields']:
+                if field not in 'median_income' and field not in fields:
+                    fields.append(field)
+    for geounit in geounit_data.values():
+        for field in geounit.keys():
+            if 'median_income' not in field and field not in fields:
+                fields.append(field)
+
+    return fields
+
+
+def get_crosswalk_filename(targets_file, sources_file, target_key=None, source_key=None, 
+        crs='epsg:4326'):
+    """Return the path and filename of the crosswalk between two geospatial files
+    The filename is a hash of the contents of both files, the id columns, and the crs, 
+    so a crosswalk is invalidated when either file changes.
+    Args:
+        targets_file: geospatial file of the target geounits, e.g., voting precincts
+        sources_file: geospatial file of the source geounits, e.g., block groups
+        target_key: column with the ids of the targets
+        source_key: column with the ids of the sources
+        crs: coordinate reference system the areas are calculated in
+    Returns:
+        crosswalk_file: filename of the npz file storing the crosswalk
+    Raises:
+        Nothing
+    """
+    crosswalk_path = 'static/data/crosswalks/'
+    
+    crosswalk_hash = hashlib.sha256()
+    crosswalk_hash.update(get_file_hash(find_layer_file(targets_file)).encode())
+    crosswalk_hash.update(get_file_hash(find_layer_file(sources_file)).encode())
+    crosswalk_hash.update(str(target_key).encode())
+    crosswalk_hash.update(str(source_key).encode())
+    crosswalk_hash.update(str(crs).lower().encode())
+
+    crosswalk_file = crosswalk_path + crosswalk_hash.hexdigest() + '.npz'
+
+    return crosswalk_file
+
+
+def get_crosswalk(targets_file, sources_file, target_key=None, source_key=None, crs='epsg:4326'):
+    """Return the crosswalk of areal weights between two geospatial files
+    The crosswalk is built once and stored as a compressed sparse matrix, which is 
+    reused until either file changes.
+    Args:
+        targets_file: geospatial file of the target geounits, e.g., voting precincts
+        sources_file: geospatial file of the source geounits, e.g., block groups
+        target_key: column with the ids of the targets, e.g., PRECINCT; 
+            None uses the row index
+        source_key: column with the ids of the sources, e.g., GEOID; 
+            None uses the row index
+        crs: coordinate reference system the areas are calculated in
+    Returns:
+        weights: sparse matrix (targets x sources) from get_areal_weights()
+        target_ids: list of the target ids in the order of the weights' rows
+        source_ids: list of the source ids in the order of the weights' columns
+    Raises:
+        Nothing
+    """
+    crosswalk_file = get_crosswalk_filename(targets_file, sources_file, 
+            target_key=target_key, source_key=source_key, crs=crs)
+    
+    if os.path.isfile(crosswalk_file):
+        try:
+            with np.load(crosswalk_file) as crosswalk:
+                weights = sparse.csr_matrix(
+                        (crosswalk['data'], crosswalk['indices'], crosswalk['indptr']),
+                        shape=tuple(crosswalk['shape'])
+                    )
+                return weights, crosswalk['target_ids'].tolist(), crosswalk['source_ids'].tolist()
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            # a damaged crosswalk is built again
+            print( "Rebuilding damaged crosswalk {crosswalk}".format(crosswalk=crosswalk_file) )
+
+    print( "Building crosswalk {crosswalk}".format(crosswalk=crosswalk_file) )
+    targets = read_layer(targets_file).to_crs(crs)
+    sources = read_layer(sources_file).to_crs(crs)
+    
+    weights = get_areal_weights(targets=targets, sources=sources)
+    target_ids = targets.index if target_key is None else targets[target_key]
+    source_ids = sources.index if source_key is None else sources[source_key]
+    target_ids = np.array(target_ids.tolist())
+    source_ids = np.array(source_ids.tolist())
+
+    # write through a unique temporary file, so a reader never sees a partial crosswalk
+    mkdir_p(os.path.dirname(crosswalk_file))
+    fd, crosswalk_tmp_file = tempfile.mkstemp(dir=os.path.dirname(crosswalk_file), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as crosswalk_npz:
+        np.savez_compressed(
+                crosswalk_npz,
+                data=weights.data, 
+                indices=weights.indices, 
+                indptr=weights.indptr, 
+                shape=np.array(weights.shape),
+                target_ids=target_ids,
+                source_ids=source_ids
+            )
+    os.replace(crosswalk_tmp_file, crosswalk_file)
+
+    return weights, target_ids.tolist(), source_ids.tolist()
+
+
 def make_voting_precinct_data(categories, district_data = {}, 
         state=48, district=7, leg_body='US-REP', year='2015',
         voting_precincts_file=None):
@@ -1663,84 +3302,289 @@ def make_voting_precinct_data(categories, district_data = {},
     blockgroups_file = geojson_path + district_abbr + '-blockgroups.geojson' 
 
     print( "\nCalculating statistics for voting precincts" )
-    blockgroups = gpd.read_file(blockgroups_file)
-    voting_precincts = gpd.read_file(voting_precincts_file)
-    
     if precinct_key not in district_data[year].keys():
         district_data[year][precinct_key] = {}
-    for precIndex, precinct in voting_precincts.iterrows():
-        geoid = precinct.PRECINCT
+
+    # the fields to estimate for each precinct
+    fields = get_apportioned_fields(categories, district_data[year]['bg'])
+
+    # share of each block group's area in each precinct
+    weights, precinct_ids, bg_ids = get_crosswalk(
+            targets_file=voting_precincts_file, 
+            sources_file=blockgroups_file, 
+            target_key='PRECINCT', 
+            source_key='GEOID'
+        )
+    
+    # apportion the block group data to the precincts
+    estimates = apportion_geounit_data(
+            weights=weights, 
+            geounit_data=district_data[year]['bg'], 
+            geoids=bg_ids, 
+            fields=fields
+        )
+    
+    # convert all the precinct values to int
+    estimates = estimates.astype(int)
+    for geoid, row in zip(precinct_ids, estimates.tolist()):
         if geoid not in district_data[year][precinct_key].keys():
             district_data[year][precinct_key][geoid] = {}
-        for cat_index, category in categories.items():
-            for cat_type_index, cat_type in category.items():
-                for field in cat_type['fields']:
-                    if field not in 'median_income':
-                        district_data[year][precinct_key][geoid][field] = 0.0
-
-        precincts_bool = blockgroups.geometry.intersects(precinct.geometry)
-        bg_prec_intersects = blockgroups[precincts_bool]
+        district_data[year][precinct_key][geoid].update(zip(fields, row))
+
+    return district_data
+
+
+def get_voting_results_file_hash(voting_results_file, cache_path=VOTING_RESULTS_CACHE_PATH):
+    """Return the SHA-256 hex digest of a voting results file, which is only hashed 
+    again when its size or modification time changes
+    The hash, size, and modification time of each file are kept in files.json in the 
+    cache path.
+    Args: 
+        voting_results_file: Open Elections csv file of precinct results
+        cache_path: path of the cached voting results
+    Returns: 
+        file_hash: hex digest of the file
+    Raises:
+        OSError
+    """
+    mkdir_p(cache_path)
+    hashes_file = cache_path + 'files.json'
+    key = os.path.abspath(voting_results_file)
+    
+    with locked_file(hashes_file + '.lock'):
+        hashes = {}
+        if os.path.isfile(hashes_file):
+            try:
+                with open(hashes_file) as f:
+                    hashes = json.load(f)
+            except ValueError:
+                hashes = {}
+        
+        stat = os.stat(voting_results_file)
+        entry = hashes.get(key)
+        if entry is not None and entry.get('size') == stat.st_size \
+                and entry.get('mtime_ns') == stat.st_mtime_ns:
+            return entry['sha256']
+        
+        file_hash = get_file_hash(voting_results_file)
+        hashes[key] = { 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': file_hash }
         
-        intersections = bg_prec_intersects.intersection(precinct.geometry)
-        areas = intersections.area
-        for bg_index, bg in bg_prec_intersects.iterrows():
-            interArea = areas[bg_index]
-            bgArea = GeoSeries(bg.geometry).area[0]
-
-            share = (interArea/bgArea)
-            for field, value in district_data[year]['bg'][bg.GEOID].items():
-                if 'median_income' not in field:
-                    if value is None:
-                        value = 0.0
-                    total = district_data[year][precinct_key][geoid][field]
-                    total = total + float(value) * share
-                    district_data[year][precinct_key][geoid][field] = total
+        fd, hashes_tmp_file = tempfile.mkstemp(dir=os.path.dirname(hashes_file) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(hashes, f)
+            os.replace(hashes_tmp_file, hashes_file)
+        except BaseException:
+            os.remove(hashes_tmp_file)
+            raise
     
-    # convert all the precinct values to int
-    for geoid in district_data[year][precinct_key].keys():
-        for field in district_data[year][precinct_key][geoid].keys():
-            field_to_int = int(district_data[year][precinct_key][geoid][field])
-            district_data[year][precinct_key][geoid][field] = field_to_int
+    return file_hash
 
-    return district_data
 
+def read_voting_results(voting_results_file, precincts, offices, 
+        chunksize=VOTING_RESULTS_CHUNK_SIZE, cache_path=VOTING_RESULTS_CACHE_PATH):
+    """Read the voting results of some precincts and offices from an Open Elections csv file
+    The csv file is streamed in chunks, keeping only the rows of the precincts and 
+    offices, and the filtered results are cached in a parquet file keyed by a hash 
+    of the csv file, the precincts, and the offices.
+    Args: 
+        voting_results_file: Open Elections csv file of precinct results
+        precincts: list of the int precincts to keep
+        offices: list of the offices to keep, e.g., ['U.S. House']
+        chunksize: number of csv rows read at a time
+        cache_path: path of the cached voting results
+    Returns: 
+        vr_data: DataFrame of the voting results in the order of the csv file, with 
+            int precincts, the party standardized to DEM or REP, and categorical 
+            county, office, district, party, and candidate columns
+    """
+    precincts = sorted(set(int(precinct) for precinct in precincts))
+    offices = sorted(set(offices))
+    
+    cache_hash = hashlib.sha256()
+    cache_hash.update(get_voting_results_file_hash(voting_results_file, cache_path).encode())
+    cache_hash.update(json.dumps([precincts, offices]).encode())
+    cache_file = cache_path + cache_hash.hexdigest() + '.parquet'
+    
+    if os.path.isfile(cache_file):
+        return pd.read_parquet(cache_file)
+    
+    print( "Reading voting results from {file}".format(file=voting_results_file) )
+    text_columns = ['county', 'precinct', 'office', 'district', 'party', 'candidate']
+    
+    category_columns = [column for column in text_columns if column != 'precinct']
+    
+    # the text columns are read as categories, so a chunk holds each repeated 
+    # county, office, or candidate once
+    chunks = []
+    dtype = dict((column, 'category') for column in category_columns)
+    dtype['precinct'] = str
+    reader = pd.read_csv(voting_results_file, chunksize=chunksize, dtype=dtype)
+    for chunk in reader:
+        # convert precinct column to int, dropping rows like TOTAL
+        chunk['precinct'] = pd.to_numeric(chunk['precinct'], errors='coerce')
+        chunk = chunk[ chunk['precinct'].isin(precincts) & chunk['office'].isin(offices) ].copy()
+        # standardize voting_results_data
+        # convert party column to DEM or REP
+        chunk['party'] = chunk['party'].astype(object).replace(
+                {'Republican': 'REP', 'Democratic': 'DEM'}).astype('category')
+        # keep the categories of the filtered rows, as objects, since a column of 
+        # empty values, e.g., district, is read with float categories
+        for column in category_columns:
+            if column in chunk.columns:
+                values = chunk[column].cat.remove_unused_categories()
+                chunk[column] = values.cat.set_categories(values.cat.categories.astype(object))
+        chunks.append(chunk)
+    
+    if len(chunks) > 0:
+        # the chunks have different categories, which pd.concat() would turn into 
+        # objects, so the categories of each column are combined
+        categories = dict((column, union_categoricals([chunk[column] for chunk in chunks]))
+                for column in category_columns if column in chunks[0].columns)
+        vr_data = pd.concat(chunks, ignore_index=True)
+        for column, values in categories.items():
+            vr_data[column] = values
+    else:
+        vr_data = pd.DataFrame(columns=text_columns + ['votes'])
+        for column in category_columns:
+            vr_data[column] = vr_data[column].astype('category')
+    vr_data['precinct'] = vr_data['precinct'].astype(int)
+
+    # write the cache to a temporary file, so a partial cache is never used
+    mkdir_p(cache_path)
+    cache_tmp_file = cache_file + '.' + uuid.uuid4().hex + '.tmp'
+    vr_data.to_parquet(cache_tmp_file, index=False)
+    os.replace(cache_tmp_file, cache_file)
+
+    return vr_data
 
-def query_voting_results(vr_data, precinct, queries):
-    """Return the value in the voting results for a given precinct based on various conditions
+
+def get_voting_results_table(vr_data, field_queries, precincts):
+    """Pivot the voting results into a table of precincts by fields
+    Each field is the votes of the first row of a precinct that matches all the 
+    conditions of the field's query, or 0 if no row matches.
     Args: 
         vr_data: DataFrame of voting results
-        precinct: int of precinct
-        queries: a list queries, where each query is a list of the column and value,
-        e.g., [['office', 'U.S. Senate'], ['party', 'DEM']]
+        field_queries: dict of field -> a list of queries, where each query is a list 
+            of the column and value, e.g., [['office', 'U.S. Senate'], ['party', 'DEM']]
+        precincts: list of the int precincts, i.e., the rows of the table
     Returns: 
-        query_result: an int of query result
+        voting_results_table: DataFrame of int votes indexed by precinct in the 
+            order of precincts, with a column for each field
     """
+    voting_results_table = pd.DataFrame(index=pd.Index(precincts, name='precinct'))
+    
+    for field, queries in field_queries.items():
+        matches = pd.Series(True, index=vr_data.index)
+        for col, row in queries:
+            matches = matches & (vr_data[col] == row)
+        
+        # keep the first matching row of each precinct
+        field_votes = vr_data[matches].drop_duplicates('precinct', keep='first')
+        field_votes = field_votes.set_index('precinct')['votes']
+        voting_results_table[field] = field_votes.reindex(precincts).fillna(0).astype(int).values
+
+    return voting_results_table
 
-    query_result = 0
-    # Get the voting results for the precinct
-    vr_data = vr_data[ vr_data['precinct'] == precinct ]
+
+def get_election_metrics(dem, rep, registered_voters, total_votes, over_18):
+    """Calculate the metrics derived from the voting results of several precincts
+    Args: 
+        dem: array of the US House Democratic votes of each precinct
+        rep: array of the US House Republican votes of each precinct
+        registered_voters: array of the registered voters of each precinct
+        total_votes: array of the ballots cast in each precinct
+        over_18: array of the population 18 years and over of each precinct
+    Returns: 
+        metrics: dict of int arrays of 
+            dem_diff: Democratic votes minus Republican votes
+            dem_per: Democratic votes as a percent of the 18+ population
+            reg_per: registered voters as a percent of the 18+ population
+            no_vote: the 18+ population that did not vote
+            us_hou_dem_pot: Democratic potential, the average of the non-voters 
+                relative to the precinct with the most non-voters and dem_per
+        The percents are 0 for precincts without an 18+ population, and the 
+        relative non-voters are 0 if no precinct has non-voters.
+    """
+    dem = np.asarray(dem, dtype=float)
+    rep = np.asarray(rep, dtype=float)
+    registered_voters = np.asarray(registered_voters, dtype=float)
+    total_votes = np.asarray(total_votes, dtype=float)
+    over_18 = np.asarray(over_18, dtype=float)
+
+    has_over_18 = over_18 > 0.0
+    safe_over_18 = np.where(has_over_18, over_18, 1.0)
+    dem_share = np.where(has_over_18, dem / safe_over_18, 0.0)
+    reg_share = np.where(has_over_18, registered_voters / safe_over_18, 0.0)
     
-    # for each of the queries return the remaining that match the conditions
-    for col, row in queries:
-        if len( vr_data[ vr_data[col] == row ] ) > 0:
-            vr_data = vr_data[ vr_data[col] == row ]
-        else:
-            vr_data = []
+    no_vote = over_18 - total_votes
+    peak_no_vote = max(float(no_vote.max(initial=0.0)), 0.0)
+    if peak_no_vote > 0.0:
+        rel_no_vote = no_vote / peak_no_vote
+    else:
+        rel_no_vote = np.zeros_like(no_vote)
+    
+    dem_pot = ( (rel_no_vote + dem_share) / 2.0 ) * 100.0
+
+    metrics = {
+            'dem_diff': (dem - rep).astype(int),
+            'dem_per': np.trunc(dem_share * 100.0).astype(int),
+            'reg_per': np.trunc(reg_share * 100.0).astype(int),
+            'no_vote': np.trunc(no_vote).astype(int),
+            'us_hou_dem_pot': np.trunc(dem_pot).astype(int)
+        }
+
+    return metrics
+
+
+def read_district_voting_results(state=48, district=7, leg_body='US-REP', 
+        voting_precincts_file=None, voting_results_file=None):
+    """Read the voting results of the precincts in a district for the offices in 
+    VOTING_RESULTS_QUERIES
+    Reading the csv file is I/O bound, so build_district() reads it in a thread 
+    while the census data is fetched and built.
+    Args: 
+        state: state of the district
+        district: district number
+        leg_body: legislative body, e.g., State Representative, State Senate, 
+                  or US Representative
+        voting_precincts_file: geospatial vector file of the voting precincts; 
+            None uses the voting precincts found in the district
+        voting_results_file: Open Elections csv file of the voting results; 
+            None uses VOTING_RESULTS_FILE
+    Returns: 
+        vr_data: DataFrame of the voting results, see read_voting_results()
+    """
+    if voting_precincts_file is None:
+        find_voting_precincts_in_district(state=state, district=district, leg_body=leg_body)
+        voting_precincts_file  = get_voting_precincts_geojson_filename(
+                state=state, district=district, leg_body=leg_body)
+    voting_precincts = read_layer(voting_precincts_file)
     
-    if len(vr_data) > 0:
-        query_result = int(vr_data.iloc[0]['votes'])
+    if voting_results_file is None:
+        voting_results_file = VOTING_RESULTS_FILE
+    
+    offices = sorted(set(row for queries in VOTING_RESULTS_QUERIES.values() 
+        for col, row in queries if col == 'office'))
+    vr_data = read_voting_results(
+            voting_results_file, 
+            precincts=[int(geoid) for geoid in voting_precincts.PRECINCT.tolist()], 
+            offices=offices
+        )
 
-    return query_result
+    return vr_data
 
 
 def make_voting_results_data(categories, district_data = {}, state=48, district=7, leg_body='US-REP', 
         election_year='2018', census_year='2016', district_config_file = 'static/data/district.json',
-        voting_precincts_file=None, voting_results_file=None):
+        voting_precincts_file=None, voting_results_file=None, voting_results_data=None):
     """Build voting results data per precinct and district from Open Elections file
     Args: 
         district_data:
         blockgroups:
         voting_precincts_file:
+        voting_results_data: the voting results from read_district_voting_results(); 
+            None reads them
     Returns: 
         categories:
         district_data:
@@ -1811,14 +3655,7 @@ def make_voting_results_data(categories, district_data = {}, state=48, district=
         find_voting_precincts_in_district(state=state, district=district, leg_body=leg_body)
         voting_precincts_file  = get_voting_precincts_geojson_filename(
                 state=state, district=district, leg_body=leg_body)
-    voting_precincts = gpd.read_file(voting_precincts_file)
-    
-    # read voting results
-    if voting_results_file is None:
-        # TODO download voting results from Open Elections, 
-        # e.g., https://github.com/openelections/openelections-data-tx
-        voting_results_file = 'static/data/20181106__tx__general__harris__precinct.csv'
-    voting_results_data = pd.read_csv(voting_results_file)
+    voting_precincts = read_layer(voting_precincts_file)
    
     # add election results info (election years) to district_config file
     with open(district_config_file) as district_json:
@@ -1856,146 +3693,73 @@ def make_voting_results_data(categories, district_data = {}, state=48, district=
         if field != 'over_18':
             district_data[election_year][district_key][field] = 0.0
     
-    # standardize voting_results_data
-    # convert party column to DEM or REP
-    if len(voting_results_data[ voting_results_data['party'] == 'Republican' ]) > 0:
-        voting_results_data.loc[ 
-                voting_results_data[ voting_results_data['party'] == 'Republican' ].index, 
-                'party' ] = 'REP'
-    if len(voting_results_data[ voting_results_data['party'] == 'Democratic' ]) > 0:
-        voting_results_data.loc[ 
-                voting_results_data[ voting_results_data['party'] == 'Democratic' ].index, 
-                'party' ] = 'DEM'
-        
-    # convert precinct column to int
-    voting_results_data.drop(
-            voting_results_data[ voting_results_data['precinct'] == 'TOTAL' ].index, 
-            inplace=True
-        )
-    voting_results_data['precinct'] = pd.to_numeric(voting_results_data['precinct'])
-    
-    peak_no_vote = 0
+    field_queries = VOTING_RESULTS_QUERIES
     
-    # initialize a progress bar for processing the precincts
-    total_precincts = len(voting_precincts)
-    pbar = tqdm(
-            total=total_precincts, initial=0, 
-            unit_scale=True, desc='Voting Precincts'
-        )
+    # read the voting results of the district's precincts, 
+    # unless build_district() read them while it built the census data
+    geoids = voting_precincts.PRECINCT.tolist()
+    if voting_results_data is None:
+        voting_results_data = read_district_voting_results(
+                state=state, 
+                district=district, 
+                leg_body=leg_body, 
+                voting_precincts_file=voting_precincts_file, 
+                voting_results_file=voting_results_file
+            )
     
-    field_queries = {
-            'us_pres_rep' : [['office', 'President'], ['party', 'REP']],
-            'us_pres_dem' : [['office', 'President'], ['party', 'DEM']],
-            'us_sen_rep' : [['office', 'U.S. Senate'], ['party', 'REP']],
-            'us_sen_dem' : [['office', 'U.S. Senate'], ['party', 'DEM']],
-            'us_hou_rep' : [['office', 'U.S. House'], ['party', 'REP']],
-            'us_hou_dem' : [['office', 'U.S. House'], ['party', 'DEM']],
-            'registered_voters' : [['office', 'Registered Voters']],
-            'total_votes' : [['office', 'Ballots Cast']]
-        }
     # dict for dataframe and excel file
     election_results = {}
     election_results['Precinct'] = []
     for field in fields:
         election_results[labels[field]] = []
 
+    # look up the voting results of all the precincts at once
+    voting_results_table = get_voting_results_table(
+            voting_results_data, field_queries, [int(geoid) for geoid in geoids])
+    
+    # calculate the district wide total for each field
+    for field in election_result_fields:
+        total = float(voting_results_table[field].sum())
+        district_data[election_year][district_key][field] = total
+        election_results[labels[field]] = voting_results_table[field].tolist()
+    
+    # calculate the derived metrics of all the precincts at once
+    over_18 = np.array([float(district_data[census_year][precinct_key][geoid]['over_18']) 
+        for geoid in geoids])
+    metrics = get_election_metrics(
+            dem=voting_results_table['us_hou_dem'].values,
+            rep=voting_results_table['us_hou_rep'].values,
+            registered_voters=voting_results_table['registered_voters'].values,
+            total_votes=voting_results_table['total_votes'].values,
+            over_18=over_18
+        )
+    metric_fields = ['dem_diff', 'dem_per', 'reg_per', 'us_hou_dem_pot']
+    
+    election_results['Precinct'] = [int(geoid) for geoid in geoids]
+    election_results[labels['over_18']] = over_18.astype(int).tolist()
+    for field in metric_fields:
+        election_results[labels[field]] = metrics[field].tolist()
+    
     # get the voting results for each precinct
-    for precIndex, precinct in voting_precincts.iterrows():
-        geoid = precinct.PRECINCT
-        election_results['Precinct'].append(int(geoid))
+    voting_results_rows = voting_results_table[election_result_fields].to_dict('records')
+    metric_rows = pd.DataFrame(metrics)[metric_fields].to_dict('records')
+    for geoid, voting_results_row, metric_row in zip(geoids, voting_results_rows, metric_rows):
         if geoid not in district_data[election_year][precinct_key].keys():
             district_data[election_year][precinct_key][geoid] = {} 
         
-        for field in election_result_fields:
-            # get the number of pres-rep votes in each precinct
-            query_result = query_voting_results( voting_results_data, int(geoid), field_queries[ field ] )
-            district_data[election_year][precinct_key][geoid][field] = query_result
-            election_results[labels[field]].append( query_result )
-            # get the total number of ballots cast
-            if field == 'total_votes':
-                total_votes = query_result
-             
-            # calculate the district wide total for field
-            total = district_data[election_year][district_key][field]
-            total = total + float(district_data[election_year][precinct_key][geoid][field])
-            district_data[election_year][district_key][field] = total
-
-        # calculate the democrat / republican difference
-        field = 'dem_diff'
-        dem = district_data[election_year][precinct_key][geoid]['us_hou_dem']
-        rep = district_data[election_year][precinct_key][geoid]['us_hou_rep']
-        district_data[election_year][precinct_key][geoid][field] = dem - rep
-        election_results[labels[field]].append( dem - rep )
-
-        # calculate the democrat percent turnout relative to the 18+ age population
-        field = 'dem_per'
-        over_18 = float(district_data[census_year][precinct_key][geoid]['over_18'])
-        election_results[labels['over_18']].append( int(over_18) )
-        if over_18 > 0.0: 
-            district_data[election_year][precinct_key][geoid][field] = int((float(dem) / over_18) * 100.0)
-            election_results[labels[field]].append( int((float(dem) / over_18) * 100.0) )
-        else:
-            district_data[election_year][precinct_key][geoid][field] = 0
-            election_results[labels[field]].append( 0 )
-
-        # calculate the registred voter percent relative to the 18+ age population
-        field = 'reg_per'
-        reg = district_data[election_year][precinct_key][geoid]['registered_voters']
-        if over_18 > 0.0:
-            district_data[election_year][precinct_key][geoid][field] = int((float(reg) / over_18) * 100.0)
-            election_results[labels[field]].append( int((float(reg) / over_18) * 100.0) )
-        else:
-            district_data[election_year][precinct_key][geoid][field] = 0
-            election_results[labels[field]].append( 0 )
-            
-        no_vote = over_18 - total_votes
-        if no_vote > peak_no_vote:
-            peak_no_vote = no_vote
-        pbar.update(1) 
-
-    pbar.close()
-
-
-    # calculate democratic potential factor = normalized non-voters plus dem percentage
-    for precIndex, precinct in voting_precincts.iterrows():
-        geoid = precinct.PRECINCT
-        
-        dem = float(district_data[election_year][precinct_key][geoid]['us_hou_dem'])
-        over_18 = float(district_data[census_year][precinct_key][geoid]['over_18'])
-        # temporary format
-        # if election_year == '2018':
-        #    total_votes = int(voting_results_data[ 
-        #                    (voting_results_data['PRECINCT'] == geoid) 
-        #                ].iloc[0]['TOTAL'])
-        # else:
-        # openelections format here
-        total_votes = query_voting_results( voting_results_data, int(geoid), field_queries[ 'total_votes' ] )
-       
-        no_vote = over_18 - total_votes
-        rel_no_vote = float(no_vote) / float(peak_no_vote)
-        field = 'us_hou_dem_pot'
-        if over_18 > 0.0:
-            dem_pot = ( (rel_no_vote + (dem / over_18) ) / 2.0 ) * 100.0
-        else:
-            dem_pot = ( rel_no_vote / 2.0 ) * 100.0
-        district_data[election_year][precinct_key][geoid][field] = int(dem_pot)
-        election_results[labels[field]].append( int(dem_pot) )
-
-    # calculate district wide difference
-    field = 'dem_diff'
-    dem = int(district_data[election_year][district_key]['us_hou_dem'])
-    rep = int(district_data[election_year][district_key]['us_hou_rep'])
-    district_data[election_year][district_key][field] = int(dem - rep)
-
-    # calculate district wide percentages
-    field = 'dem_per'
-    dem = float(district_data[election_year][district_key]['us_hou_dem'])
-    over_18 = float(district_data[census_year][district_key]['over_18'])
-    district_data[election_year][district_key][field] = int((dem / over_18) * 100.0)
-    
-    field = 'reg_per'
-    reg = float(district_data[election_year][district_key]['registered_voters'])
-    district_data[election_year][district_key][field] = int((reg / over_18) * 100.0)
+        district_data[election_year][precinct_key][geoid].update(voting_results_row)
+        district_data[election_year][precinct_key][geoid].update(metric_row)
+
+    # calculate the district wide metrics
+    district_metrics = get_election_metrics(
+            dem=np.array([district_data[election_year][district_key]['us_hou_dem']]),
+            rep=np.array([district_data[election_year][district_key]['us_hou_rep']]),
+            registered_voters=np.array([district_data[election_year][district_key]['registered_voters']]),
+            total_votes=np.array([district_data[election_year][district_key]['total_votes']]),
+            over_18=np.array([float(district_data[census_year][district_key]['over_18'])])
+        )
+    for field in ['dem_diff', 'dem_per', 'reg_per']:
+        district_data[election_year][district_key][field] = int(district_metrics[field][0])
     
     election_results = pd.DataFrame(election_results)
 
@@ -2008,49 +3772,125 @@ def make_voting_results_data(categories, district_data = {}, state=48, district=
     return categories, district_data
 
 
-def make_district_data(api, state, district, leg_body, year):
-    district_data=load_district_data()
+def get_district_data_path(state=48, district=7, leg_body='US-REP'):
+    """Return the path of the data files of a district built in a batch of districts
+    Args:
+        state: state of district
+        district: district number
+        leg_body: legislative body, e.g., State Representative, State Senate, 
+                  or US Representative
+    Returns:
+        data_path: path of the district's data files, e.g., static/data/US-REP-TX07/
+    Raises:
+        Nothing
+    """
+    state = "{0:0>2}".format(state)
+    district = "{0:0>2}".format(district)
+    state_abbr = str(states.mapping('fips', 'abbr')[state])
+    district_abbr = leg_body + '-' + state_abbr + district
+    
+    data_path = 'static/data/' + district_abbr + '/'
 
-    # Make the age categories and data for the district file
-    categories, district_data = make_age_data(
-            state=state,
-            district=district,
-            leg_body=leg_body,
-            api=api, 
-            district_data=district_data,
-            year=year)
+    return data_path
+
+
+def make_category_data(category, api, state, district, leg_body, year, census_data):
+    """Build the data for one census category independently of the other categories
+    Args:
+        category: census category, e.g., Age
+        api: Census api key
+        state: state of district
+        district: district number
+        leg_body: legislative body, e.g., State Representative, State Senate, 
+                  or US Representative
+        year: year of census data
+        census_data: census data from get_census_data()
+    Returns:
+        categories: dict of the category's fields and labels
+        district_data: dict of the category's data, to merge with merge_district_data()
+    Raises:
+        KeyError: if there is no builder for the category
+    """
+    category_builders = {
+            'Age': make_age_data,
+            'Income': make_income_data,
+            'Race': make_race_data,
+            'Education': make_edu_data
+        }
     
-    # Add income categories and data to the district file
-    categories, district_data = make_income_data(
-            state=state,
-            district=district,
-            leg_body=leg_body,
+    categories, district_data = category_builders[category](
             api=api,
-            district_data=district_data,
-            categories=categories,
-            year=year
-        )
-    
-    # Add race categories and data to the district file
-    categories, district_data = make_race_data(
+            district_data={},
+            categories={category: {}},
             state=state,
             district=district,
             leg_body=leg_body,
-            api=api,
-            district_data=district_data,
-            categories=categories,
-            year=year
+            year=year,
+            census_data=census_data
         )
-    # Add educational categories and data to the district file
-    categories, district_data = make_edu_data(
-            state=state,
-            district=district,
-            leg_body=leg_body,
-            api=api,
-            district_data=district_data,
-            categories=categories,
-            year=year
+
+    return categories, district_data
+
+
+def merge_district_data(district_data, partial_data):
+    """Merge the data of one category into the district data
+    Args:
+        district_data: dict of the district data, e.g., data[year][geounit][geoid][field]
+        partial_data: dict of data with the same layout
+    Returns:
+        district_data: the merged district data
+    Raises:
+        Nothing
+    """
+    for key, value in partial_data.items():
+        if isinstance(value, dict) and isinstance(district_data.get(key), dict):
+            merge_district_data(district_data[key], value)
+        else:
+            district_data[key] = value
+
+    return district_data
+
+
+def make_district_data(api, state, district, leg_body, year, census_workers=CENSUS_WORKERS,
+        data_path='static/data/', jobs=None, census_requests_per_second=CENSUS_REQUESTS_PER_SECOND):
+    district_data=load_district_data(data_path + 'district-data.json')
+
+    # Get the census data for all the categories in one pass
+    census_categories = list(CensusFields.registry.categories)
+    print( "\n" )
+    print( "Getting Census Data for " + ", ".join(census_categories) )
+    census_fields, category_fields = plan_census_fields(census_categories, year=year)
+    census_data = get_census_data(
+            api=api, 
+            category=census_categories, 
+            fields=census_fields,
+            state=state, 
+            district=district, 
+            leg_body=leg_body, 
+            year=year, 
+            census_workers=census_workers,
+            census_requests_per_second=census_requests_per_second,
+            district_config_file=data_path + 'district.json'
         )
+
+    # Make the categories and data for the district file
+    # each category is built separately, in a process pool if there is more than one job, 
+    # and the results are merged in the order of the categories; the matrix products 
+    # of a single district take less time than starting the processes, so the 
+    # categories are built in this process by default
+    if jobs is not None and jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            builds = [executor.submit(make_category_data, category, api, state, district, 
+                leg_body, year, census_data) for category in census_categories]
+            category_data = [build.result() for build in builds]
+    else:
+        category_data = [make_category_data(category, api, state, district, 
+            leg_body, year, census_data) for category in census_categories]
+    
+    categories = {}
+    for category_categories, category_district_data in category_data:
+        categories.update(category_categories)
+        district_data = merge_district_data(district_data, category_district_data)
     
     if leg_body == 'STATE-REP' or leg_body == 'STATE-SEN':
         district_data = make_district_data_for_state_leg(
@@ -2065,21 +3905,31 @@ def make_district_data(api, state, district, leg_body, year):
     return categories, district_data
 
 
-def main():
-    """Builds stats for a legislative district, e.g., a US Congressional District
+def build_district(census_api_key, state, district, leg_body, census_year, election_year,
+        voting_precincts_file=None, voting_results_file=None, census_workers=CENSUS_WORKERS,
+        data_path='static/data/', jobs=None, census_requests_per_second=CENSUS_REQUESTS_PER_SECOND):
+    """Build the stats for a legislative district and write its data files
+    Args:
+        census_api_key: Census api key
+        state: state of district
+        district: district number
+        leg_body: legislative body, e.g., State Representative, State Senate, 
+                  or US Representative
+        census_year: year of census data
+        election_year: year of voting results
+        voting_precincts_file: geospatial vector file of the voting precincts
+        voting_results_file: Open Elections csv file of the voting results
+        census_workers: number of concurrent requests to the Census API
+        data_path: path the data files are written to
+        jobs: number of processes building the categories; None builds them in this process
+        census_requests_per_second: maximum rate of requests to the Census API
+    Returns:
+        Nothing
+    Raises:
+        Nothing
     """
-    args = get_command_line_args()
-    settings = read_settings(args)
-    
-    census_api_key = settings['census_api_key']
-    state = settings['state']
-    district = settings['district']
-    leg_body = settings['leg_body']
-    census_year = settings['census_year']
-    election_year = settings['election_year']
-    voting_precincts_file = settings['voting_precincts']
-    voting_results_file = settings['voting_results']
-    
+    mkdir_p(data_path)
+
     find_blockgroups_in_district(
             state=state,
             district=district,
@@ -2087,13 +3937,27 @@ def main():
             year=census_year
         )
 
-    categories, district_data = make_district_data(
-            api=census_api_key,
-            state=state,
-            district=district,
-            leg_body=leg_body,
-            year=census_year
-        )
+    # read the voting results in a thread, as the census data is fetched and built
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        voting_results_read = executor.submit(read_district_voting_results, 
+                state=state,
+                district=district,
+                leg_body=leg_body,
+                voting_precincts_file=voting_precincts_file, 
+                voting_results_file=voting_results_file
+            )
+        categories, district_data = make_district_data(
+                api=census_api_key,
+                state=state,
+                district=district,
+                leg_body=leg_body,
+                year=census_year,
+                census_workers=census_workers,
+                census_requests_per_second=census_requests_per_second,
+                data_path=data_path,
+                jobs=jobs
+            )
+        voting_results_data = voting_results_read.result()
 
     # Estimate voting precinct data based on block group data
     district_data = make_voting_precinct_data(
@@ -2114,12 +3978,139 @@ def main():
             leg_body=leg_body, 
             election_year=election_year,
             census_year=census_year,
+            district_config_file=data_path + 'district.json',
             voting_precincts_file=voting_precincts_file, 
-            voting_results_file=voting_results_file
+            voting_results_file=voting_results_file,
+            voting_results_data=voting_results_data
         )
 
-    to_json(district_data, "static/data/district-data.json")
-    to_json(categories, "static/data/categories.json")
+    to_json(district_data, data_path + "district-data.json")
+    to_json(categories, data_path + "categories.json")
+
+
+def build_districts(census_api_key, state, districts, leg_body, census_year, election_year,
+        voting_precincts_file=None, voting_results_file=None, census_workers=CENSUS_WORKERS,
+        workers=None):
+    """Build the stats for several districts of a legislative body
+    The statewide layers are read once to find the block groups and voting precincts 
+    in all the districts, and then each district is built in its own process. 
+    The data files of each district are written to get_district_data_path(). 
+    The districts built at the same time share CENSUS_REQUESTS_PER_SECOND, 
+    so a batch is not rate limited any less than a single district.
+    Args:
+        census_api_key: Census api key
+        state: state of the districts
+        districts: list of district numbers
+        leg_body: legislative body, e.g., State Representative, State Senate, 
+                  or US Representative
+        census_year: year of census data
+        election_year: year of voting results
+        voting_precincts_file: geospatial vector file of the voting precincts
+        voting_results_file: Open Elections csv file of the voting results
+        census_workers: number of concurrent requests to the Census API per district
+        workers: number of districts built at the same time; None uses the cpu count
+    Returns:
+        failed_districts: list of the districts that failed to build
+    Raises:
+        Nothing
+    """
+    find_blockgroups_in_districts(
+            state=state, districts=districts, leg_body=leg_body, year=census_year)
+    if voting_precincts_file is None:
+        find_voting_precincts_in_districts(
+                state=state, districts=districts, leg_body=leg_body)
+
+    # compile the census variables index before the districts share it
+    get_census_variables_index(census_year)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    census_requests_per_second = CENSUS_REQUESTS_PER_SECOND / max(1, min(workers, len(districts)))
+
+    failed_districts = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        builds = {}
+        for district in districts:
+            build = executor.submit(build_district, 
+                    census_api_key=census_api_key,
+                    state=state,
+                    district=district,
+                    leg_body=leg_body,
+                    census_year=census_year,
+                    election_year=election_year,
+                    voting_precincts_file=voting_precincts_file,
+                    voting_results_file=voting_results_file,
+                    census_workers=census_workers,
+                    census_requests_per_second=census_requests_per_second,
+                    data_path=get_district_data_path(state=state, district=district, leg_body=leg_body),
+                    # the districts are already built in parallel
+                    jobs=1
+                )
+            builds[build] = district
+        
+        for build in as_completed(builds):
+            district = builds[build]
+            try:
+                build.result()
+                print( "Built district {district}".format(district=district) )
+            except Exception as e:
+                print( "Failed to build district {district}: {error}".format(district=district, error=e) )
+                failed_districts.append(district)
+
+    return sorted(failed_districts)
+
+
+def main():
+    """Builds stats for a legislative district, e.g., a US Congressional District
+    """
+    args = get_command_line_args()
+    settings = read_settings(args)
+    
+    census_api_key = settings['census_api_key']
+    state = settings['state']
+    district = settings['district']
+    leg_body = settings['leg_body']
+    census_year = settings['census_year']
+    election_year = settings['election_year']
+    voting_precincts_file = settings['voting_precincts']
+    voting_results_file = settings['voting_results']
+    census_workers = settings['census_workers']
+    districts = settings['districts']
+    jobs = settings['jobs']
+    
+    if districts is None:
+        build_district(
+                census_api_key=census_api_key,
+                state=state,
+                district=district,
+                leg_body=leg_body,
+                census_year=census_year,
+                election_year=election_year,
+                voting_precincts_file=voting_precincts_file,
+                voting_results_file=voting_results_file,
+                census_workers=census_workers,
+                jobs=jobs
+            )
+        return
+
+    if districts == 'all':
+        districts = get_state_district_numbers(state=state, leg_body=leg_body)
+    
+    failed_districts = build_districts(
+            census_api_key=census_api_key,
+            state=state,
+            districts=districts,
+            leg_body=leg_body,
+            census_year=census_year,
+            election_year=election_year,
+            voting_precincts_file=voting_precincts_file,
+            voting_results_file=voting_results_file,
+            census_workers=census_workers,
+            workers=jobs
+        )
+    if len(failed_districts) > 0:
+        raise SystemExit( "Failed to build districts: " + 
+                ", ".join(str(d) for d in failed_districts) )
 
 
 if __name__ == "__main__":
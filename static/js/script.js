@@ -30,11 +30,13 @@ var chart_intervals = 100;
 var color = Chart.helpers.color;
 var colorNames = Object.keys(chartColors);
 var data = {};
+var data_requests = {};
 var distribution_chart_data;
 var distribution_geounits;
 var district_chart_data;
 var district_file;
 var district_layer;
+var district_name = new URLSearchParams(window.location.search).get('district');
 var district_min = Number.MAX_VALUE; 
 var district_max = -Number.MAX_VALUE;
 var district_title = "";
@@ -51,12 +53,16 @@ var geounit_labels = {
 	'precinct': 'Precinct'
 };
 var geounits_layer;
+var geounit_tiles = {};
 var hover_geounits = [];
 var labels;
 var map;
+var map_field;
+var map_field_year;
 var map_year = '2016';
 var property_name;
 var slideout;
+var tile_max_zoom = 14;
 var years;
 var census_years;
 var election_years;
@@ -86,8 +92,6 @@ window.onload = loadGoogleMapsAPI;
  * returns nothing
  **/
 function init() {
-	var latitude;
-	var longitude;
 	// enable slideout functionality	
 	slideout = new Slideout({
 		'panel': document.getElementById('panel'),
@@ -133,20 +137,44 @@ function init() {
 	geounit_type = 'bg';
 	property_name = 'GEOID';
 
+	// get the district config, the categories, and the data of the default field
 	$.ajax({
-  		url: '/static/data/district.json',
-  		async: false,
-  		dataType: 'json',
-  		success: function (json) {
-    		census_years = json['census_years'].sort();
-    		election_years = json['election_years'].sort();
-			geounit_files['bg'] = json['bg_geojson'];
-			geounit_files['precinct'] = json['precinct_geojson'];
-			district_file = json['district_geojson'];
-			latitude = json['lat'];
-			longitude = json['lng'];
-			district_title = json['title'];
-  		}
+		url: get_district_url('/api/bootstrap'),
+		data: {
+			year: census_year,
+			geounit: geounit_type,
+			category: category,
+			category_type: category_type
+		},
+		dataType: 'json',
+		success: init_dashboard
+	});
+}
+
+
+/**
+ * init_dashboard(bootstrap) initializes the map and charts 
+ * using the response of /api/bootstrap
+ * returns nothing
+ **/
+function init_dashboard(bootstrap) {
+	var json = bootstrap['district'];
+	census_years = json['census_years'].sort();
+	election_years = json['election_years'].sort();
+	geounit_files['bg'] = json['bg_geojson'];
+	geounit_files['precinct'] = json['precinct_geojson'];
+	district_file = json['district_geojson'];
+	var latitude = json['lat'];
+	var longitude = json['lng'];
+	district_title = json['title'];
+	categories = bootstrap['categories'];
+
+	// store the data of the default field, so it is not requested again
+	if( bootstrap['column'] !== null ) {
+		fetch_column(bootstrap['year'], bootstrap['geounit'], bootstrap['field'], bootstrap['column']);
+	}
+	$.each(bootstrap['districts'], function (year, district_row) {
+		fetch_district(year, district_row);
 	});
 
 	years = census_years;
@@ -154,14 +182,6 @@ function init() {
 
 	$('h4#district-title').html(district_title);
 	
-	$.ajax({
-  		url: '/static/data/district-data.json',
-  		async: false,
-  		dataType: 'json',
-  		success: function (json) {
-    		data = json;
-  		}
-	});	
 	var uluru = {lat: latitude, lng: longitude};
     map = new google.maps.Map(document.getElementById('map'), {
     	zoom: 11,
@@ -187,16 +207,6 @@ function init() {
 	geounits_layer.addListener('click', click_region);
 
 	// fill in the options for the variable selection
-	// get category fields
-	$.ajax({
-  		url: '/static/data/categories.json',
-  		async: false,
-  		dataType: 'json',
-  		success: function (json) {
-    		categories = json;
-  		}
-	});	
-	
 	var databox = document.getElementById('data-box');
     map.controls[google.maps.ControlPosition.RIGHT_TOP].push(databox);
 	
@@ -207,12 +217,21 @@ function init() {
 	var select_box = document.getElementById('fields');
 	var selected_variable = select_box.options[select_box.selectedIndex].value;
 	google.maps.event.addDomListener(select_box, 'change', function() {
-		clear_map_data();
-        load_map_data(select_box.options[select_box.selectedIndex].value);
-        load_distribution_chart(select_box.options[select_box.selectedIndex].value);
-		load_district_chart(select_box.options[select_box.selectedIndex].value);
-		load_top_geounits(select_box.options[select_box.selectedIndex].value);
-		document.getElementById('geounit_chart').style.display = 'none';
+		var selected_variable = select_box.options[select_box.selectedIndex].value;
+		var selected_geounit = geounit_type;
+		fetch_field_data(selected_variable).done(function() {
+			// skip the data of a field that is no longer selected
+			if( selected_variable !== select_box.options[select_box.selectedIndex].value ||
+					selected_geounit !== geounit_type ) {
+				return;
+			}
+			clear_map_data();
+			load_map_data(selected_variable);
+			load_distribution_chart(selected_variable);
+			load_district_chart(selected_variable);
+			load_top_geounits(selected_variable);
+			document.getElementById('geounit_chart').style.display = 'none';
+		});
     });
 
 	load_maps();
@@ -238,14 +257,127 @@ function load_maps() {
 		controls.style.opacity = 1;
 	});
 	district_layer.loadGeoJson(district_file);
-	
-	geounits_layer.loadGeoJson(
-		geounit_files[geounit_type],
-		{ idPropertyName: property_name },
-		function (features) {
-			google.maps.event.trigger(document.getElementById('fields'), 'change');
+
+	// load the geounits in the viewport whenever the map stops moving
+	map.addListener('idle', load_geounit_tiles);
+	google.maps.event.trigger(document.getElementById('fields'), 'change');
+}
+
+
+/**
+ * get_viewport_tiles(z) returns the [x, y] of the tiles
+ * at zoom level z that cover the map viewport
+ *
+ **/
+function get_viewport_tiles(z) {
+	var bounds = map.getBounds();
+	var tiles = Math.pow(2, z);
+	var tile_x = function (lng) {
+		return Math.min(tiles - 1, Math.max(0, Math.floor((lng + 180) / 360 * tiles)));
+	};
+	var tile_y = function (lat) {
+		var radians = lat * Math.PI / 180;
+		var y = (1 - Math.log(Math.tan(radians) + 1 / Math.cos(radians)) / Math.PI) / 2 * tiles;
+		return Math.min(tiles - 1, Math.max(0, Math.floor(y)));
+	};
+	var viewport_tiles = [];
+	for (var x = tile_x(bounds.getSouthWest().lng()); x <= tile_x(bounds.getNorthEast().lng()); x++) {
+		for (var y = tile_y(bounds.getNorthEast().lat()); y <= tile_y(bounds.getSouthWest().lat()); y++) {
+			viewport_tiles.push([x, y]);
+		}
+	}
+	return viewport_tiles;
+}
+
+
+/**
+ * load_geounit_tiles() requests the tiles of the geounits in the map viewport
+ * that are not loaded yet
+ *
+ * returns nothing
+ *
+ **/
+function load_geounit_tiles() {
+	if( map.getBounds() === undefined ) {
+		return;
+	}
+	var z = Math.min(map.getZoom(), tile_max_zoom);
+	var my_geounit = geounit_type;
+	var viewport_tiles = get_viewport_tiles(z);
+	for (var i = 0; i < viewport_tiles.length; i++) {
+		var url = get_district_url('/tiles/' + my_geounit + '/' + z + '/' +
+			viewport_tiles[i][0] + '/' + viewport_tiles[i][1] + '.geojson');
+		if( url in geounit_tiles ) {
+			continue;
+		}
+		geounit_tiles[url] = $.ajax({
+			url: url,
+			dataType: 'json'
+		}).done(function (json) {
+			// skip the tiles of a geounit that is no longer shown
+			if( my_geounit === geounit_type ) {
+				add_tile_features(json, z);
+			}
+		}).fail((function (url) {
+			return function () {
+				delete geounit_tiles[url];
+			};
+		})(url));
+	}
+}
+
+
+/**
+ * add_tile_features(json, z) adds the features of a tile to the geounits layer
+ * a feature is in every tile it intersects, so it is only added again
+ * if this tile has a finer resolution, i.e., zoom level
+ *
+ * returns nothing
+ *
+ **/
+function add_tile_features(json, z) {
+	var tile_features = [];
+	for (var i = 0; i < json['features'].length; i++) {
+		var feature = json['features'][i];
+		var geoid = feature['properties'][property_name].toString();
+		var loaded_feature = geounits_layer.getFeatureById(geoid);
+		if( loaded_feature !== undefined ) {
+			if( loaded_feature.getProperty('tile_zoom') >= z ) {
+				continue;
+			}
+			geounits_layer.remove(loaded_feature);
 		}
-	);
+		feature['properties'][property_name] = geoid;
+		feature['properties']['tile_zoom'] = z;
+		tile_features.push(feature);
+	}
+	json['features'] = tile_features;
+
+	var features = geounits_layer.addGeoJson(json, { idPropertyName: property_name });
+	for (var i = 0; i < features.length; i++) {
+		set_feature_data(features[i]);
+	}
+}
+
+
+/**
+ * clear_geounits() removes the geounits from the map and loads the tiles
+ * of the current geounit type
+ *
+ * returns nothing
+ *
+ **/
+function clear_geounits() {
+	geounits_layer.forEach(function(feature){
+		geounits_layer.remove(feature);
+	});
+	geounit_tiles = {};
+	map_field = undefined;
+
+	// clear the geounits which are highlighted from the previous distribution chart
+	hover_geounits = [];
+
+	load_geounit_tiles();
 }
 
 
@@ -338,23 +470,9 @@ function load_election_results(y) {
 	geounit_type = 'precinct';
 	property_name = 'PRECINCT';
 	
-	// clear geounits_layer
-	geounits_layer.forEach(function(feature){
-		geounits_layer.remove(feature);
-	});
-	
-	// clear the geounits which are highlighted from the previous distribution chart
-	hover_geounits = [];
-	
+	clear_geounits();
 	set_select_box();
-	
-	geounits_layer.loadGeoJson(
-		geounit_files[geounit_type],
-		{ idPropertyName: property_name },
-		function (features) {
-			google.maps.event.trigger(document.getElementById('fields'), 'change');
-		}
-	);
+	google.maps.event.trigger(document.getElementById('fields'), 'change');
 
 	return false;
 }
@@ -383,28 +501,156 @@ function load_geounit(geounit) {
 		}
 	}
 
-	// clear geounits_layer
-	geounits_layer.forEach(function(feature){
-		geounits_layer.remove(feature);
-	});
-	
-	// clear the geounits which are highlighted from the previous distribution chart
-	hover_geounits = [];
-	
+	clear_geounits();
 	set_select_box();
-	
-	geounits_layer.loadGeoJson(
-		geounit_files[geounit_type],
-		{ idPropertyName: property_name },
-		function (features) {
-			google.maps.event.trigger(document.getElementById('fields'), 'change');
-		}
-	);
+	google.maps.event.trigger(document.getElementById('fields'), 'change');
 
 	return false;
 }
 
 
+/**
+ * get_district_url(url) adds the district of the page, e.g., 
+ * /?district=US-REP-TX07, to the url of a request to the server
+ *
+ * returns the url
+ *
+ **/
+function get_district_url(url) {
+	if( district_name === null ) {
+		return url;
+	}
+	return url + '?district=' + encodeURIComponent(district_name);
+}
+
+
+/**
+ * fetch_data(url, year, geounit, store, json) requests a slice of the district data 
+ * from the data api, unless it was already requested, 
+ * and stores it in data[year][geounit] using store(rows, json)
+ * if json is given, e.g., by /api/bootstrap, it is stored instead of requested
+ *
+ * returns a jQuery promise that is resolved once the slice is stored
+ *
+ **/
+function fetch_data(url, year, geounit, store, json) {
+	if( !(url in data_requests) ) {
+		var request;
+		if( json === undefined ) {
+			request = $.ajax({
+				url: url,
+				dataType: 'json'
+			});
+		}
+		else {
+			request = $.when(json);
+		}
+		data_requests[url] = request.then(function (json) {
+			if( !(year in data) ) {
+				data[year] = {};
+			}
+			if( !(geounit in data[year]) ) {
+				data[year][geounit] = {};
+			}
+			store(data[year][geounit], json);
+		}, function () {
+			// let a failed request be tried again
+			delete data_requests[url];
+		});
+	}
+	return data_requests[url];
+}
+
+
+/**
+ * fetch_column(year, geounit, field, json) requests the values of a field
+ * for every geounit, e.g., block group or precinct
+ *
+ * returns a jQuery promise
+ *
+ **/
+function fetch_column(year, geounit, field, json) {
+	var url = get_district_url('/api/data/' + encodeURIComponent(year) + '/' + 
+		encodeURIComponent(geounit) + '/' + encodeURIComponent(field));
+	return fetch_data(url, year, geounit, function (rows, json) {
+		for (var i = 0; i < json['geoids'].length; i++) {
+			var geoid = json['geoids'][i];
+			if( !(geoid in rows) ) {
+				rows[geoid] = {};
+			}
+			rows[geoid][field] = json['values'][i];
+		}
+	}, json);
+}
+
+
+/**
+ * fetch_district(year, json) requests the data of the district for a year
+ *
+ * returns a jQuery promise
+ *
+ **/
+function fetch_district(year, json) {
+	var url = get_district_url('/api/data/' + encodeURIComponent(year) + '/district');
+	return fetch_data(url, year, 'district', function (rows, json) {
+		$.extend(rows, json);
+	}, json);
+}
+
+
+/**
+ * fetch_geounit(year, geounit, geoid) requests every field of a geounit
+ *
+ * returns a jQuery promise
+ *
+ **/
+function fetch_geounit(year, geounit, geoid) {
+	var url = get_district_url('/api/geounit/' + encodeURIComponent(year) + '/' + 
+		encodeURIComponent(geounit) + '/' + encodeURIComponent(geoid));
+	return fetch_data(url, year, geounit, function (rows, json) {
+		if( !(geoid in rows) ) {
+			rows[geoid] = {};
+		}
+		$.extend(rows[geoid], json);
+	});
+}
+
+
+/**
+ * get_chart_years() returns the years shown in the charts,
+ * including the census year of the population over 18 for the voting results
+ *
+ **/
+function get_chart_years() {
+	var chart_years = years.concat();
+	if( category === 'Voting Results' && chart_years.indexOf(census_year) < 0 ) {
+		chart_years.push(census_year);
+	}
+	return chart_years;
+}
+
+
+/**
+ * fetch_field_data(selected_variable) requests the data needed for the map 
+ * and the charts of a field
+ *
+ * returns a jQuery promise
+ *
+ **/
+function fetch_field_data(selected_variable) {
+	var my_year = map_year;
+	if( category === 'Voting Results' && selected_variable === 'over_18' ){
+		my_year = census_year;
+	}
+	var requests = [fetch_column(my_year, geounit_type, selected_variable)];
+	var chart_years = get_chart_years();
+	for (var i = 0; i < chart_years.length; i++) {
+		requests.push(fetch_district(chart_years[i]));
+	}
+	return $.when.apply($, requests);
+}
+
+
 /**
  * load_map_data(selected_variable) combines the census data or election results
  *
@@ -419,15 +665,13 @@ function load_map_data(selected_variable) {
 	if( category === 'Voting Results' && selected_variable === 'over_18' ){
 		my_year = census_year;
 	}
-	geounits_layer.forEach(function(feature){
-		var geoid = feature.getProperty(property_name);
-		if(debug_is_on){	
-			console.log('GEOID:  ' + geoid);
-			console.log('Geounit Type:  ' + geounit_type);
-			console.log(data[my_year][geounit_type.toString()]);
+	// the min and max are taken over the district, not only the loaded geounits
+	$.each(data[my_year][geounit_type.toString()], function(geoid, row){
+		if( !(selected_variable in row) ) {
+			return;
 		}
-		var data_value = parseInt(data[my_year][geounit_type.toString()][geoid.toString()][selected_variable]);
-		
+		var data_value = parseInt(row[selected_variable]);
+
 		// keep track of min and max values
 		if (data_value < district_min) {
 		  	district_min = data_value;
@@ -435,13 +679,13 @@ function load_map_data(selected_variable) {
 		if (data_value > district_max) {
 		  	district_max = data_value;
 		}
-
-		// update the existing row with the new data
-		feature.setProperty('data_value', data_value);
-		feature.setProperty('label', labels[selected_variable]);
-
 	});
 
+	// update the loaded geounits with the new data
+	map_field = selected_variable;
+	map_field_year = my_year;
+	geounits_layer.forEach(set_feature_data);
+
 	// update and display the legend
 	document.getElementById('variable-min').textContent =
 	  district_min.toString();
@@ -450,6 +694,47 @@ function load_map_data(selected_variable) {
 }
 
 
+/**
+ * set_feature_data(feature) sets the data value of a geounit
+ * for the field shown on the map
+ *
+ * returns nothing
+ *
+ **/
+function set_feature_data(feature) {
+	if( map_field === undefined || !(map_field_year in data) ||
+			!(geounit_type in data[map_field_year]) ) {
+		return;
+	}
+	var geoid = feature.getProperty(property_name);
+	if(debug_is_on){
+		console.log('GEOID:  ' + geoid);
+		console.log('Geounit Type:  ' + geounit_type);
+	}
+	var row = data[map_field_year][geounit_type][geoid.toString()];
+	if( row === undefined || !(map_field in row) ) {
+		return;
+	}
+	feature.setProperty('data_value', parseInt(row[map_field]));
+	feature.setProperty('label', labels[map_field]);
+}
+
+
+/**
+ * set_chart_state(geoid, chart_state) sets the chart state of a geounit,
+ * if it is loaded on the map
+ *
+ * returns nothing
+ *
+ **/
+function set_chart_state(geoid, chart_state) {
+	var feature = geounits_layer.getFeatureById(geoid.toString());
+	if( feature !== undefined ) {
+		feature.setProperty('chart_state', chart_state);
+	}
+}
+
+
 /**
  * clear_map_data() removes census data from each shape on the map and resets the UI. 
  * 
@@ -568,8 +853,15 @@ function click_region(e) {
 	var geoid = e.feature.getProperty(property_name);
 	var select_box = document.getElementById('fields');
 	var selected_variable = select_box.options[select_box.selectedIndex].value;
+	var chart_years = get_chart_years();
+	var requests = [];
+	for (var i = 0; i < chart_years.length; i++) {
+		requests.push(fetch_geounit(chart_years[i], geounit_type, geoid.toString()));
+	}
 
-	load_geounit_chart(geoid, selected_variable);
+	$.when.apply($, requests).done(function() {
+		load_geounit_chart(geoid, selected_variable);
+	});
 }
 
 
@@ -645,10 +937,12 @@ function load_distribution_chart(selected_variable) {
 		barchart_labels[i] = interval.toString();
 	}
 	distribution_geounits = new Array(chart_intervals).fill([])
-	geounits_layer.forEach(function(feature){
-		var geoid = feature.getProperty(property_name);
+	$.each(data[my_year][geounit_type], function(geoid, row){
+		if( !(selected_variable in row) ) {
+			return;
+		}
 		console.log('geoid:  ' + geoid + '  selected_variable:  ' + selected_variable);
-		var data_value = parseInt(data[my_year][geounit_type][geoid.toString()][selected_variable]);
+		var data_value = parseInt(row[selected_variable]);
 		console.log('geoid:  ' + geoid + '  data_value:  ' + data_value);
 		var interval = Math.floor(
 			(chart_intervals - 1) *
@@ -676,7 +970,7 @@ function load_distribution_chart(selected_variable) {
 
 	// clear any highlighting
 	for(i=0; i < hover_geounits.length; i++) {
-		geounits_layer.getFeatureById(hover_geounits[i]).setProperty('chart_state', 'normal');
+		set_chart_state(hover_geounits[i], 'normal');
 	}
 
 	window.bar_chart.options.title.text = title;
@@ -694,13 +988,13 @@ function mouse_on_distrib_chart(e, a) {
 	if(a.length > 0){
 		// clear old data
 		for(i=0; i < hover_geounits.length; i++) {
-			geounits_layer.getFeatureById(hover_geounits[i]).setProperty('chart_state', 'normal');
+			set_chart_state(hover_geounits[i], 'normal');
 		}
 
 		var index = a[0]._index;
 		hover_geounits = distribution_geounits[index].concat();
 		for(i=0; i < hover_geounits.length; i++) {
-			geounits_layer.getFeatureById(hover_geounits[i]).setProperty('chart_state', 'hover');
+			set_chart_state(hover_geounits[i], 'hover');
 		}
 	}
 }
@@ -712,7 +1006,6 @@ function mouse_on_distrib_chart(e, a) {
  * 
  **/
 function init_district_chart(selected_variable) {
-	var barchart_values = [];
 	var barchart_labels = [];
 
 	district_chart_data = {
@@ -720,70 +1013,7 @@ function init_district_chart(selected_variable) {
 			datasets: []
 		};
 
-	// if the map category is displaying voting results
-	if( category === 'Voting Results' ) {
-		var my_fields = [];
-		var my_year = election_year;
-		if( selected_variable === 'us_dem_pot' || selected_variable === 'reg_per' || selected_variable === 'dem_per' ) {
-			my_fields = ['reg_per', 'dem_per'];
-		}
-		else {
-			my_fields = [ 'over_18', 'registered_voters', 'us_hou_dem', 'dem_diff' ];
-		}
-		for(var i = 0; i < my_fields.length; i++) {
-			if(map_year === '2018' && my_fields[i] === 'over_18') {
-				my_year = census_year;
-				console.log("Year: " + my_year);
-			}
-			else {
-				my_year = election_year;
-			}
-			barchart_values[i] = data[my_year]['district'][my_fields[i]];
-		}
-		var colorName = colorNames[district_chart_data.datasets.length % colorNames.length];
-		var dsColor = chartColors[colorName];
-		district_chart_data.datasets.push({
-				label: my_year,
-				backgroundColor: color(dsColor).alpha(0.5).rgbString(),
-				borderColor: dsColor,
-				borderWidth: 1,
-				data: barchart_values,
-			});
-		// set barchart labels
-		for(var i = 0; i < my_fields.length; i++) {
-			barchart_labels[i] = labels[my_fields[i]];
-		}
-	}
-	// else populate district chart using default configuration
-	else {
-		for(var j = 0; j < years.length; j++) {
-			barchart_values = [];
-			console.log("Year:  " + years[j] );
-			var my_year = years[j];
-
-			for(var i = 0; i < fields.length; i++) {
-				barchart_values[i] = data[my_year]['district'][fields[i]];
-			}
-			var colorName = colorNames[district_chart_data.datasets.length % colorNames.length];
-			var dsColor = chartColors[colorName];
-			district_chart_data.datasets.push({
-					label: years[j],
-					backgroundColor: color(dsColor).alpha(0.5).rgbString(),
-					borderColor: dsColor,
-					borderWidth: 1,
-					data: barchart_values,
-				});
-		}
-		// set barchart labels
-		for(var i = 0; i < fields.length; i++) {
-			barchart_labels[i] = labels[fields[i]];
-		}
-		var index = barchart_labels.indexOf(labels['median_income']);
-		if (index > -1) {
-			barchart_labels.splice(index, 1);
-		}
-	}
-	
+	// the datasets are loaded by load_district_chart() once the district data is fetched
 	district_chart_data.labels = barchart_labels;
 
 	var ctx = document.getElementById('district_chart').getContext('2d');
@@ -1028,10 +1258,12 @@ function load_top_geounits(selected_variable) {
 		my_year = census_year;
 	}
 
-	geounits_layer.forEach(function(feature){
-		var geoid = feature.getProperty(property_name);
-		var data_value = parseInt(data[my_year][geounit_type][geoid.toString()][selected_variable]);
-		
+	$.each(data[my_year][geounit_type], function(geoid, row){
+		if( !(selected_variable in row) ) {
+			return;
+		}
+		var data_value = parseInt(row[selected_variable]);
+				
 		total = parseInt(data_value) + total;
 		geounits.push([geoid, data_value]);
 	});
@@ -8,7 +8,10 @@
 # Released under the BSD 3-Clause License
 # See https://github.com/jksinton/Statistical-Districts/blob/master/LICENSE
 
-from collections import OrderedDict
+from collections import namedtuple, OrderedDict
+from types import MappingProxyType
+
+import numpy as np
 
 class CensusFields:
     """Static methods that return the fields for various census data classes
@@ -19,9 +22,11 @@ class CensusFields:
         get_under_100k_income_fields()
         get_over_100k_income_fields()
         get_race_fields()
-        get_race_fields()
+        get_edu_fields()
+        get_class_groups()
+        get_categories()
     Attributes:
-        None
+        registry: CensusRegistry of all the census classes, compiled at import
     """
     @staticmethod
     def get_under_18_fields():
@@ -321,3 +326,161 @@ class CensusFields:
         edu_fields = OrderedDict()
 
         return edu_fields
+
+    @staticmethod
+    def get_class_groups():
+        """Return the groups of census classes that are aggregated together
+        Args:
+            Nothing
+        Returns: 
+            class_groups: OrderedDict of group -> OrderedDict of census classes
+        """
+        class_groups = OrderedDict()
+        class_groups['age'] = CensusFields.get_age_fields()
+        class_groups['under_18'] = OrderedDict([ 
+                ('under_18', CensusFields.get_under_18_fields()) ])
+        class_groups['income'] = CensusFields.get_income_fields()
+        class_groups['over_100k'] = OrderedDict([ 
+                ('over_100k', CensusFields.get_over_100k_income_fields()) ])
+        class_groups['under_100k'] = OrderedDict([ 
+                ('under_100k', CensusFields.get_under_100k_income_fields()) ])
+        class_groups['race'] = CensusFields.get_race_fields()
+        class_groups['edu'] = CensusFields.get_edu_fields()
+
+        return class_groups
+
+    @staticmethod
+    def get_categories():
+        """Return the class groups and the other census fields used by each category
+        Args:
+            Nothing
+        Returns: 
+            categories: OrderedDict of category -> dict of its class groups and fields
+        """
+        categories = OrderedDict()
+        categories['Age'] = { 
+                'groups': ['age', 'under_18'], 
+                'fields': ['B01001_001E'] # Total population
+            }
+        categories['Income'] = { 
+                'groups': ['income', 'over_100k', 'under_100k'], 
+                'fields': [
+                    'B19001_001E', # Total households
+                    'B19013_001E'  # Median household income
+                ]
+            }
+        categories['Race'] = { 
+                'groups': ['race'], 
+                'fields': ['B02001_001E'] # Total population
+            }
+        categories['Education'] = { 
+                'groups': ['edu'], 
+                'fields': ['B15002_001E'] # Total population 25 years and over
+            }
+
+        return categories
+
+
+CensusClass = namedtuple('CensusClass', ['name', 'label', 'fields', 'indices'])
+
+
+class CensusRegistry(object):
+    """Census classes compiled into immutable, index-based structures
+    Every census field referenced by a class or a category is given a column index, 
+    and each class is compiled to the column indices of its fields. The same registry 
+    plans the fields to fetch and aggregates the fetched data.
+    Attributes:
+        variables: tuple of the census fields, in column order
+        variable_index: mapping of census field -> column index
+        categories: tuple of the categories, e.g., ('Age', 'Income')
+        classes: mapping of class group -> tuple of CensusClass
+        category_fields: mapping of category -> tuple of the census fields it needs
+        class_matrices: mapping of class group -> (fields, aggregation matrix), where 
+            the read-only matrix (fields x classes) sums the fields of each class
+    """
+    def __init__(self, class_groups, categories):
+        variables = []
+        variable_index = {}
+        
+        def add_variable(field):
+            if field not in variable_index:
+                variable_index[field] = len(variables)
+                variables.append(field)
+            return variable_index[field]
+        
+        classes = OrderedDict()
+        class_matrices = OrderedDict()
+        for group, census_classes in class_groups.items():
+            classes[group] = tuple( 
+                    CensusClass(
+                        name=name, 
+                        label=census_class['label'], 
+                        fields=tuple(census_class['fields']), 
+                        indices=tuple(add_variable(f) for f in census_class['fields'])
+                    ) for name, census_class in census_classes.items() )
+            class_matrices[group] = CensusRegistry._compile_class_matrix(classes[group], variables)
+
+        category_fields = OrderedDict()
+        for category, definition in categories.items():
+            fields = []
+            for group in definition['groups']:
+                for census_class in classes[group]:
+                    fields.extend(census_class.fields)
+            fields.extend(definition['fields'])
+            for field in fields:
+                add_variable(field)
+            category_fields[category] = tuple(OrderedDict.fromkeys(fields))
+
+        self.variables = tuple(variables)
+        self.variable_index = MappingProxyType(variable_index)
+        self.categories = tuple(categories.keys())
+        self.classes = MappingProxyType(classes)
+        self.category_fields = MappingProxyType(category_fields)
+        self.class_matrices = MappingProxyType(class_matrices)
+
+    @staticmethod
+    def _compile_class_matrix(census_classes, variables):
+        """Compile census classes into an aggregation matrix
+        Args:
+            census_classes: tuple of CensusClass
+            variables: list of the census fields indexed by CensusClass.indices
+        Returns:
+            fields: tuple of the census fields used by the classes, i.e., the rows
+            class_matrix: read-only int64 ndarray (fields x classes) of the number 
+                of times each field is added to each class
+        """
+        columns = sorted(set(i for census_class in census_classes for i in census_class.indices))
+        rows = dict((column, row) for row, column in enumerate(columns))
+        
+        class_matrix = np.zeros((len(columns), len(census_classes)), dtype=np.int64)
+        for j, census_class in enumerate(census_classes):
+            for i in census_class.indices:
+                class_matrix[rows[i], j] += 1
+        class_matrix.flags.writeable = False
+
+        return tuple(variables[i] for i in columns), class_matrix
+
+    def get_fields(self, categories):
+        """Return the union of the census fields needed by several categories
+        Args:
+            categories: list of categories, e.g., ['Age', 'Income']
+        Returns:
+            fields: list of the census fields in column order
+        """
+        columns = set()
+        for category in categories:
+            columns.update(self.variable_index[f] for f in self.category_fields[category])
+
+        return [self.variables[i] for i in sorted(columns)]
+
+    def validate(self, catalog_variables):
+        """Return the census fields that are missing from a variables catalog
+        Args:
+            catalog_variables: set of the variables in the catalog of a year
+        Returns:
+            missing: list of the census fields that are not in the catalog
+        """
+        return [field for field in self.variables if field not in catalog_variables]
+
+
+CensusFields.registry = CensusRegistry(CensusFields.get_class_groups(), CensusFields.get_categories())
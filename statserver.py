@@ -8,29 +8,782 @@
 # Released under the BSD 3-Clause License
 # See https://github.com/jksinton/Statistical-Districts/blob/master/LICENSE
 
+from collections import OrderedDict
+from glob import escape, glob
+import hashlib
+import json
+import math
+import mimetypes
 import os
+import re
+import shutil
+import tempfile
+import threading
+import time
 
+import geopandas as gpd
+import shapely
 import tornado.httpserver
 import tornado.ioloop
 import tornado.web
 import tornado.gen
 
+# optional third-party libraries
+try:
+    import mapbox_vector_tile
+except ImportError:
+    mapbox_vector_tile = None
+
 WEB_SERVER_ADDRESS = ('0.0.0.0', 8000)
+DATA_PATH = os.path.join(os.path.dirname(__file__), 'static', 'data')
+DISTRICT_DATA_FILE = os.path.join(DATA_PATH, 'district-data.json')
+DISTRICT_CONFIG_FILE = os.path.join(DATA_PATH, 'district.json')
+TILE_CACHE_PATH = os.path.join(os.path.dirname(__file__), 'cache', 'tiles')
+# layers kept in memory by each TileStore, up to TILE_LAYER_CACHE_BYTES in total
+TILE_LAYER_CACHE_BYTES = 1024 * 1048576
+# districts built by statbuilder --districts, e.g., static/data/US-REP-TX07/
+DISTRICT_NAME = re.compile(r'^[A-Z]+-[A-Z]+-[A-Z]{2}[0-9]+$')
+
+# layers served as tiles, and the key of their geojson file in district.json
+TILE_LAYERS = {
+    'bg': 'bg_geojson',
+    'precinct': 'precinct_geojson',
+    'district': 'district_geojson',
+}
+TILE_MAX_ZOOM = 18
+# size of a vector tile in its own coordinates
+TILE_EXTENT = 4096
+# vector tiles are clipped this many tile coordinates outside the tile
+TILE_BUFFER = 64
+WEB_MERCATOR_ORIGIN = 20037508.342789244
+
+# precompressed copies written by statbuilder, in order of preference
+CONTENT_ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
 
 class IndexHandler(tornado.web.RequestHandler):
     def get(self):
         self.render('index.html')
 
 
-def main():
+def get_file_version(filename):
+    """Return the version of a file, i.e., its modification time and size
+    Args:
+        filename: the file
+    Returns:
+        tuple (mtime_ns, size), or None if there is no such file
+    """
+    try:
+        stat_result = os.stat(filename)
+    except OSError:
+        return None
+
+    return (stat_result.st_mtime_ns, stat_result.st_size)
+
+
+def get_layer_size(geodataframe):
+    """Return the memory used by a layer
+    Args:
+        geodataframe: GeoDataFrame of the layer
+    Returns:
+        number of bytes of the columns and the coordinates of the geometries
+    """
+    layer_size = int(geodataframe.memory_usage(deep=True).sum())
+    # memory_usage() only counts a pointer per geometry
+    layer_size = layer_size + 16 * int(shapely.get_num_coordinates(geodataframe.geometry.values).sum())
+
+    return layer_size
+
+
+def get_tile_bounds(z, x, y):
+    """Return the bounds of a tile in longitude and latitude
+    Args:
+        z: zoom level of the tile
+        x: column of the tile
+        y: row of the tile, counted from the north
+    Returns:
+        (west, south, east, north)
+    """
+    tiles = 2 ** z
+    west = x / tiles * 360.0 - 180.0
+    east = (x + 1) / tiles * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2.0 * y / tiles))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2.0 * (y + 1) / tiles))))
+
+    return (west, south, east, north)
+
+
+def get_mercator_tile_bounds(z, x, y):
+    """Return the bounds of a tile in web mercator (EPSG:3857) meters
+    Args:
+        z: zoom level of the tile
+        x: column of the tile
+        y: row of the tile, counted from the north
+    Returns:
+        (minx, miny, maxx, maxy)
+    """
+    tile_width = 2 * WEB_MERCATOR_ORIGIN / 2 ** z
+    minx = -WEB_MERCATOR_ORIGIN + x * tile_width
+    maxy = WEB_MERCATOR_ORIGIN - y * tile_width
+
+    return (minx, maxy - tile_width, minx + tile_width, maxy)
+
+
+def get_accepted_encodings(accept_encoding):
+    """Return the content encodings accepted by a client
+    Args:
+        accept_encoding: value of the Accept-Encoding header, e.g., 'gzip, br;q=0.5'
+    Returns:
+        set of the accepted encodings, excluding those with q=0
+    """
+    encodings = set()
+    for item in accept_encoding.split(','):
+        params = [param.strip() for param in item.split(';')]
+        quality = 1.0
+        for param in params[1:]:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if params[0] and quality > 0.0:
+            encodings.add(params[0].lower())
+
+    return encodings
+
+
+class PrecompressedStaticFileHandler(tornado.web.StaticFileHandler):
+    """Static file handler that serves the .br or .gz copy of a file written by 
+    statbuilder when the client accepts that encoding
+    ETags are a hash of the content that is sent. Versioned urls, i.e., with 
+    ?v=hash from static_url(), are cached for a long time, and other urls must be 
+    revalidated, so an unchanged file costs a 304.
+    """
+    content_encoding = None
+    _content_hashes = {}
+    _content_hashes_lock = threading.Lock()
+
+    def validate_absolute_path(self, root, absolute_path):
+        absolute_path = super(PrecompressedStaticFileHandler, self).validate_absolute_path(
+                root, absolute_path)
+        self.content_encoding = None
+        if absolute_path is None:
+            return absolute_path
+
+        accepted_encodings = get_accepted_encodings(
+                self.request.headers.get('Accept-Encoding', ''))
+        for encoding, extension in CONTENT_ENCODINGS:
+            compressed_path = absolute_path + extension
+            if encoding in accepted_encodings and os.path.isfile(compressed_path):
+                # skip copies older than the file
+                if os.path.getmtime(compressed_path) >= os.path.getmtime(absolute_path):
+                    self.content_encoding = encoding
+                    self._stat_result = os.stat(compressed_path)
+                    return compressed_path
+
+        return absolute_path
+
+    def compute_etag(self):
+        # hash the content again when the file is rebuilt while the server runs
+        stat_result = os.stat(self.absolute_path)
+        file_version = (stat_result.st_mtime_ns, stat_result.st_size)
+        with self._content_hashes_lock:
+            cached_version, content_hash = self._content_hashes.get(self.absolute_path, (None, None))
+            if cached_version != file_version:
+                content_hash = self.get_content_version(self.absolute_path)
+                self._content_hashes[self.absolute_path] = (file_version, content_hash)
+
+        return '"{content_hash}"'.format(content_hash=content_hash)
+
+    def get_content_type(self):
+        path = self.absolute_path
+        if self.content_encoding is not None:
+            path = os.path.splitext(path)[0]
+        mime_type, encoding = mimetypes.guess_type(path)
+        if path.endswith('.geojson'):
+            return 'application/geo+json'
+        if mime_type is None:
+            return 'application/octet-stream'
+        return mime_type
+
+    def get_cache_time(self, path, modified, mime_type):
+        if 'v' in self.request.arguments:
+            return self.CACHE_MAX_AGE
+        return 0
+
+    def set_extra_headers(self, path):
+        # tornado adds the Vary header itself when it compresses responses
+        if not self.settings.get('compress_response'):
+            self.add_header('Vary', 'Accept-Encoding')
+        if self.content_encoding is not None:
+            self.set_header('Content-Encoding', self.content_encoding)
+        if 'v' not in self.request.arguments:
+            self.set_header('Cache-Control', 'no-cache')
+
+
+class DistrictDataStore(object):
+    """Columnar copy of the district data written by statbuilder, 
+    i.e., data[year][geounit][geoid][field], held in memory by the server
+    Each geounit table of a year is stored as a list of its geoids, an index of 
+    the geoids, and a list of values per field in the order of the geoids; the district row of a year is 
+    stored as is. The file is loaded again when statbuilder rebuilds it.
+    """
+    def __init__(self, district_data_file=DISTRICT_DATA_FILE):
+        self.district_data_file = district_data_file
+        self.file_version = None
+        self.districts = {}
+        self.tables = {}
+        self.columns = {}
+        self.lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        """Load the district data file if it changed since it was last loaded
+        Args:
+            Nothing
+        Returns:
+            Nothing
+        """
+        file_version = get_file_version(self.district_data_file)
+        with self.lock:
+            if file_version == self.file_version:
+                return
+            districts = {}
+            tables = {}
+            if file_version is not None:
+                with open(self.district_data_file) as district_json:
+                    district_data = json.load(district_json)
+                for year, year_data in district_data.items():
+                    for geounit, rows in year_data.items():
+                        if geounit == 'district':
+                            districts[year] = rows
+                            continue
+                        geoids = list(rows.keys())
+                        fields = {}
+                        for geoid_data in rows.values():
+                            for field in geoid_data:
+                                fields.setdefault(field, None)
+                        tables[(year, geounit)] = (
+                            geoids, 
+                            dict((geoid, index) for index, geoid in enumerate(geoids)),
+                            dict((field, [rows[geoid].get(field) for geoid in geoids]) 
+                                for field in fields) )
+            self.districts = districts
+            self.tables = tables
+            self.columns = {}
+            self.file_version = file_version
+
+    def get_column(self, year, geounit, field):
+        """Return the values of a field for every geoid of a geounit table
+        Args:
+            year: year of the data
+            geounit: geounit table, e.g., 'bg' or 'precinct'
+            field: data field, e.g., 'over_18'
+        Returns:
+            json string {"geoids": [...], "values": [...]}, or None if there is 
+            no such column
+        """
+        key = (year, geounit, field)
+        with self.lock:
+            column = self.columns.get(key)
+            if column is None:
+                geoids, indexes, values = self.tables.get((year, geounit), (None, None, {}))
+                if field not in values:
+                    return None
+                column = json.dumps({'geoids': geoids, 'values': values[field]}, 
+                        separators=(',', ':'))
+                self.columns[key] = column
+
+        return column
+
+    def get_district(self, year):
+        """Return the district row of a year, or None if there is no such year
+        """
+        with self.lock:
+            return self.districts.get(year)
+
+    def get_geounit(self, year, geounit, geoid):
+        """Return all the fields of a geoid, or None if there is no such geoid
+        """
+        with self.lock:
+            geoids, indexes, values = self.tables.get((year, geounit), (None, {}, {}))
+            index = indexes.get(geoid)
+            if index is None:
+                return None
+            return dict((field, column[index]) for field, column in values.items())
+
+
+class DataHandler(tornado.web.RequestHandler):
+    """Base handler of the district data api; unchanged responses cost a 304, as 
+    tornado sets an ETag on the body of each GET
+    The district argument chooses a district built in a batch, e.g., 
+    /api/data/2017/district?district=US-REP-TX07; see Districts.
+    """
+    def initialize(self, districts):
+        self.districts = districts
+
+    def prepare(self):
+        self.district = self.districts.get_district(self.get_argument('district', None))
+        if self.district is None:
+            raise tornado.web.HTTPError(404)
+        self.store = self.district.store
+        self.store.reload()
+        self.set_header('Content-Type', 'application/json; charset=UTF-8')
+        self.set_header('Cache-Control', 'no-cache')
+
+    def write_json(self, data):
+        if data is None:
+            raise tornado.web.HTTPError(404)
+        if not isinstance(data, str):
+            data = json.dumps(data, separators=(',', ':'))
+        self.write(data)
+
+
+class ColumnDataHandler(DataHandler):
+    def get(self, year, geounit, field):
+        self.write_json(self.store.get_column(year, geounit, field))
+
+
+class DistrictDataHandler(DataHandler):
+    def get(self, year):
+        self.write_json(self.store.get_district(year))
+
+
+class GeounitDataHandler(DataHandler):
+    def get(self, year, geounit, geoid):
+        self.write_json(self.store.get_geounit(year, geounit, geoid))
+
+
+class BootstrapHandler(DataHandler):
+    """Everything the dashboard needs to draw its first map in one response: 
+    the district config, the categories, the column of the first field of the 
+    default category, and the district rows of the census years
+    Responses are serialized once per set of arguments and kept until one of 
+    the data files changes; the Server-Timing header reports whether the response 
+    was cached and how long it took.
+    """
+    _responses = {}
+    _responses_lock = threading.Lock()
+
+    def get(self):
+        start_time = time.time()
+        year = self.get_argument('year', None)
+        geounit = self.get_argument('geounit', 'bg')
+        category = self.get_argument('category', 'Age')
+        category_type = self.get_argument('category_type', 'Census')
+
+        key = (self.district.district_config_file, year, geounit, category, category_type)
+        version = (
+                self.store.file_version, 
+                get_file_version(self.district.district_config_file), 
+                get_file_version(self.district.categories_file)
+            )
+        with self._responses_lock:
+            cached_version, response = self._responses.get(key, (None, None))
+        cache_status = 'hit'
+        if cached_version != version or response is None:
+            cache_status = 'miss'
+            response = self.make_response(year, geounit, category, category_type)
+            with self._responses_lock:
+                self._responses[key] = (version, response)
+
+        self.set_header('Server-Timing', 'cache;desc="{status}", total;dur={duration:.3f}'.format(
+            status=cache_status, duration=(time.time() - start_time) * 1000))
+        self.write_json(response)
+
+    def make_response(self, year, geounit, category, category_type):
+        """Serialize the bootstrap response
+        Args:
+            year: census year of the default field; defaults to the latest census year
+            geounit: geounit of the default field, e.g., 'bg'
+            category: category of the default field, e.g., 'Age'
+            category_type: type of the category, e.g., 'Census'
+        Returns:
+            json string, or None if the district config or the categories are missing
+        """
+        try:
+            with open(self.district.district_config_file) as district_json:
+                district_config = json.load(district_json)
+            with open(self.district.categories_file) as categories_json:
+                categories = json.load(categories_json)
+        except (IOError, ValueError):
+            return None
+
+        census_years = [str(census_year) for census_year in district_config.get('census_years', [])]
+        if year is None and census_years:
+            year = max(census_years)
+
+        category_fields = categories.get(category, {})
+        if category_type in category_fields:
+            category_fields = category_fields[category_type]
+        field = None
+        column = None
+        if category_fields.get('fields'):
+            field = category_fields['fields'][0]
+            column = self.store.get_column(year, geounit, field)
+
+        districts = {}
+        for census_year in census_years:
+            district_row = self.store.get_district(census_year)
+            if district_row is not None:
+                districts[census_year] = district_row
+
+        # the column is already serialized by the store
+        return '{{"district":{district},"categories":{categories},"year":{year},' \
+                '"geounit":{geounit},"field":{field},"column":{column},"districts":{districts}}}'.format(
+                    district=json.dumps(district_config, separators=(',', ':')),
+                    categories=json.dumps(categories, separators=(',', ':')),
+                    year=json.dumps(year),
+                    geounit=json.dumps(geounit),
+                    field=json.dumps(field),
+                    column=column if column is not None else 'null',
+                    districts=json.dumps(districts, separators=(',', ':'))
+                )
+
+
+class TileStore(object):
+    """Tiles of the geometry layers built by statbuilder, i.e., the block groups, 
+    voting precincts, and district boundary listed in district.json
+    Tiles are made on request from the GeoParquet copy of a layer, and written to 
+    an on-disk cache keyed by the version of the layer, so a tile is only made once 
+    per build. The tiles of the older versions are removed when a layer is rebuilt. 
+    A tile is made from the simplified copy of the layer written by statbuilder for 
+    the nearest zoom level at or above the zoom of the tile, e.g., bgs.z10.parquet, 
+    or from the layer itself past the last zoom level. The layers read are kept in 
+    memory, evicting the least recently used ones past cache_bytes.
+    Two formats are made:
+        mvt: Mapbox Vector Tiles, clipped to the tile and quantized to its extent; 
+            requires the mapbox_vector_tile library
+        geojson: the whole features that intersect the tile, for the Google Maps 
+            data layer
+    """
+    def __init__(self, district_config_file=DISTRICT_CONFIG_FILE, cache_path=TILE_CACHE_PATH, 
+            cache_bytes=TILE_LAYER_CACHE_BYTES):
+        self.district_config_file = district_config_file
+        self.cache_path = cache_path
+        self.cache_bytes = cache_bytes
+        self.layers = OrderedDict()
+        self.layer_sizes = {}
+        self.lock = threading.Lock()
+
+    def get_layer_files(self, layer):
+        """Return the files of a layer
+        Args:
+            layer: name of the layer, e.g., 'bg'
+        Returns:
+            zoom_level_files: dict of zoom level -> filename of the simplified copy 
+                of the layer for the zoom level
+            layer_file: filename of the GeoParquet copy of the layer, or of the layer 
+                itself if there is no such copy, or None if there is no such layer
+        """
+        if layer not in TILE_LAYERS:
+            return {}, None
+        try:
+            with open(self.district_config_file) as district_json:
+                district_config = json.load(district_json)
+        except (IOError, ValueError):
+            return {}, None
+        if not district_config.get(TILE_LAYERS[layer]):
+            return {}, None
+
+        # the layer urls are relative to the server root, e.g., /static/geojson/...
+        layer_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 
+                district_config[TILE_LAYERS[layer]].lstrip('/'))
+        layer_name = os.path.splitext(layer_file)[0]
+        zoom_level_files = {}
+        for level_file in glob(escape(layer_name) + '.z*.parquet'):
+            level = re.match(r'\.z([0-9]+)\.parquet$', level_file[len(layer_name):])
+            if level is not None:
+                zoom_level_files[int(level.group(1))] = level_file
+        parquet_file = layer_name + '.parquet'
+        if os.path.isfile(parquet_file):
+            return zoom_level_files, parquet_file
+        if os.path.isfile(layer_file):
+            return zoom_level_files, layer_file
+
+        return zoom_level_files, None
+
+    def get_layer_file(self, layer, z=None):
+        """Return the file a layer is read from, or None if there is no such layer
+        Args:
+            layer: name of the layer, e.g., 'bg'
+            z: zoom level the layer is shown at; None uses the layer itself
+        Returns:
+            filename of the simplified copy of the layer for the zoom level, 
+            or of the layer if there is no such copy
+        """
+        zoom_level_files, layer_file = self.get_layer_files(layer)
+        if z is not None:
+            zoom_levels = [zoom_level for zoom_level in zoom_level_files if zoom_level >= z]
+            if zoom_levels:
+                return zoom_level_files[min(zoom_levels)]
+
+        return layer_file
+
+    def get_layer_version(self, layer_file, file_version):
+        """Return the version of a layer file, which names its directory in the tile cache
+        """
+        return hashlib.sha256(repr((layer_file, file_version)).encode()).hexdigest()[:16]
+
+    def get_stale_tile_paths(self, layer):
+        """Return the directories of the cached tiles of a layer made from files that 
+        changed or no longer exist
+        Args:
+            layer: name of the layer, e.g., 'bg'
+        Returns:
+            list of the directories of the stale versions of the layer
+        """
+        zoom_level_files, layer_file = self.get_layer_files(layer)
+        layer_versions = set(
+                self.get_layer_version(f, get_file_version(f)) 
+                for f in list(zoom_level_files.values()) + [layer_file] if f is not None)
+        layer_cache_path = os.path.join(self.cache_path, layer)
+        if not os.path.isdir(layer_cache_path):
+            return []
+
+        return [os.path.join(layer_cache_path, layer_version) 
+                for layer_version in os.listdir(layer_cache_path) 
+                if layer_version not in layer_versions]
+
+    def get_layer(self, layer, z=None):
+        """Return a layer and its version
+        Args:
+            layer: name of the layer, e.g., 'bg'
+            z: zoom level the layer is shown at
+        Returns:
+            layer_version: hash of the file and its modification time and size
+            geodataframe: GeoDataFrame of the layer in EPSG:4326
+            or (None, None) if there is no such layer
+        """
+        layer_file = self.get_layer_file(layer, z)
+        if layer_file is None:
+            return None, None
+        file_version = get_file_version(layer_file)
+        stale_tile_paths = []
+        with self.lock:
+            cached_version, layer_version, geodataframe = self.layers.get(layer_file, (None, None, None))
+            if cached_version == file_version:
+                self.layers.move_to_end(layer_file)
+            else:
+                if layer_file.endswith('.parquet'):
+                    geodataframe = gpd.read_parquet(layer_file)
+                else:
+                    geodataframe = gpd.read_file(layer_file)
+                geodataframe = geodataframe.to_crs('EPSG:4326')
+                # the spatial index is built once per version of the layer
+                geodataframe.sindex
+                layer_version = self.get_layer_version(layer_file, file_version)
+                self.layers.pop(layer_file, None)
+                self.layer_sizes.pop(layer_file, None)
+                layer_size = get_layer_size(geodataframe)
+                if layer_size <= self.cache_bytes:
+                    self.layers[layer_file] = (file_version, layer_version, geodataframe)
+                    self.layer_sizes[layer_file] = layer_size
+                    while sum(self.layer_sizes.values()) > self.cache_bytes:
+                        key, _ = self.layers.popitem(last=False)
+                        del self.layer_sizes[key]
+                # the tiles of the previous versions are never requested again
+                stale_tile_paths = self.get_stale_tile_paths(layer)
+
+        # the stale tiles are removed without holding up the requests of other tiles
+        for tile_path in stale_tile_paths:
+            shutil.rmtree(tile_path, ignore_errors=True)
+
+        return layer_version, geodataframe
+
+    def get_tile(self, layer, z, x, y, tile_format):
+        """Return a tile from the cache, making it if it is not cached
+        Args:
+            layer: name of the layer, e.g., 'bg'
+            z: zoom level of the tile
+            x: column of the tile
+            y: row of the tile, counted from the north
+            tile_format: 'mvt' or 'geojson'
+        Returns:
+            bytes of the tile, or None if there is no such layer or tile
+        """
+        if z > TILE_MAX_ZOOM or x >= 2 ** z or y >= 2 ** z:
+            return None
+        if tile_format == 'mvt' and mapbox_vector_tile is None:
+            return None
+        layer_version, geodataframe = self.get_layer(layer, z)
+        if geodataframe is None:
+            return None
+
+        tile_path = os.path.join(self.cache_path, layer, layer_version, str(z), str(x))
+        tile_file = os.path.join(tile_path, '{y}.{tile_format}'.format(y=y, tile_format=tile_format))
+        if os.path.isfile(tile_file):
+            with open(tile_file, 'rb') as tile:
+                return tile.read()
+
+        if tile_format == 'mvt':
+            tile_data = self.make_mvt_tile(layer, geodataframe, z, x, y)
+        else:
+            tile_data = self.make_geojson_tile(geodataframe, z, x, y)
+
+        # the tiles of a version may be pruned while they are written, see get_layer()
+        try:
+            os.makedirs(tile_path, exist_ok=True)
+            fd, tile_tmp_file = tempfile.mkstemp(dir=tile_path, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as tile:
+                tile.write(tile_data)
+            os.replace(tile_tmp_file, tile_file)
+        except OSError:
+            pass
+
+        return tile_data
+
+    def make_geojson_tile(self, geodataframe, z, x, y):
+        """Return the features that intersect a tile as GeoJSON
+        The features are not clipped, so the browser can keep one copy of each 
+        feature no matter how many tiles it is in.
+        """
+        west, south, east, north = get_tile_bounds(z, x, y)
+        indices = geodataframe.sindex.query(shapely.box(west, south, east, north), 
+                predicate='intersects')
+        features = geodataframe.iloc[sorted(indices)]
+
+        return features.to_json(drop_id=True).encode()
+
+    def make_mvt_tile(self, layer, geodataframe, z, x, y):
+        """Return the features that intersect a tile as a Mapbox Vector Tile
+        """
+        west, south, east, north = get_tile_bounds(z, x, y)
+        indices = geodataframe.sindex.query(shapely.box(west, south, east, north), 
+                predicate='intersects')
+        features = geodataframe.iloc[sorted(indices)].to_crs('EPSG:3857')
+        
+        bounds = get_mercator_tile_bounds(z, x, y)
+        tile_unit = (bounds[2] - bounds[0]) / TILE_EXTENT
+        buffer = TILE_BUFFER * tile_unit
+        geometries = shapely.clip_by_rect(features.geometry.values, 
+                bounds[0] - buffer, bounds[1] - buffer, bounds[2] + buffer, bounds[3] + buffer)
+        geometries = shapely.simplify(geometries, tile_unit, preserve_topology=True)
+
+        properties = features.drop(columns=features.geometry.name).to_dict('records')
+        tile_features = []
+        for geometry, feature_properties in zip(geometries, properties):
+            if geometry is None or geometry.is_empty:
+                continue
+            tile_features.append({
+                'geometry': geometry,
+                'properties': dict( (key, value) for key, value in feature_properties.items() 
+                    if isinstance(value, (str, bool, int, float)) and value == value )
+            })
+        
+        return mapbox_vector_tile.encode(
+                [{'name': layer, 'features': tile_features}], 
+                default_options={'quantize_bounds': bounds, 'extents': TILE_EXTENT})
+
+
+class District(object):
+    """The data files of a district and the stores serving them
+    """
+    def __init__(self, data_path=DATA_PATH, tile_cache_path=TILE_CACHE_PATH):
+        self.data_path = data_path
+        self.district_config_file = os.path.join(data_path, 'district.json')
+        self.categories_file = os.path.join(data_path, 'categories.json')
+        self.store = DistrictDataStore(os.path.join(data_path, 'district-data.json'))
+        self.tiles = TileStore(self.district_config_file, tile_cache_path)
+
+
+class Districts(object):
+    """The districts served: the district built by statbuilder in static/data/, and the 
+    districts built in a batch by statbuilder --districts in static/data/<district>/, 
+    e.g., static/data/US-REP-TX07/, which are chosen with the district argument, 
+    e.g., /?district=US-REP-TX07
+    A district is loaded on its first request.
+    """
+    def __init__(self, data_path=DATA_PATH, tile_cache_path=TILE_CACHE_PATH):
+        self.data_path = data_path
+        self.tile_cache_path = tile_cache_path
+        self.districts = {}
+        self.lock = threading.Lock()
+
+    def get_district(self, name=None):
+        """Return a district
+        Args:
+            name: name of a district built in a batch, e.g., 'US-REP-TX07'; 
+                None returns the district in the data path
+        Returns:
+            District, or None if there is no such district
+        """
+        if name is None:
+            data_path = self.data_path
+            tile_cache_path = self.tile_cache_path
+        elif DISTRICT_NAME.match(name) is not None:
+            data_path = os.path.join(self.data_path, name)
+            tile_cache_path = os.path.join(self.tile_cache_path, name)
+            if not os.path.isdir(data_path):
+                return None
+        else:
+            return None
+
+        with self.lock:
+            district = self.districts.get(name)
+            if district is None:
+                district = District(data_path, tile_cache_path)
+                self.districts[name] = district
+
+        return district
+
+
+class TileHandler(tornado.web.RequestHandler):
+    """Serve the tiles of a layer, e.g., /tiles/bg/12/956/1695.mvt, 
+    or /tiles/bg/12/956/1695.mvt?district=US-REP-TX07 for a district built in a batch
+    Tiles are made in a thread, so the server keeps answering other requests.
+    """
+    content_types = {
+        'mvt': 'application/vnd.mapbox-vector-tile',
+        # served as json, so tornado compresses the tiles
+        'geojson': 'application/json',
+    }
+
+    def initialize(self, districts):
+        self.districts = districts
+
+    async def get(self, layer, z, x, y, tile_format):
+        district = self.districts.get_district(self.get_argument('district', None))
+        if district is None:
+            raise tornado.web.HTTPError(404)
+        tile_data = await tornado.ioloop.IOLoop.current().run_in_executor(
+                None, district.tiles.get_tile, layer, int(z), int(x), int(y), tile_format)
+        if tile_data is None:
+            raise tornado.web.HTTPError(404)
+        self.set_header('Content-Type', self.content_types[tile_format])
+        self.set_header('Cache-Control', 'no-cache')
+        self.write(tile_data)
+
+
+def make_app(districts=None):
+    """Return the web application
+    Args:
+        districts: Districts served; None serves the districts in DATA_PATH
+    Returns:
+        tornado.web.Application
+    """
     settings = {
         "static_path": os.path.join(os.path.dirname(__file__), "static"),
+        "static_handler_class": PrecompressedStaticFileHandler,
+        "compress_response": True,
     }
+    if districts is None:
+        districts = Districts()
     app = tornado.web.Application(
         handlers=[
             (r"/", IndexHandler),
+            (r"/api/bootstrap", BootstrapHandler, dict(districts=districts)),
+            (r"/api/data/([^/]+)/district", DistrictDataHandler, dict(districts=districts)),
+            (r"/api/data/([^/]+)/([^/]+)/([^/]+)", ColumnDataHandler, dict(districts=districts)),
+            (r"/api/geounit/([^/]+)/([^/]+)/([^/]+)", GeounitDataHandler, dict(districts=districts)),
+            (r"/tiles/([^/]+)/([0-9]+)/([0-9]+)/([0-9]+)\.(mvt|geojson)", TileHandler, dict(districts=districts)),
          ], **settings
     )
+
+    return app
+
+
+def main():
+    app = make_app()
     http_server = tornado.httpserver.HTTPServer(app)
     http_server.listen(WEB_SERVER_ADDRESS[1], WEB_SERVER_ADDRESS[0])
     print( "Listening on port:", WEB_SERVER_ADDRESS[1] )
@@ -0,0 +1,97 @@
+# This file is part of Statistical Districts.
+# 
+# Copyright (c) 2019, James Sinton
+# All rights reserved.
+# 
+# Released under the BSD 3-Clause License
+# See https://github.com/jksinton/Statistical-Districts/blob/master/LICENSE
+
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from requests.adapters import HTTPAdapter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CENSUS_API_URL = 'https://api.census.gov'
+
+
+def send_response(handler, status=200, body=b'', headers=None):
+    """Send a response from a stub server handler
+    Args:
+        handler: BaseHTTPRequestHandler of the request
+        status: http status code
+        body: bytes, or a python data structure sent as json
+        headers: dict of extra headers
+    """
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode()
+    handler.send_response(status)
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
+    handler.send_header('Content-Length', str(len(body)))
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+@pytest.fixture
+def http_server():
+    """Start local http servers; call the fixture with a function handle(handler) 
+    answering the GET requests, and it returns the url of the server
+    """
+    servers = []
+
+    def start(handle):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return 'http://127.0.0.1:{port}'.format(port=server.server_port)
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+class StubAdapter(HTTPAdapter):
+    """Transport adapter sending the requests for api.census.gov to a stub server
+    """
+    def __init__(self, stub_url, **kwargs):
+        super(StubAdapter, self).__init__(**kwargs)
+        self.stub_url = stub_url
+
+    def send(self, request, **kwargs):
+        request.url = self.stub_url + request.url[len(CENSUS_API_URL):]
+        return super(StubAdapter, self).send(request, **kwargs)
+
+
+@pytest.fixture
+def census_stub(monkeypatch):
+    """Point the census sessions made by statbuilder at a stub server url
+    """
+    import statbuilder
+
+    get_census_session = statbuilder.get_census_session
+
+    def use_stub(stub_url):
+        def get_stub_session(*args, **kwargs):
+            # the stub does not need to be rate limited
+            kwargs['requests_per_second'] = 1000
+            session = get_census_session(*args, **kwargs)
+            session.mount(CENSUS_API_URL + '/', StubAdapter(stub_url))
+            return session
+        monkeypatch.setattr(statbuilder, 'get_census_session', get_stub_session)
+
+    return use_stub
@@ -0,0 +1,296 @@
+# This file is part of Statistical Districts.
+# 
+# Copyright (c) 2019, James Sinton
+# All rights reserved.
+# 
+# Released under the BSD 3-Clause License
+# See https://github.com/jksinton/Statistical-Districts/blob/master/LICENSE
+
+import json
+import os
+import threading
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+
+import statbuilder
+from conftest import send_response
+
+# block groups of two counties; the district has three of them
+BLOCKGROUPS = [
+    ('48', '201', '000100', '1'),
+    ('48', '201', '000100', '2'),
+    ('48', '201', '000200', '1'),
+    ('48', '157', '670100', '1'),
+    ('48', '157', '670100', '2'),
+]
+DISTRICT_BLOCKGROUPS = BLOCKGROUPS[:2] + BLOCKGROUPS[3:4]
+
+
+def get_value(geoid, field):
+    return int(geoid[-4:]) + int(field[-4:-1])
+
+
+def make_census_handler(requests_made):
+    """Return a handler for a stub of the acs5 endpoint of api.census.gov
+    """
+    lock = threading.Lock()
+
+    def handle(handler):
+        url = urlparse(handler.path)
+        if '/variables/' in url.path:
+            field = url.path.split('/')[-1][:-len('.json')]
+            predicate_type = 'int' if field.startswith('B') else 'fips-for'
+            send_response(handler, body={'predicateType': predicate_type})
+            return
+        params = dict((key, values[0]) for key, values in parse_qs(url.query).items())
+        with lock:
+            requests_made.append(params)
+        fields = params['get'].split(',')
+        geo_in = dict(part.split(':') for part in params['in'].split(' '))
+        blockgroup = params['for'].split(':')[1]
+        rows = [fields + ['state', 'county', 'tract', 'block group']]
+        for state, county, tract, bg in BLOCKGROUPS:
+            if (state, county) != (geo_in['state'], geo_in['county']):
+                continue
+            if geo_in.get('tract', '*') not in ('*', tract) or blockgroup not in ('*', bg):
+                continue
+            geoid = state + county + tract + bg
+            rows.append([
+                    '1500000US' + geoid if field == 'GEO_ID' else str(get_value(geoid, field)) 
+                    for field in fields
+                ] + [state, county, tract, bg])
+        send_response(handler, body=rows)
+
+    return handle
+
+
+def write_district_blockgroups(blockgroups):
+    bgs_in_district_JSON = statbuilder.get_bgs_in_district_json_filename(state=48, district=7)
+    os.makedirs(os.path.dirname(bgs_in_district_JSON), exist_ok=True)
+    pd.DataFrame(
+            blockgroups, 
+            columns=['STATEFP', 'COUNTYFP', 'TRACTCE', 'BLKGRPCE']
+        ).assign(GEOID=[''.join(bg) for bg in blockgroups]).to_json(bgs_in_district_JSON)
+
+
+def test_get_blockgroup_queries():
+    bgs_in_district = pd.DataFrame(BLOCKGROUPS, columns=['STATEFP', 'COUNTYFP', 'TRACTCE', 'BLKGRPCE'])
+
+    queries = statbuilder.get_blockgroup_queries(bgs_in_district, batch_by='county')
+    assert queries == [
+        {'state_fips': '48', 'county_fips': '201', 'tract': '*', 'blockgroup': '*'},
+        {'state_fips': '48', 'county_fips': '157', 'tract': '*', 'blockgroup': '*'},
+    ]
+    assert len(statbuilder.get_blockgroup_queries(bgs_in_district, batch_by='tract')) == 3
+    assert len(statbuilder.get_blockgroup_queries(bgs_in_district, batch_by=None)) == 5
+    with pytest.raises(ValueError):
+        statbuilder.get_blockgroup_queries(bgs_in_district, batch_by='state')
+
+
+@pytest.mark.parametrize('batch_by, queries', [('county', 2), ('tract', 2), (None, 3)])
+def test_get_blockgroup_census_data(tmp_path, monkeypatch, http_server, census_stub, batch_by, queries):
+    monkeypatch.chdir(tmp_path)
+    write_district_blockgroups(DISTRICT_BLOCKGROUPS)
+    requests_made = []
+    census_stub(http_server(make_census_handler(requests_made)))
+    # more fields than fit in one request
+    fields = ['B01001_{n:03d}E'.format(n=n) for n in range(1, 61)]
+
+    census_data = statbuilder.get_blockgroup_census_data(
+            'key', fields, census_data={}, state=48, district=7, year='2015', batch_by=batch_by)
+
+    # each query is split into requests of 49 fields
+    assert len(requests_made) == queries * 2
+    assert all(len(params['get'].split(',')) <= 50 for params in requests_made)
+    
+    # the block groups outside the district are dropped
+    district_geoids = set(''.join(bg) for bg in DISTRICT_BLOCKGROUPS)
+    assert set(census_data['2015']['bg']) == district_geoids
+    for geoid in district_geoids:
+        for field in fields:
+            assert census_data['2015']['bg'][geoid][field] == get_value(geoid, field)
+
+
+def test_missing_blockgroups_are_cached_as_null(tmp_path, monkeypatch, http_server, census_stub):
+    monkeypatch.chdir(tmp_path)
+    # the API returns no data for the last block group
+    missing_bg = ('48', '201', '000300', '1')
+    write_district_blockgroups(DISTRICT_BLOCKGROUPS + [missing_bg])
+    census_stub(http_server(make_census_handler([])))
+    fields = ['B01001_001E', 'B01001_002E']
+
+    census_data = statbuilder.get_blockgroup_census_data(
+            'key', fields, census_data={}, state=48, district=7, year='2015', 
+            census_cache_path='census/')
+
+    missing_geoid = ''.join(missing_bg)
+    assert missing_geoid not in census_data['2015']['bg']
+    census_frame, census_cached = statbuilder.read_census_cache(
+            fields, '2015', 'bg', census_cache_path='census/')
+    # the block group is fetched, so it is not requested again
+    assert census_cached.all(axis=None)
+    assert census_frame.loc[missing_geoid].isna().all()
+
+    # the null values count as 0
+    census_rows = statbuilder.census_frame_to_dict(census_frame)
+    geoids, census_matrix = statbuilder.get_census_matrix(census_rows, fields)
+    assert census_matrix[geoids.index(missing_geoid)].tolist() == [0, 0]
+    assert census_matrix.dtype == 'int64'
+
+
+def test_census_variables_index(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('static/data')
+    with open('static/data/variables_2015.json', 'w') as f:
+        json.dump({ 'variables': { 
+            'B01001_001E': { 'label': 'Total' }, 
+            'B01001_002E': { 'label': 'Male' }, 
+            'for': { 'label': 'Census API FIPS' } 
+        } }, f)
+
+    index_file = statbuilder.get_census_variables_index('2015')
+
+    assert statbuilder.get_catalog_variables('2015') == {'B01001_001E', 'B01001_002E'}
+    # the temporary file is renamed into place
+    assert sorted(os.listdir('static/data')) == ['variables_2015.json', 'variables_2015.sqlite']
+    assert index_file == 'static/data/variables_2015.sqlite'
+
+
+def test_catalog_variables_are_read_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(statbuilder, 'CATALOG_VARIABLES', {})
+    os.makedirs('static/data')
+    index_file = 'static/data/variables_2015.sqlite'
+    connection = statbuilder.sqlite3.connect(index_file)
+    with connection:
+        connection.execute('CREATE TABLE variables (name TEXT)')
+        connection.execute("INSERT INTO variables VALUES ('B01001_001E')")
+    connection.close()
+
+    connections = []
+    connect = statbuilder.sqlite3.connect
+    def counting_connect(*args, **kwargs):
+        connections.append(args)
+        return connect(*args, **kwargs)
+    monkeypatch.setattr(statbuilder.sqlite3, 'connect', counting_connect)
+
+    assert statbuilder.get_catalog_variables('2015') == {'B01001_001E'}
+    assert statbuilder.get_catalog_variables('2015') == {'B01001_001E'}
+    assert len(connections) == 1
+    with pytest.raises(ValueError):
+        statbuilder.validate_census_fields('2015')
+    assert len(connections) == 1
+
+
+class Clock(object):
+    """Fake clock, so the rate limiter can be tested without waiting
+    """
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(statbuilder.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(statbuilder.time, 'sleep', clock.sleep)
+    return clock
+
+
+def test_token_bucket(clock):
+    bucket = statbuilder.TokenBucket(rate=10, capacity=5)
+    
+    # a burst of up to capacity tokens does not wait
+    for n in range(5):
+        bucket.acquire()
+    assert clock.sleeps == []
+    
+    # then the tokens are taken at the rate
+    for n in range(10):
+        bucket.acquire()
+    assert clock.now == pytest.approx(1.0)
+    
+    # tokens accumulate up to the capacity
+    clock.now += 60
+    for n in range(5):
+        bucket.acquire()
+    assert clock.now == pytest.approx(61.0)
+    bucket.acquire()
+    assert clock.now == pytest.approx(61.1)
+
+    # a rate below 1, e.g., a share of the rate of a batch of districts, still allows a request
+    bucket = statbuilder.TokenBucket(rate=0.5)
+    start = clock.now
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.now == pytest.approx(start + 2.0)
+
+
+class CountingBucket(statbuilder.TokenBucket):
+    def __init__(self, *args, **kwargs):
+        super(CountingBucket, self).__init__(*args, **kwargs)
+        self.acquired = 0
+
+    def acquire(self):
+        self.acquired += 1
+        super(CountingBucket, self).acquire()
+
+
+def make_flaky_handler(statuses, requests_made, headers=None):
+    """Return a handler answering with the given statuses, then 200
+    """
+    def handle(handler):
+        requests_made.append(handler.path)
+        status = statuses[len(requests_made) - 1] if len(requests_made) <= len(statuses) else 200
+        send_response(handler, status=status, body={'status': status}, headers=headers)
+
+    return handle
+
+
+def test_retry_takes_a_token_per_attempt(clock, http_server):
+    requests_made = []
+    url = http_server(make_flaky_handler([503, 500, 429], requests_made))
+    session = statbuilder.RateLimitedSession(CountingBucket(1000), retries=5, backoff_factor=0.5)
+
+    response = session.get(url + '/data')
+
+    assert response.status_code == 200
+    assert len(requests_made) == 4
+    assert session.rate_limiter.acquired == 4
+    # exponential backoff between the attempts
+    assert [wait for wait in clock.sleeps if wait >= 0.5] == [0.5, 1.0, 2.0]
+
+
+def test_retry_after_header(clock, http_server):
+    requests_made = []
+    url = http_server(make_flaky_handler([429], requests_made, headers={'Retry-After': '7'}))
+    session = statbuilder.RateLimitedSession(CountingBucket(1000), retries=5)
+
+    assert session.get(url + '/data').status_code == 200
+    assert 7 in clock.sleeps
+
+
+def test_retries_give_up(clock, http_server):
+    requests_made = []
+    url = http_server(make_flaky_handler([500] * 10, requests_made))
+    session = statbuilder.get_census_session(requests_per_second=1000, retries=2)
+
+    assert session.get(url + '/data').status_code == 500
+    assert len(requests_made) == 3
+
+
+def test_census_workers_must_be_positive():
+    assert statbuilder.positive_int('8') == 8
+    for value in ['0', '-2', 'four']:
+        with pytest.raises(statbuilder.argparse.ArgumentTypeError):
+            statbuilder.positive_int(value)
@@ -0,0 +1,59 @@
+# This file is part of Statistical Districts.
+# 
+# Copyright (c) 2019, James Sinton
+# All rights reserved.
+# 
+# Released under the BSD 3-Clause License
+# See https://github.com/jksinton/Statistical-Districts/blob/master/LICENSE
+
+import json
+import os
+
+import statbuilder
+
+FIELDS = ['B01001_001E', 'B01001_002E']
+
+
+def test_census_cache_parts_are_merged(tmp_path, monkeypatch):
+    monkeypatch.setattr(statbuilder, 'CENSUS_CACHE_MAX_PARTS', 4)
+    census_cache_path = str(tmp_path) + '/'
+    # one part per request, e.g., per county
+    for n in range(10):
+        statbuilder.write_census_cache({ str(n): { FIELDS[0]: n, FIELDS[1]: None } }, FIELDS, 
+                '2015', 'bg', census_cache_path=census_cache_path)
+    # a later request for one more field of one geoid
+    statbuilder.write_census_cache({ '0': { 'B01001_003E': 7 } }, ['B01001_003E'], 
+            '2015', 'bg', census_cache_path=census_cache_path)
+
+    path = statbuilder.get_census_cache_path('2015', 'bg', census_cache_path)
+    with open(path + 'manifest.json') as f:
+        manifest = json.load(f)
+    assert len(manifest) <= 4
+    assert sorted(f for f in os.listdir(path) if f.endswith('.parquet')) == \
+            sorted(part['file'] for part in manifest)
+
+    census_frame, census_cached = statbuilder.read_census_cache(
+            FIELDS + ['B01001_003E'], '2015', 'bg', census_cache_path=census_cache_path)
+    assert sorted(census_frame.index) == [str(n) for n in range(10)]
+    assert census_frame.loc['9', FIELDS[0]] == 9
+    assert census_frame.loc['0', 'B01001_003E'] == 7
+    # a null returned by the API is cached, a field never fetched is not
+    assert census_cached[FIELDS].all(axis=None)
+    assert census_frame[FIELDS[1]].isna().all()
+    assert census_cached['B01001_003E'].tolist() == [True] + [False] * 9
+
+
+def test_census_cache_without_manifest(tmp_path):
+    census_cache_path = str(tmp_path) + '/'
+    statbuilder.write_census_cache({ '1': { FIELDS[0]: 1 } }, FIELDS[:1], 
+            '2015', 'bg', census_cache_path=census_cache_path)
+    statbuilder.write_census_cache({ '1': { FIELDS[0]: 2, FIELDS[1]: 3 } }, FIELDS, 
+            '2015', 'bg', census_cache_path=census_cache_path)
+    # a cache written before there were manifests
+    path = statbuilder.get_census_cache_path('2015', 'bg', census_cache_path)
+    os.remove(path + 'manifest.json')
+
+    census_frame, census_cached = statbuilder.read_census_cache(
+            FIELDS, '2015', 'bg', geoids=['1', '2'], census_cache_path=census_cache_path)
+    assert census_frame.loc['1'].tolist() == [2, 3]
+    assert census_cached.loc['1'].all() and not census_cached.loc['2'].any()
@@ -0,0 +1,102 @@
+# This file is part of Statistical Districts.
+# 
+# Copyright (c) 2019, James Sinton
+# All rights reserved.
+# 
+# Released under the BSD 3-Clause License
+# See https://github.com/jksinton/Statistical-Districts/blob/master/LICENSE
+
+import numpy as np
+import pytest
+
+import statbuilder
+from statlib import CensusFields
+
+
+def make_census_rows(fields, geoids, seed=0):
+    rng = np.random.default_rng(seed)
+    return dict( 
+            (geoid, dict((field, int(value)) for field, value in zip(fields, rng.integers(0, 1000, len(fields)))))
+            for geoid in geoids )
+
+
+@pytest.mark.parametrize('class_group', list(CensusFields.get_class_groups()))
+def test_make_class_data_sums_the_fields_of_each_class(class_group):
+    class_definitions = CensusFields.get_class_groups()[class_group]
+    fields = sorted(set(field for definition in class_definitions.values() 
+        for field in definition['fields']))
+    census_rows = make_census_rows(fields, ['480010001001', '480010001002', '480010002001'])
+    census_data = { '2017': { 'bg': census_rows, 'district': census_rows['480010001001'] } }
+
+    bg_data = statbuilder.make_class_data(census_data, [class_group], district_data={}, 
+            year='2017', geo_key='bg')
+    district_data = statbuilder.make_class_data(census_data, [class_group], district_data={}, 
+            year='2017', geo_key='district')
+
+    # the registry compiles the classes in the order they are defined
+    assert [census_class.name for census_class in CensusFields.registry.classes[class_group]] == \
+            list(class_definitions)
+    for name, definition in class_definitions.items():
+        for geoid, row in census_rows.items():
+            assert bg_data['2017']['bg'][geoid][name] == sum(row[field] for field in definition['fields'])
+        assert district_data['2017']['district'][name] == sum(
+                census_rows['480010001001'][field] for field in definition['fields'])
+
+
+def get_election_metrics_by_row(dem, rep, registered_voters, total_votes, over_18):
+    """The metrics as they were calculated one precinct at a time
+    """
+    peak_no_vote = 0
+    metrics = dict((field, []) for field in ['dem_diff', 'dem_per', 'reg_per', 'no_vote', 'us_hou_dem_pot'])
+    for row in zip(dem, rep, registered_voters, total_votes, over_18):
+        row_dem, row_rep, row_reg, row_total_votes, row_over_18 = [float(value) for value in row]
+        metrics['dem_diff'].append(int(row_dem - row_rep))
+        if row_over_18 > 0.0:
+            metrics['dem_per'].append(int((row_dem / row_over_18) * 100.0))
+            metrics['reg_per'].append(int((row_reg / row_over_18) * 100.0))
+        else:
+            metrics['dem_per'].append(0)
+            metrics['reg_per'].append(0)
+        no_vote = row_over_18 - row_total_votes
+        metrics['no_vote'].append(int(no_vote))
+        if no_vote > peak_no_vote:
+            peak_no_vote = no_vote
+    for row in zip(dem, total_votes, over_18):
+        row_dem, row_total_votes, row_over_18 = [float(value) for value in row]
+        rel_no_vote = (row_over_18 - row_total_votes) / peak_no_vote
+        if row_over_18 > 0.0:
+            dem_pot = ( (rel_no_vote + (row_dem / row_over_18) ) / 2.0 ) * 100.0
+        else:
+            dem_pot = ( rel_no_vote / 2.0 ) * 100.0
+        metrics['us_hou_dem_pot'].append(int(dem_pot))
+
+    return metrics
+
+
+def test_get_election_metrics():
+    rng = np.random.default_rng(1)
+    precincts = 500
+    over_18 = rng.integers(0, 3000, precincts)
+    # some precincts have no 18+ population
+    over_18[::50] = 0
+    registered_voters = rng.integers(0, 3000, precincts)
+    total_votes = rng.integers(0, 2000, precincts)
+    dem = rng.integers(0, 1000, precincts)
+    rep = rng.integers(0, 1000, precincts)
+
+    metrics = statbuilder.get_election_metrics(dem, rep, registered_voters, total_votes, over_18)
+    
+    expected = get_election_metrics_by_row(dem, rep, registered_voters, total_votes, over_18)
+    for field, values in expected.items():
+        assert metrics[field].tolist() == values, field
+
+
+def test_get_election_metrics_without_non_voters():
+    # every precinct voted, which divided by a peak_no_vote of 0
+    metrics = statbuilder.get_election_metrics(
+            dem=[50, 0], rep=[30, 0], registered_voters=[90, 0], total_votes=[100, 0], over_18=[100, 0])
+
+    assert metrics['dem_per'].tolist() == [50, 0]
+    assert metrics['reg_per'].tolist() == [90, 0]
+    assert metrics['no_vote'].tolist() == [0, 0]
+    assert metrics['us_hou_dem_pot'].tolist() == [25, 0]
@@ -0,0 +1,159 @@
+# This file is part of Statistical Districts.
+# 
+# Copyright (c) 2019, James Sinton
+# All rights reserved.
+# 
+# Released under the BSD 3-Clause License
+# See https://github.com/jksinton/Statistical-Districts/blob/master/LICENSE
+
+import hashlib
+import json
+import os
+import threading
+
+import pytest
+
+import statbuilder
+from conftest import send_response
+
+CONTENTS = bytes(range(256)) * 64
+ETAG = '"v1"'
+
+
+def make_file_handler(requests_made, contents=CONTENTS, etag=ETAG):
+    """Return a handler for a stub file server, which supports Range and If-Range requests
+    """
+    lock = threading.Lock()
+
+    def handle(handler):
+        with lock:
+            requests_made.append(dict(handler.headers))
+        range_header = handler.headers.get('Range')
+        if_range = handler.headers.get('If-Range')
+        if range_header is None or (if_range is not None and if_range != etag):
+            send_response(handler, body=contents, headers={'ETag': etag})
+            return
+        start = int(range_header[len('bytes='):].rstrip('-'))
+        if start >= len(contents):
+            send_response(handler, status=416, 
+                    headers={'Content-Range': 'bytes */{size}'.format(size=len(contents))})
+            return
+        send_response(handler, status=206, body=contents[start:], headers={
+                'ETag': etag, 
+                'Content-Range': 'bytes {start}-{end}/{size}'.format(
+                    start=start, end=len(contents) - 1, size=len(contents))
+            })
+
+    return handle
+
+
+def write_partial_file(url, archive_path, contents, validator=ETAG):
+    """Leave a partial file as an interrupted download of url would
+    """
+    os.makedirs(archive_path, exist_ok=True)
+    partial_file = archive_path + 'partial-' + hashlib.sha256(url.encode()).hexdigest()
+    with open(partial_file, 'wb') as f:
+        f.write(contents)
+    with open(partial_file + '.json', 'w') as f:
+        json.dump({ 'url': url, 'validator': validator }, f)
+
+    return partial_file
+
+
+def read_file(filename):
+    with open(filename, 'rb') as f:
+        return f.read()
+
+
+def test_download_file(tmp_path, http_server):
+    archive_path = str(tmp_path) + '/archives/'
+    requests_made = []
+    url = http_server(make_file_handler(requests_made)) + '/file.zip'
+
+    archive_file = statbuilder.download_file(url, str(tmp_path / 'file.zip'), archive_path=archive_path)
+    
+    assert read_file(archive_file) == CONTENTS
+    assert read_file(str(tmp_path / 'file.zip')) == CONTENTS
+    assert archive_file == archive_path + hashlib.sha256(CONTENTS).hexdigest()
+    assert statbuilder.get_archive_index(archive_path) == { url: hashlib.sha256(CONTENTS).hexdigest() }
+    
+    # the archived file is used the next time
+    assert statbuilder.download_file(url, archive_path=archive_path) == archive_file
+    assert len(requests_made) == 1
+    assert [f for f in os.listdir(archive_path) if f.startswith('partial-') and 
+            not f.endswith('.lock')] == []
+
+
+@pytest.mark.parametrize('validator, resumed', [(ETAG, True), ('"v0"', False), (None, False)])
+def test_download_file_resumes(tmp_path, http_server, validator, resumed):
+    archive_path = str(tmp_path) + '/archives/'
+    requests_made = []
+    url = http_server(make_file_handler(requests_made)) + '/file.zip'
+    # the partial file of a changed file must not be resumed
+    write_partial_file(url, archive_path, CONTENTS[:1000] if resumed else b'x' * 1000, validator)
+
+    archive_file = statbuilder.download_file(url, archive_path=archive_path)
+
+    assert read_file(archive_file) == CONTENTS
+    assert ('Range' in requests_made[0]) == (validator is not None)
+    if validator is not None:
+        assert requests_made[0]['Range'] == 'bytes=1000-'
+        assert requests_made[0]['If-Range'] == validator
+
+
+def test_download_file_complete_partial_file(tmp_path, http_server):
+    archive_path = str(tmp_path) + '/archives/'
+    requests_made = []
+    url = http_server(make_file_handler(requests_made)) + '/file.zip'
+    # the download was interrupted after the last byte was written
+    partial_file = write_partial_file(url, archive_path, CONTENTS)
+
+    archive_file = statbuilder.download_file(url, archive_path=archive_path)
+
+    assert len(requests_made) == 1
+    assert read_file(archive_file) == CONTENTS
+    assert not os.path.exists(partial_file)
+    assert statbuilder.get_archive_index(archive_path) == { url: hashlib.sha256(CONTENTS).hexdigest() }
+
+
+def test_download_file_hash_mismatch(tmp_path, http_server):
+    archive_path = str(tmp_path) + '/archives/'
+    url = http_server(make_file_handler([])) + '/file.zip'
+
+    with pytest.raises(IOError):
+        statbuilder.download_file(url, sha256='0' * 64, archive_path=archive_path)
+    
+    assert statbuilder.get_archive_index(archive_path) == {}
+    assert [f for f in os.listdir(archive_path) if not f.endswith('.lock')] == []
+
+    # a file that changed upstream replaces the archived file of the url
+    archive_file = statbuilder.download_file(url, archive_path=archive_path)
+    os.remove(archive_file)
+    changed_url = http_server(make_file_handler([], contents=b'changed')) + '/file.zip'
+    index_file = archive_path + 'index.json'
+    with open(index_file, 'w') as f:
+        json.dump({ changed_url: hashlib.sha256(CONTENTS).hexdigest() }, f)
+    changed_file = statbuilder.download_file(changed_url, archive_path=archive_path)
+    assert read_file(changed_file) == b'changed'
+    assert statbuilder.get_archive_index(archive_path) == { changed_url: hashlib.sha256(b'changed').hexdigest() }
+
+    # the error names the archived file of a url whose expected checksum is out of date
+    with pytest.raises(IOError) as e:
+        statbuilder.download_file(changed_url, sha256=hashlib.sha256(CONTENTS).hexdigest(), 
+                archive_path=archive_path)
+    assert changed_file in str(e.value)
+
+
+def test_add_to_archive_index_concurrently(tmp_path):
+    archive_path = str(tmp_path) + '/'
+    urls = ['https://example.com/{n}.zip'.format(n=n) for n in range(40)]
+    threads = [
+            threading.Thread(target=statbuilder.add_to_archive_index, args=(url, 'hash', archive_path))
+            for url in urls
+        ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statbuilder.get_archive_index(archive_path)) == sorted(urls)
@@ -0,0 +1,89 @@
+# This file is part of Statistical Districts.
+# 
+# Copyright (c) 2019, James Sinton
+# All rights reserved.
+# 
+# Released under the BSD 3-Clause License
+# See https://github.com/jksinton/Statistical-Districts/blob/master/LICENSE
+
+import os
+
+import geopandas as gpd
+from shapely.geometry import box
+
+import statbuilder
+
+
+def make_layer(geoids):
+    return gpd.GeoDataFrame(
+            { 'GEOID': geoids }, 
+            geometry=[box(n, 0, n + 1, 1) for n in range(len(geoids))], 
+            crs='EPSG:4326'
+        )
+
+
+def test_find_layer_file_rebuilds_stale_parquet(tmp_path):
+    layer_file = str(tmp_path / 'layer.geojson')
+    parquet_file = str(tmp_path / 'layer.parquet')
+    statbuilder.write_layer(make_layer(['1', '2']), layer_file, zoom_levels=())
+
+    assert statbuilder.find_layer_file(layer_file) == parquet_file
+    assert list(statbuilder.read_layer(layer_file)['GEOID']) == ['1', '2']
+
+    # replace the geojson file, e.g., by hand, leaving its GeoParquet copy stale
+    os.remove(layer_file)
+    make_layer(['3']).to_file(layer_file, driver='GeoJSON')
+    layer_mtime = os.stat(layer_file).st_mtime_ns
+    os.utime(parquet_file, ns=(layer_mtime - 10**9, layer_mtime - 10**9))
+
+    assert statbuilder.find_layer_file(layer_file) == parquet_file
+    assert list(statbuilder.read_layer(layer_file)['GEOID']) == ['3']
+    assert os.stat(parquet_file).st_mtime_ns >= os.stat(layer_file).st_mtime_ns
+
+
+def test_find_layer_file_without_parquet(tmp_path):
+    layer_file = str(tmp_path / 'layer.geojson')
+    make_layer(['1']).to_file(layer_file, driver='GeoJSON')
+
+    assert statbuilder.find_layer_file(layer_file) == layer_file
+
+
+def test_read_layer_cache_is_bounded_by_memory(tmp_path, monkeypatch):
+    monkeypatch.setattr(statbuilder, 'LAYER_CACHE', statbuilder.OrderedDict())
+    monkeypatch.setattr(statbuilder, 'LAYER_CACHE_SIZES', {})
+    layer_files = []
+    for n in range(3):
+        layer_file = str(tmp_path / 'layer{n}.parquet'.format(n=n))
+        statbuilder.write_layer(make_layer([str(n)] * 100), layer_file)
+        layer_files.append(layer_file)
+    layer_size = statbuilder.get_layer_size(make_layer(['0'] * 100))
+    # the size counts the coordinates of the geometries, 5 per box
+    assert layer_size > 100 * 5 * 16
+
+    for layer_file in layer_files:
+        statbuilder.read_layer(layer_file, cache_bytes=2 * layer_size)
+
+    # the least recently used layer is evicted
+    assert [key[0] for key in statbuilder.LAYER_CACHE] == [os.path.abspath(f) for f in layer_files[1:]]
+    assert sum(statbuilder.LAYER_CACHE_SIZES.values()) <= 2 * layer_size
+
+
+def test_to_json_replaces_the_file(tmp_path):
+    out_filename = str(tmp_path / 'district-data.json')
+    statbuilder.to_json({ 'a': 1 }, out_filename)
+    statbuilder.to_json({ 'a': 2 }, out_filename)
+
+    with open(out_filename) as f:
+        assert f.read() == '{"a": 2}'
+    assert sorted(os.listdir(str(tmp_path))) == sorted(
+            ['district-data.json'] + ['district-data.json' + extension for extension in 
+                ['.gz', '.br'] if extension == '.gz' or statbuilder.brotli is not None])
+
+
+def test_zoom_levels_are_written_as_parquet(tmp_path):
+    layer_file = str(tmp_path / 'layer.geojson')
+    statbuilder.write_layer(make_layer(['1', '2']), layer_file, zoom_levels=(8,))
+
+    # statserver makes the tiles from the GeoParquet copy of each zoom level
+    assert sorted(f for f in os.listdir(str(tmp_path)) if '.z8.' in f) == ['layer.z8.parquet']
+    assert list(gpd.read_parquet(str(tmp_path / 'layer.z8.parquet'))['GEOID']) == ['1', '2']
@@ -0,0 +1,114 @@
+# This file is part of Statistical Districts.
+# 
+# Copyright (c) 2019, James Sinton
+# All rights reserved.
+# 
+# Released under the BSD 3-Clause License
+# See https://github.com/jksinton/Statistical-Districts/blob/master/LICENSE
+
+import json
+import os
+import shutil
+import tempfile
+
+from tornado.testing import AsyncHTTPTestCase
+
+import statserver
+
+
+def write_district(data_path, over_18):
+    os.makedirs(data_path, exist_ok=True)
+    district_data = {
+        '2017': {
+            'bg': { '482010001001': { 'over_18': over_18 } },
+            'district': { 'over_18': over_18 },
+        }
+    }
+    district_config = { 'census_years': ['2017'] }
+    categories = { 'Age': { 'fields': ['over_18'] } }
+    for filename, data in [('district-data.json', district_data), 
+            ('district.json', district_config), ('categories.json', categories)]:
+        with open(os.path.join(data_path, filename), 'w') as f:
+            json.dump(data, f)
+
+
+class DistrictsTest(AsyncHTTPTestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        data_path = os.path.join(self.path, 'data')
+        write_district(data_path, 100)
+        # a district built by statbuilder --districts
+        write_district(os.path.join(data_path, 'US-REP-TX07'), 200)
+        self.districts = statserver.Districts(data_path, os.path.join(self.path, 'tiles'))
+        super(DistrictsTest, self).setUp()
+
+    def tearDown(self):
+        super(DistrictsTest, self).tearDown()
+        shutil.rmtree(self.path)
+
+    def get_app(self):
+        return statserver.make_app(self.districts)
+
+    def get_json(self, url):
+        response = self.fetch(url)
+        self.assertEqual(response.code, 200)
+        return json.loads(response.body)
+
+    def test_district_argument(self):
+        self.assertEqual(self.get_json('/api/data/2017/district'), { 'over_18': 100 })
+        self.assertEqual(self.get_json('/api/data/2017/district?district=US-REP-TX07'), { 'over_18': 200 })
+        self.assertEqual(self.get_json('/api/data/2017/bg/over_18?district=US-REP-TX07'), 
+                { 'geoids': ['482010001001'], 'values': [200] })
+        self.assertEqual(self.get_json('/api/geounit/2017/bg/482010001001?district=US-REP-TX07'), 
+                { 'over_18': 200 })
+
+    def test_bootstrap(self):
+        bootstrap = self.get_json('/api/bootstrap')
+        self.assertEqual(bootstrap['column']['values'], [100])
+        bootstrap = self.get_json('/api/bootstrap?district=US-REP-TX07')
+        self.assertEqual(bootstrap['column']['values'], [200])
+        self.assertEqual(bootstrap['districts'], { '2017': { 'over_18': 200 } })
+
+    def test_unknown_district(self):
+        for district in ['US-REP-TX08', '..', 'US-REP-TX07/..']:
+            for url in ['/api/data/2017/district', '/api/bootstrap', '/tiles/bg/10/0/0.geojson']:
+                response = self.fetch(url + '?district=' + district)
+                self.assertEqual(response.code, 404)
+
+
+def test_tile_cache_is_pruned_when_a_layer_is_rebuilt(tmp_path, monkeypatch):
+    import geopandas as gpd
+    from shapely.geometry import box
+
+    geojson_path = tmp_path / 'static' / 'geojson'
+    geojson_path.mkdir(parents=True)
+    layer_file = str(geojson_path / 'bgs.parquet')
+    district_config_file = str(tmp_path / 'district.json')
+    with open(district_config_file, 'w') as f:
+        json.dump({ 'bg_geojson': '/static/geojson/bgs.geojson' }, f)
+    # the layer urls are relative to the directory of statserver
+    monkeypatch.setattr(statserver, '__file__', str(tmp_path / 'statserver.py'))
+    tiles = statserver.TileStore(district_config_file, str(tmp_path / 'tiles'))
+
+    def write_layer(geoid, mtime):
+        gpd.GeoDataFrame({ 'GEOID': [geoid] }, geometry=[box(-95.5, 29.9, -95.4, 30.0)], 
+                crs='EPSG:4326').to_parquet(layer_file)
+        os.utime(layer_file, (mtime, mtime))
+
+    write_layer('1', 1000000000)
+    assert b'"1"' in tiles.get_tile('bg', 10, 240, 422, 'geojson')
+    assert len(os.listdir(str(tmp_path / 'tiles' / 'bg'))) == 1
+
+    write_layer('2', 1000000100)
+    assert b'"2"' in tiles.get_tile('bg', 10, 240, 422, 'geojson')
+    # only the tiles of the current version of the layer are kept
+    versions = os.listdir(str(tmp_path / 'tiles' / 'bg'))
+    assert versions == [tiles.get_layer_version(layer_file, statserver.get_file_version(layer_file))]
+    # the previous version of the layer is no longer kept in memory
+    assert list(tiles.layers) == [layer_file]
+
+    # layers past the memory limit are read again on each request
+    uncached_tiles = statserver.TileStore(district_config_file, str(tmp_path / 'tiles'), 
+            cache_bytes=0)
+    assert b'"2"' in uncached_tiles.get_tile('bg', 11, 480, 844, 'geojson')
+    assert len(uncached_tiles.layers) == 0
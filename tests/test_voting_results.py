@@ -0,0 +1,41 @@
+# This file is part of Statistical Districts.
+# 
+# Copyright (c) 2019, James Sinton
+# All rights reserved.
+# 
+# Released under the BSD 3-Clause License
+# See https://github.com/jksinton/Statistical-Districts/blob/master/LICENSE
+
+import statbuilder
+
+VOTING_RESULTS = """county,precinct,office,district,party,candidate,votes
+Harris,1,U.S. House,7,Republican,John Culberson,100
+Harris,1,U.S. House,7,Democratic,Lizzie Fletcher,120
+Harris,2,U.S. House,7,REP,John Culberson,80
+Harris,2,President,,DEM,Someone Else,10
+Harris,3,U.S. House,7,DEM,Lizzie Fletcher,90
+Harris,TOTAL,U.S. House,7,REP,John Culberson,180
+"""
+
+
+def test_read_voting_results(tmp_path, monkeypatch):
+    voting_results_file = str(tmp_path / 'results.csv')
+    with open(voting_results_file, 'w') as f:
+        f.write(VOTING_RESULTS)
+    cache_path = str(tmp_path / 'cache') + '/'
+
+    vr_data = statbuilder.read_voting_results(voting_results_file, precincts=[1, 2], 
+            offices=['U.S. House'], chunksize=2, cache_path=cache_path)
+    assert vr_data.precinct.tolist() == [1, 1, 2]
+    assert vr_data.party.tolist() == ['REP', 'DEM', 'REP']
+    assert vr_data.votes.tolist() == [100, 120, 80]
+    for column in ['county', 'office', 'district', 'party', 'candidate']:
+        assert isinstance(vr_data[column].dtype, statbuilder.pd.CategoricalDtype)
+
+    # an unchanged file is not hashed again
+    def get_file_hash(filename, block_size=1048576):
+        raise AssertionError('hashed an unchanged file')
+    monkeypatch.setattr(statbuilder, 'get_file_hash', get_file_hash)
+    cached = statbuilder.read_voting_results(voting_results_file, precincts=[1, 2], 
+            offices=['U.S. House'], chunksize=2, cache_path=cache_path)
+    assert cached.votes.tolist() == [100, 120, 80]